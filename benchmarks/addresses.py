@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+'''
+    Benchmark of the bulk address engine.
+    A pool with --used used ids, with --holes of them freed at random, is built, and the engine operations are timed
+      with NumPy and with the pure Python fallback:
+      - free ranges: the free ranges of the pool;
+      - next free: --count free ids after the end of the pool, wrapping around to the freed ids;
+      - collisions: the --count candidate ids which are already used;
+      - ipv4/ipv6 addresses: the packed addresses of --count used ids, compared with per-row ipaddress arithmetic.
+    Usage: PYTHONPATH=src python3 benchmarks/addresses.py [-u USED] [-f HOLES] [-c COUNT]
+'''
+
+import time
+import random
+import argparse
+from ipaddress import IPv4Network, IPv6Network
+
+from archsdn_central.database.internals import addresses
+
+ipv4_network = IPv4Network("10.0.0.0/8")
+ipv6_network = IPv6Network("fd61:7263:6873:646e::0/64")
+
+
+def best_of(function, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk address engine benchmark")
+    parser.add_argument("-u", "--used", type=int, default=1000000, help="Number of used ids in the pool.")
+    parser.add_argument("-f", "--holes", type=int, default=100000, help="Number of used ids freed at random.")
+    parser.add_argument("-c", "--count", type=int, default=100000, help="Number of ids allocated, checked and packed.")
+    args = parser.parse_args()
+
+    (first, last) = addresses.pool_limits(IPv4Network("10.0.0.0/12"))
+    used = sorted(set(range(first, args.used + 1)) - set(random.sample(range(first, args.used + 1), args.holes)))
+    last = min(last, args.used + args.holes // 2)
+    candidates = sorted(random.sample(range(first, last + 1), args.count))
+
+    header = "{:<24s} {:>12s} {:>12s}".format("operation (ms)", "numpy", "python")
+    print("{:d} used ids, {:d} free ids, {:d} ids per operation".format(len(used), last - len(used), args.count))
+    print(header)
+    print("-" * len(header))
+    operations = (
+        ("free ranges", lambda used: addresses.free_ranges(used, first, last)),
+        ("next free", lambda used: addresses.next_free(used, args.count, first, last)),
+        ("collisions", lambda used: addresses.collisions(used, candidates)),
+        ("ipv4 addresses", lambda used: addresses.ipv4_addresses(ipv4_network, used[:args.count])),
+        ("ipv6 addresses", lambda used: addresses.ipv6_addresses(ipv6_network, used[:args.count])),
+    )
+    results = {}
+    for (enabled, column) in ((True, "numpy"), (False, "python")):
+        addresses.use_numpy(enabled)
+        if enabled and addresses.backend() is None:
+            continue
+        backend_used = addresses.backend().asarray(used) if enabled else used
+        for (name, operation) in operations:
+            results[(name, column)] = best_of(lambda: operation(backend_used))
+    addresses.use_numpy(True)
+
+    for (name, _) in operations:
+        print("{:<24s} {:>12s} {:>12.2f}".format(
+            name,
+            "{:.2f}".format(results[(name, "numpy")]) if (name, "numpy") in results else "-",
+            results[(name, "python")]
+        ))
+    print("{:<24s} {:>12s} {:>12.2f}".format(
+        "ipaddress ipv4", "-", best_of(lambda: list((int(ipv4_network.network_address + i) for i in used[:args.count])))
+    ))
+    print("{:<24s} {:>12s} {:>12.2f}".format(
+        "ipaddress ipv6", "-",
+        best_of(lambda: list(((ipv6_network.network_address + i).packed for i in used[:args.count])))
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+'''
+    Benchmark of the clients table layouts.
+    Two databases are filled with the same clients:
+      - normalized: the schema before the compact_clients migration, where the client addresses are in clients_ipv4s
+        and clients_ipv6s, and the client names in names, and the client lookups go through clients_view;
+      - compact: the current schema, where the client rows carry their addresses and the names are derived.
+    For each layout, it measures the database size per client, the client insert rate (in transactions of --batch
+      clients, as the synchronous commit of each registration would dominate otherwise), and the latency of the
+      client information and address lookups, using the statements of each layout.
+    The address lookup of the normalized layout cannot use the address indexes through clients_view, and scans the
+      clients, so it is measured with fewer lookups.
+    Usage: PYTHONPATH=src python3 benchmarks/clients.py [-n CLIENTS] [-c CONTROLLERS] [-l LOOKUPS] [-a LOOKUPS]
+             [-b BATCH]
+'''
+
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from uuid import UUID
+from ipaddress import IPv4Network, IPv6Network
+
+from archsdn_central.database.internals.schema import migrations, statements
+
+ipv4_network = IPv4Network("10.0.0.0/8")
+ipv6_network = IPv6Network("fd61:7263:6873:646e::0/64")
+database_sql = str(migrations()[0][2].parents[1] / "database.sql")
+
+
+def create(location, compact):
+    connector = sqlite3.connect(location)
+    with open(database_sql, "r") as fp:
+        connector.executescript(fp.read())
+    for (version, _, path) in migrations():
+        if version == 3 and not compact:
+            break
+        with open(str(path), "r") as fp:
+            for (statement, chunk) in statements(fp.read()):
+                connector.execute(statement, {"first": 0, "last": -1} if chunk else ())
+    connector.commit()
+    return connector
+
+
+def insert_normalized(db_cursor, client_id, controller_id, controller_uuid, offset):
+    db_cursor.execute("INSERT INTO clients_ipv4s(id, address) VALUES (?,?)",
+                      (offset, int(ipv4_network.network_address) + offset))
+    db_cursor.execute("INSERT INTO clients_ipv6s(id, address) VALUES (?,?)",
+                      (offset, (int(ipv6_network.network_address) + offset).to_bytes(16, 'big')))
+    db_cursor.execute("INSERT INTO names(name) VALUES (?)", (".".join((str(client_id), str(controller_uuid), "archsdn")),))
+    db_cursor.execute("INSERT INTO clients(id, controller, ipv4, ipv6, name) VALUES (?,?,?,?,?)",
+                      (client_id, controller_id, offset, offset, db_cursor.lastrowid))
+
+
+def insert_compact(db_cursor, client_id, controller_id, controller_uuid, offset):
+    ipv4_address = int(ipv4_network.network_address) + offset
+    ipv6_address = (int(ipv6_network.network_address) + offset).to_bytes(16, 'big')
+    db_cursor.execute("INSERT INTO clients_ipv4s(id, address) VALUES (?,?)", (offset, ipv4_address))
+    db_cursor.execute("INSERT INTO clients_ipv6s(id, address) VALUES (?,?)", (offset, ipv6_address))
+    db_cursor.execute("INSERT INTO clients(id, controller, ipv4, ipv6, ipv4_address, ipv6_address) "
+                      "VALUES (?,?,?,?,?,?)", (client_id, controller_id, offset, offset, ipv4_address, ipv6_address))
+
+
+def info_normalized(db_cursor, client_id, controller_id, controller_uuid):
+    db_cursor.execute("SELECT ipv4, ipv6, name, registration_date FROM clients_view WHERE "
+                      "(clients_view.id == ?) AND (clients_view.controller == ?)", (client_id, controller_uuid.bytes))
+    return db_cursor.fetchone()
+
+
+def info_compact(db_cursor, client_id, controller_id, controller_uuid):
+    db_cursor.execute("SELECT ipv4_address, ipv6_address, registration_date FROM clients WHERE "
+                      "(clients.id == ?) AND (clients.controller == ?)", (client_id, controller_id))
+    return db_cursor.fetchone() + (".".join((str(client_id), str(controller_uuid), "archsdn")),)
+
+
+def address_normalized(db_cursor, ipv4_address):
+    db_cursor.execute("SELECT id, controller, name, registration_date FROM clients_view WHERE (ipv4 == ?) OR (ipv6 == ?)",
+                      (ipv4_address, None))
+    return db_cursor.fetchone()
+
+
+def address_compact(db_cursor, ipv4_address):
+    db_cursor.execute("SELECT clients.id, controllers.uuid, clients.registration_date FROM clients "
+                      "JOIN controllers ON controllers.id == clients.controller "
+                      "WHERE (clients.ipv4_address == ?) OR (clients.ipv6_address == ?)", (ipv4_address, None))
+    res = db_cursor.fetchone()
+    return res + (".".join((str(res[0]), str(UUID(bytes=res[1])), "archsdn")),)
+
+
+def measure(location, compact, clients, controllers, lookups, address_lookups, batch):
+    connector = create(location, compact)
+    db_cursor = connector.cursor()
+    controller_uuids = list((UUID(int=index + 1) for index in range(controllers)))
+    for (index, controller_uuid) in enumerate(controller_uuids):
+        db_cursor.execute("INSERT INTO names(name) VALUES (?)", ("{:s}.controller.archsdn".format(str(controller_uuid)),))
+        name_id = db_cursor.lastrowid
+        db_cursor.execute("INSERT INTO controllers_ipv4s(address, port) VALUES (?,?)", (index + 1, 12345))
+        db_cursor.execute("INSERT INTO controllers(id, name, ipv4, uuid) VALUES (?,?,?,?)",
+                          (index + 1, name_id, db_cursor.lastrowid, controller_uuid.bytes))
+    connector.commit()
+
+    insert = insert_compact if compact else insert_normalized
+    start = time.perf_counter()
+    for offset in range(2, clients + 2):
+        controller_index = offset % controllers
+        insert(db_cursor, offset // controllers + 1, controller_index + 1, controller_uuids[controller_index], offset)
+        if offset % batch == 0:
+            connector.commit()
+    connector.commit()
+    insert_rate = clients / (time.perf_counter() - start)
+    size = os.path.getsize(location)
+
+    info = info_compact if compact else info_normalized
+    address = address_compact if compact else address_normalized
+    samples = list((random.randrange(2, clients + 2) for _ in range(lookups)))
+    start = time.perf_counter()
+    for offset in samples:
+        controller_index = offset % controllers
+        assert info(db_cursor, offset // controllers + 1, controller_index + 1, controller_uuids[controller_index])
+    info_latency = (time.perf_counter() - start) / lookups
+    start = time.perf_counter()
+    for offset in samples[:address_lookups]:
+        assert address(db_cursor, int(ipv4_network.network_address) + offset)
+    address_latency = (time.perf_counter() - start) / min(lookups, address_lookups)
+
+    connector.close()
+    return (size / clients, insert_rate, info_latency * 1e6, address_latency * 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clients table layouts benchmark")
+    parser.add_argument("-n", "--clients", type=int, default=1000000, help="Number of clients.")
+    parser.add_argument("-c", "--controllers", type=int, default=100, help="Number of controllers.")
+    parser.add_argument("-l", "--lookups", type=int, default=10000, help="Number of client information lookups.")
+    parser.add_argument("-a", "--addressLookups", type=int, default=100, help="Number of address lookups.")
+    parser.add_argument("-b", "--batch", type=int, default=1000, help="Number of clients inserted per transaction.")
+    args = parser.parse_args()
+
+    header = "{:<12s} {:>16s} {:>16s} {:>12s} {:>14s}".format(
+        "layout", "bytes / client", "inserts / s", "info (us)", "address (us)"
+    )
+    print("{:d} clients, {:d} controllers".format(args.clients, args.controllers))
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as directory:
+        for (name, compact) in (("normalized", False), ("compact", True)):
+            print("{:<12s} {:>16.1f} {:>16.0f} {:>12.1f} {:>14.1f}".format(name, *measure(
+                os.path.join(directory, "{:s}.sqlite3".format(name)), compact,
+                args.clients, args.controllers, args.lookups, args.addressLookups, args.batch
+            )))
+
+
+if __name__ == '__main__':
+    main()
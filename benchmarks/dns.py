@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+'''
+    Benchmark of the DNS responder.
+    A database in memory is filled with --controllers controllers with --clients clients each, and its names are
+      indexed. Then the queries per second answered are measured for:
+      - forward, reverse and unregistered: A queries of client names, PTR queries of client IPv4 addresses, and A
+        queries of unregistered client names, answered directly (dns_responder.answer);
+      - udp: a mix of the queries above, sent over UDP on the loopback interface, keeping --window queries in flight;
+      - sql: the client information queries of the database (database.query_client_info), for comparison with the
+        lookups which do not touch the database.
+    Usage: PYTHONPATH=src python3 benchmarks/dns.py [-c CONTROLLERS] [-n CLIENTS] [-q QUERIES] [-w WINDOW]
+'''
+
+import time
+import struct
+import random
+import asyncio
+import argparse
+from uuid import UUID
+from ipaddress import IPv4Address
+
+from archsdn_central import database
+from archsdn_central import dns_responder
+
+A = 1
+PTR = 12
+
+
+def query(query_id, name, qtype):
+    labels = b"".join((bytes((len(label),)) + label.encode("ascii") for label in name.split(".")))
+    return struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0) + labels + b"\x00" + struct.pack("!HH", qtype, 1)
+
+
+def queries_per_second(queries):
+    start = time.perf_counter()
+    for request in queries:
+        dns_responder.answer(request)
+    return len(queries) / (time.perf_counter() - start)
+
+
+async def udp_queries_per_second(queries, port, window):
+    loop = asyncio.get_event_loop()
+    await dns_responder.start(IPv4Address("127.0.0.1"), port)
+    pending = {"sent": 0, "received": 0}
+    done = loop.create_future()
+
+    class Protocol(asyncio.DatagramProtocol):
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            pending["received"] += 1
+            if pending["received"] == len(queries):
+                done.set_result(None)
+            elif pending["sent"] < len(queries):
+                self.transport.sendto(queries[pending["sent"]])
+                pending["sent"] += 1
+
+    (transport, _) = await loop.create_datagram_endpoint(Protocol, remote_addr=("127.0.0.1", port))
+    try:
+        start = time.perf_counter()
+        for request in queries[:window]:
+            transport.sendto(request)
+        pending["sent"] = min(window, len(queries))
+        await asyncio.wait_for(done, 60)
+        return len(queries) / (time.perf_counter() - start)
+    finally:
+        transport.close()
+        dns_responder.stop()
+
+
+async def sql_queries_per_second(lookups):
+    start = time.perf_counter()
+    for (client_id, controller_uuid) in lookups:
+        await database.query_client_info(client_id, controller_uuid)
+    return len(lookups) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DNS responder benchmark")
+    parser.add_argument("-c", "--controllers", type=int, default=100, help="Number of controllers registered.")
+    parser.add_argument("-n", "--clients", type=int, default=1000, help="Number of clients of each controller.")
+    parser.add_argument("-q", "--queries", type=int, default=100000, help="Number of queries of each kind.")
+    parser.add_argument("-w", "--window", type=int, default=64, help="Number of UDP queries in flight.")
+    parser.add_argument("-p", "--port", type=int, default=15353, help="UDP port of the responder.")
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(database.initialise(location=":memory:"))
+    try:
+        controllers = list((UUID(int=i) for i in range(1, args.controllers + 1)))
+        for (index, controller_uuid) in enumerate(controllers):
+            loop.run_until_complete(database.register_controller(
+                controller_uuid, ipv4_info=(IPv4Address("192.168.0.0") + index, 12345)
+            ))
+            loop.run_until_complete(database.register_clients(tuple(range(1, args.clients + 1)), controller_uuid))
+        start = time.perf_counter()
+        loop.run_until_complete(database.index_names())
+        print("{:d} controllers, {:d} clients indexed in {:.2f} ms".format(
+            args.controllers, args.controllers * args.clients, (time.perf_counter() - start) * 1000
+        ))
+
+        lookups = list((
+            (random.randint(1, args.clients), random.choice(controllers)) for _ in range(args.queries)
+        ))
+        forward = list((
+            query(i & 0xFFFF, "{:d}.{:s}.archsdn".format(client_id, str(controller_uuid)), A)
+            for (i, (client_id, controller_uuid)) in enumerate(lookups)
+        ))
+        reverse = list((
+            query(i & 0xFFFF, ".".join(reversed(str(IPv4Address("10.0.0.1") + address_id).split("."))) +
+                  ".in-addr.arpa", PTR)
+            for (i, address_id) in enumerate(
+                random.randint(1, args.controllers * args.clients) for _ in range(args.queries)
+            )
+        ))
+        unregistered = list((
+            query(i & 0xFFFF, "{:d}.{:s}.archsdn".format(args.clients + 1 + i, str(controller_uuid)), A)
+            for (i, (_, controller_uuid)) in enumerate(lookups)
+        ))
+        mixed = forward[0::3] + reverse[1::3] + unregistered[2::3]
+        random.shuffle(mixed)
+
+        header = "{:<24s} {:>12s} {:>12s}".format("queries", "count", "queries/s")
+        print(header)
+        print("-" * len(header))
+        for (name, queries) in (("forward", forward), ("reverse", reverse), ("unregistered", unregistered)):
+            print("{:<24s} {:>12d} {:>12.0f}".format(name, len(queries), queries_per_second(queries)))
+        print("{:<24s} {:>12d} {:>12.0f}".format(
+            "udp", len(mixed), loop.run_until_complete(udp_queries_per_second(mixed, args.port, args.window))
+        ))
+        sql_lookups = lookups[:max(1, args.queries // 10)]
+        print("{:<24s} {:>12d} {:>12.0f}".format(
+            "sql", len(sql_lookups), loop.run_until_complete(sql_queries_per_second(sql_lookups))
+        ))
+        metrics = dns_responder.metrics()
+        assert metrics["answered"] == args.queries * 2 + len(mixed) - len(unregistered[2::3]), metrics
+    finally:
+        loop.run_until_complete(database.close())
+
+
+if __name__ == '__main__':
+    main()
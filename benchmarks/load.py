@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+'''
+    Load generator for the central manager.
+    A central manager is started for each scenario (without and with load shedding), and flooded for a while by
+      concurrent readers (client information, client association and address lookups), while a writer registers and
+      removes clients. The replies to each kind of request are reported: successful (including negative replies),
+      RPLBusy, other errors and timeouts, together with their latencies.
+    With load shedding, the reads over the thresholds are replied at once with RPLBusy, so the latency of the reads
+      served and of the registrations stays bounded, while without it every request waits behind the whole backlog.
+      The readers wait for the retry_after_ms of the RPLBusy replies before sending their next request.
+    Usage: PYTHONPATH=src python3 benchmarks/load.py [-d DURATION] [-r READERS] [-sp SHEDPENDING] [-sl SHEDLATENCY]
+'''
+
+import sys
+import time
+import logging
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from uuid import uuid4
+from ipaddress import IPv4Address
+from collections import Counter
+
+from archsdn_central.client import AsyncClient, RequestTimeout
+from archsdn_central.zmq_messages import RPLBusy, RPLThrottled, RPLDeadlineExpired, RPLGenericError, \
+    REQLocalTime, REQRegisterController, REQRegisterControllerClient, REQRemoveControllerClient, \
+    REQClientInformation, REQIsClientAssociated, REQAddressInfo, REQMetrics
+
+
+class Results:
+    def __init__(self):
+        self.replies = Counter()
+        self.latencies = []
+
+    def add(self, reply, latency):
+        # Negative replies (e.g. RPLNoResultsAvailable) are successful.
+        if isinstance(reply, RPLBusy):
+            self.replies["busy"] += 1
+        elif isinstance(reply, (RPLThrottled, RPLDeadlineExpired, RPLGenericError)):
+            self.replies["error"] += 1
+        else:
+            self.replies["ok"] += 1
+            self.latencies.append(latency)
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+
+
+async def timed_request(client, request, results, timeout):
+    start = time.perf_counter()
+    try:
+        reply = await client.request(request, timeout)
+    except RequestTimeout:
+        results.replies["timeout"] += 1
+        return None
+    results.add(reply, time.perf_counter() - start)
+    if isinstance(reply, RPLBusy):
+        # As a controller would, the request is not sent again before retry_after_ms.
+        await asyncio.sleep(reply.retry_after_ms / 1000)
+    return reply
+
+
+async def reader(client, controller_id, clients, results, deadline, timeout):
+    index = 0
+    while time.monotonic() < deadline:
+        index += 1
+        client_id = clients[index % len(clients)]
+        await timed_request(client, REQClientInformation(controller_id, client_id), results, timeout)
+        await timed_request(client, REQIsClientAssociated(controller_id, client_id), results, timeout)
+
+
+async def writer(client, controller_id, results, deadline, timeout):
+    client_id = 1 << 20
+    while time.monotonic() < deadline:
+        client_id += 1
+        await timed_request(client, REQRegisterControllerClient(controller_id, client_id), results, timeout)
+        await timed_request(client, REQRemoveControllerClient(controller_id, client_id), results, timeout)
+
+
+async def address_reader(client, results, deadline, timeout):
+    while time.monotonic() < deadline:
+        await timed_request(client, REQAddressInfo(ipv4=IPv4Address("10.0.0.2")), results, timeout)
+
+
+async def run_scenario(location, duration, readers, clients_count, timeout):
+    client = AsyncClient(location, connections=4, timeout=timeout, retries=0)
+    try:
+        for _ in range(100):
+            try:
+                await client.request(REQLocalTime(), 0.2)
+                break
+            except RequestTimeout:
+                pass
+
+        controller_id = uuid4()
+        await client.request(REQRegisterController(controller_id, (IPv4Address("192.168.1.1"), 12345), None))
+        clients = list(range(1, clients_count + 1))
+        for client_id in clients:
+            await client.request(REQRegisterControllerClient(controller_id, client_id))
+
+        (reads, writes) = (Results(), Results())
+        deadline = time.monotonic() + duration
+        tasks = [reader(client, controller_id, clients, reads, deadline, timeout) for _ in range(readers)]
+        tasks.append(address_reader(client, reads, deadline, timeout))
+        tasks.append(writer(client, controller_id, writes, deadline, timeout))
+        await asyncio.gather(*tasks)
+
+        metrics = await client.request(REQMetrics(), 5 * timeout)
+        return (reads, writes, metrics.metrics["queues"].get("shedding", {}))
+    finally:
+        client.close()
+
+
+def scenario(label, options, args):
+    storage = Path(tempfile.mkdtemp()) / "load.sqlite3"
+    location = "tcp://127.0.0.1:{:d}".format(args.port)
+    central = subprocess.Popen(
+        (sys.executable, str(Path(__file__).parent.parent / "src" / "archsdn_central" / "main.py"),
+         "-l", "CRITICAL", "-s", str(storage), "-p", str(args.port), "-rc", "0") + options
+    )
+    try:
+        (reads, writes, shedding) = asyncio.get_event_loop().run_until_complete(
+            run_scenario(location, args.duration, args.readers, args.clients, args.timeout)
+        )
+    finally:
+        central.send_signal(signal.SIGINT)
+        central.wait()
+        if storage.exists():
+            storage.unlink()
+
+    for (kind, results) in (("reads", reads), ("writes", writes)):
+        print("{:<24s} {:<8s} {:>10d} {:>10d} {:>8d} {:>8d} {:>8d} {:>10.2f} {:>10.2f}".format(
+            label, kind, sum(results.replies.values()), results.replies["ok"], results.replies["busy"],
+            results.replies["error"], results.replies["timeout"], results.percentile(0.5), results.percentile(0.99)
+        ))
+    if shedding:
+        print("{:<24s} shedding episodes: {:d}, shed: {:s}".format(
+            label, shedding["episodes"], str(shedding["shed"])
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator")
+    parser.add_argument("-d", "--duration", type=float, default=5.0, help="Seconds each scenario is run.")
+    parser.add_argument("-r", "--readers", type=int, default=256, help="Number of concurrent readers.")
+    parser.add_argument("-c", "--clients", type=int, default=100, help="Number of clients registered before.")
+    parser.add_argument("-t", "--timeout", type=float, default=2.0, help="Timeout of each request, in seconds.")
+    parser.add_argument("-p", "--port", type=int, default=12399, help="Port of the central manager.")
+    parser.add_argument("-sp", "--shedPending", type=int, default=64, help="--shedPending of the shedding scenario.")
+    parser.add_argument("-sl", "--shedLatency", type=float, default=50, help="--shedLatency of the shedding scenario.")
+    args = parser.parse_args()
+    # The expired requests of the connection attempts are not reported.
+    logging.basicConfig(level=logging.ERROR)
+
+    print("{:<24s} {:<8s} {:>10s} {:>10s} {:>8s} {:>8s} {:>8s} {:>10s} {:>10s}".format(
+        "scenario", "kind", "requests", "ok", "busy", "errors", "timeouts", "p50 (ms)", "p99 (ms)"
+    ))
+    print("-" * 104)
+    scenario("no shedding", (), args)
+    scenario("shedding", ("-sp", str(args.shedPending), "-sl", str(args.shedLatency)), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+'''
+    Benchmark of the message classes.
+    For every registered message, it measures the memory used by an instance, and the time spent constructing
+      (validated and trusted), serializing and deserializing it.
+    Usage: PYTHONPATH=src python3 benchmarks/messages.py [-n NUMBER]
+'''
+
+import sys
+import time
+import timeit
+import argparse
+from uuid import UUID
+from ipaddress import IPv4Address, IPv6Address, ip_network
+from netaddr import EUI
+
+from archsdn_central.zmq_messages import registered_messages, dumps, loads
+
+
+def sample_arguments():
+    controller_id = UUID(int=1)
+    ipv4_info = (IPv4Address("192.168.1.1"), 12345)
+    ipv6_info = (IPv6Address(1), 12345)
+    registration_date = time.localtime()
+    return {
+        "REQRegisterController": (controller_id, ipv4_info, ipv6_info),
+        "REQQueryControllerInfo": (controller_id,),
+        "REQUnregisterController": (controller_id,),
+        "REQIsControllerRegistered": (controller_id,),
+        "REQHeartbeat": (controller_id,),
+        "REQUpdateControllerInfo": (controller_id, ipv4_info, ipv6_info),
+        "REQRegisterControllerClient": (controller_id, 2),
+        "REQRegisterControllerClients": (controller_id, tuple(range(2, 102))),
+        "REQRemoveControllerClient": (controller_id, 2),
+        "REQIsClientAssociated": (controller_id, 2),
+        "REQClientInformation": (controller_id, 2),
+        "REQUnregisterAllClients": (controller_id,),
+        "REQAddressInfo": (IPv4Address("10.0.0.2"), None),
+        "REQListControllers": (0, 100),
+        "REQListClients": (controller_id, 0, 100),
+        "REQRegisterLink": (controller_id, UUID(int=2), 10000, 2.5),
+        "REQRemoveLink": (controller_id, UUID(int=2)),
+        "REQPathQuery": (controller_id, UUID(int=2)),
+        "RPLCentralNetworkPolicies": (
+            ip_network("10.0.0.0/8"), ip_network("fd61:7263:6873:646e::0/64"), IPv4Address("10.0.0.1"),
+            IPv6Address("fd61:7263:6873:646e::1"), EUI("FE:FF:FF:FF:FF:FF"), registration_date, {}
+        ),
+        "RPLControllerInformation": (
+            ipv4_info[0], ipv4_info[1], ipv6_info[0], ipv6_info[1],
+            "{:s}.controller.archsdn".format(controller_id.hex), registration_date
+        ),
+        "RPLClientInformation": (
+            IPv4Address("10.0.0.2"), IPv6Address("fd61:7263:6873:646e::2"),
+            "2.{:s}.controller.archsdn".format(controller_id.hex), registration_date
+        ),
+        "RPLAddressInfo": (controller_id, 2, "2.{:s}.controller.archsdn".format(controller_id.hex), registration_date),
+        "RPLSnapshot": ("archsdn-central-20180101T000000.sqlite3", 1 << 20),
+        "RPLControllersPage": (
+            ((controller_id, ipv4_info, ipv6_info, "{:s}.controller.archsdn".format(str(controller_id)),
+              registration_date),), 1
+        ),
+        "RPLClientsPage": (
+            ((2, IPv4Address("10.0.0.2"), IPv6Address("fd61:7263:6873:646e::2"),
+              "2.{:s}.archsdn".format(str(controller_id)), registration_date),), 2
+        ),
+        "RPLPath": (tuple((UUID(int=i) for i in range(1, 9))), 17.5, 1000),
+        "RPLProfile": (False, 2000, {"REQAddressInfo": 1200, "database.query_address_info": 700}, "profile.collapsed"),
+        "REQProfiler": (True,),
+        "REQMemoryDiagnostics": ("report",),
+        "RPLMemoryReport": (
+            True, 1 << 24, 1 << 25, (("archsdn_central.zmq_messages", 1 << 20, 1000, 1 << 21, 2000),),
+            (("archsdn_central.zmq_messages:80", 1 << 20, 1000),), {"REQAddressInfo": (1000, 10, 4096)}
+        ),
+        "RPLGenericError": ("Generic Error",),
+        "RPLThrottled": (100,),
+        "RPLBusy": (250,),
+        "RPLMetrics": ({"loops": {"main": {"bounds": (1, 2, 5), "counts": (90, 8, 2, 0), "count": 100}}},),
+    }
+
+
+def instance_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Message classes benchmark")
+    parser.add_argument("-n", "--number", type=int, default=100000, help="Number of repetitions of each operation.")
+    number = parser.parse_args().number
+
+    samples = sample_arguments()
+    header = "{:<32s} {:>6s} {:>12s} {:>12s} {:>12s} {:>12s}".format(
+        "message", "bytes", "init (ns)", "trusted (ns)", "dumps (ns)", "loads (ns)"
+    )
+    print(header)
+    print("-" * len(header))
+    for cls in registered_messages():
+        args = samples.get(cls.__name__, ())
+        msg = cls(*args)
+        data = dumps(msg)
+        # The trusted constructor takes the declared fields, which can differ from the constructor arguments.
+        trusted_args = tuple((getattr(msg, field.name) for field in cls._fields)) if hasattr(cls, "_fields") else args
+
+        def measure(stmt):
+            return min(timeit.repeat(stmt, number=number, repeat=3)) * 1e9 / number
+
+        print("{:<32s} {:>6d} {:>12.0f} {:>12.0f} {:>12.0f} {:>12.0f}".format(
+            cls.__name__,
+            instance_size(msg),
+            measure(lambda: cls(*args)),
+            measure(lambda: cls.trusted(*trusted_args)),
+            measure(lambda: dumps(msg)),
+            measure(lambda: loads(data)),
+        ))
+    print("-" * len(header))
+    print("{:d} registered messages, assertions {:s}.".format(
+        len(registered_messages()), "disabled" if sys.flags.optimize else "enabled"
+    ))
+
+
+if __name__ == '__main__':
+    main()
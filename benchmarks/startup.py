@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+'''
+    Benchmark of the startup time.
+    Each scenario is run in a new interpreter with -X importtime, and the modules with the largest cumulative import
+      time are listed:
+      - help: archsdn_central --help, which only imports the argument parsing;
+      - server: the modules imported by a server processing the requests in the main process;
+      - workers: the modules imported by a server with worker processes.
+    The wall time of each scenario is the best of the repetitions.
+    Usage: PYTHONPATH=src python3 benchmarks/startup.py [-n NUMBER] [-t TOP]
+'''
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+scenarios = (
+    ("help", "import sys; sys.argv = ['archsdn_central', '--help']; from archsdn_central import main; main()"),
+    ("server", "import asyncio; from archsdn_central import database, zmq_requests"),
+    ("workers", "import asyncio; from archsdn_central import database, zmq_workers"),
+)
+
+
+def import_times(stderr):
+    '''
+        Returns a dict of the cumulative import time, in microseconds, of each module in the -X importtime output.
+    '''
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        (_, cumulative, module) = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def run(code):
+    start = time.perf_counter()
+    process = subprocess.run(
+        (sys.executable, "-X", "importtime", "-c", code),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, env=os.environ.copy()
+    )
+    return (time.perf_counter() - start, import_times(process.stderr))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("-n", "--number", type=int, default=5, help="Number of repetitions of each scenario.")
+    parser.add_argument("-t", "--top", type=int, default=10, help="Number of modules listed in each scenario.")
+    args = parser.parse_args()
+
+    for (name, code) in scenarios:
+        runs = list((run(code) for _ in range(args.number)))
+        (wall_time, times) = min(runs, key=lambda result: result[0])
+        print("{:s}: {:.1f} ms wall time, {:d} modules imported".format(name, wall_time * 1000, len(times)))
+        for (module, value) in sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print("    {:>10.1f} ms  {:s}".format(value / 1000, module))
+
+
+if __name__ == '__main__':
+    main()
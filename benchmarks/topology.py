@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+'''
+    Benchmark of the inter-sector topology paths.
+    A database in memory is filled with --sectors controllers, linked as a synthetic graph (a connected small-world
+      graph, where each sector is linked to --degree neighbours, and some links are rewired to far sectors), with random
+      capacities and latencies. Then --queries path queries, between random sectors, are answered:
+      - dijkstra: computing each path (networkx.dijkstra_path), as without the paths cache;
+      - cold: by the database (database.query_path), computing the shortest path tree of each source once, and
+        answering the following queries from it;
+      - cached: by the database, from the cached shortest path trees;
+      - churn: by the database, while the latency of a random link changes every --churn queries, repairing the
+        trees it changes.
+    The queries are sent --batch at a time to the database thread, so its overhead per operation is amortized.
+    Usage: PYTHONPATH=src python3 benchmarks/topology.py [-s SECTORS] [-d DEGREE] [-q QUERIES] [-c CHURN]
+'''
+
+import time
+import random
+import asyncio
+import argparse
+from uuid import UUID
+from ipaddress import IPv4Address
+
+import networkx
+
+from archsdn_central import database
+
+
+async def cached_queries(queries, batch, links=None, churn=0):
+    '''
+        Answers the queries, changing the latency of a random link every churn queries. Returns the queries per second.
+    '''
+    start = time.perf_counter()
+    for index in range(0, len(queries), batch):
+        if churn and links and (index // churn != (index + batch) // churn):
+            (a, b) = random.choice(links)
+            await database.register_link(a, b, 1000, random.uniform(1, 20))
+        await asyncio.gather(*(database.query_path(source, destination)
+                               for (source, destination) in queries[index:index + batch]))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inter-sector topology paths benchmark")
+    parser.add_argument("-s", "--sectors", type=int, default=2000, help="Number of sectors (controllers).")
+    parser.add_argument("-d", "--degree", type=int, default=4, help="Number of links of each sector.")
+    parser.add_argument("-q", "--queries", type=int, default=20000, help="Number of path queries.")
+    parser.add_argument("-o", "--sources", type=int, default=200, help="Number of sectors querying paths.")
+    parser.add_argument("-b", "--batch", type=int, default=100, help="Number of queries sent at a time.")
+    parser.add_argument("-c", "--churn", type=int, default=1000, help="Queries between link changes in the churn run.")
+    args = parser.parse_args()
+
+    random.seed(1)
+    sectors = list((UUID(int=i) for i in range(1, args.sectors + 1)))
+    graph = networkx.connected_watts_strogatz_graph(args.sectors, args.degree, 0.1, seed=1)
+    links = list(((sectors[a], sectors[b]) for (a, b) in graph.edges()))
+    reference = networkx.Graph()
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(database.initialise(location=":memory:"))
+    try:
+        start = time.perf_counter()
+        for (port, controller_uuid) in enumerate(sectors):
+            loop.run_until_complete(database.register_controller(
+                controller_uuid, ipv4_info=(IPv4Address("192.168.0.1") + port // 50000, 10000 + port % 50000)
+            ))
+        for (a, b) in links:
+            (capacity, latency) = (random.choice((100, 1000, 10000)), random.uniform(1, 20))
+            reference.add_edge(a, b, latency=latency)
+            loop.run_until_complete(database.register_link(a, b, capacity, latency))
+        print("{:d} sectors and {:d} links registered in {:.2f} s".format(
+            len(sectors), len(links), time.perf_counter() - start
+        ))
+
+        sources = random.sample(sectors, min(args.sources, len(sectors)))
+        queries = list(((random.choice(sources), random.choice(sectors)) for _ in range(args.queries)))
+
+        header = "{:<24s} {:>12s} {:>12s} {:>16s}".format("run", "queries", "queries/s", "trees")
+        print(header)
+        print("-" * len(header))
+        dijkstra = queries[:max(1, args.queries // 20)]
+        start = time.perf_counter()
+        for (source, destination) in dijkstra:
+            networkx.dijkstra_path(reference, source, destination, weight="latency")
+        print("{:<24s} {:>12d} {:>12.0f} {:>16s}".format(
+            "dijkstra", len(dijkstra), len(dijkstra) / (time.perf_counter() - start), "-"
+        ))
+
+        for (name, churn) in (("cold", 0), ("cached", 0), ("churn", args.churn)):
+            before = loop.run_until_complete(database.topology_metrics())
+            rate = loop.run_until_complete(cached_queries(queries, args.batch, links, churn))
+            after = loop.run_until_complete(database.topology_metrics())
+            print("{:<24s} {:>12d} {:>12.0f} {:>16s}".format(
+                name, len(queries), rate, "/".join((
+                    str(after[counter] - before[counter]) for counter in ("misses", "repaired")
+                ))
+            ))
+        print("trees: computed/repaired during each run")
+    finally:
+        loop.run_until_complete(database.close())
+
+
+if __name__ == '__main__':
+    main()
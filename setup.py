@@ -24,8 +24,10 @@ setup(
     version='1.4.1',
     packages=find_packages('src'),
     package_dir={'': 'src'},
-    package_data={'': ['*.sql']},
+    package_data={'': ['*.sql', 'migrations/*.sql']},
     install_requires=requirements_file_to_list(),
+    extras_require={'numpy': ['numpy']},
+    python_requires='>=3.7',
     py_modules=['main'],
     entry_points={
         'console_scripts': [
@@ -44,6 +46,6 @@ setup(
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
     ]
 )
@@ -1,3 +1,4 @@
+import uuid
 import pathlib
 import argparse
 import ipaddress
@@ -52,6 +53,86 @@ def validate_port(port):
     except Exception:
         raise argparse.ArgumentTypeError("Invalid Port: {:s}".format(port))
 
+def validate_directory(location):
+    loc = pathlib.Path(location)
+    if not loc.is_dir():
+        raise argparse.ArgumentTypeError("Directory {:s} does not exist.".format(str(loc)))
+    return loc
+
+
+def validate_file(location):
+    loc = pathlib.Path(location)
+    if not loc.parent.is_dir():
+        raise argparse.ArgumentTypeError("Directory {:s} does not exist.".format(str(loc.parent)))
+    return loc
+
+
+def validate_interval(interval):
+    try:
+        i = float(interval)
+        if i >= 0:
+            return i
+        else:
+            raise argparse.ArgumentTypeError("Invalid interval: {:s}".format(interval))
+    except Exception:
+        raise argparse.ArgumentTypeError("Invalid interval: {:s}".format(interval))
+
+
+def validate_keep(keep):
+    try:
+        k = int(keep)
+        if k > 0:
+            return k
+        else:
+            raise argparse.ArgumentTypeError("Invalid number of snapshots: {:s}".format(keep))
+    except Exception:
+        raise argparse.ArgumentTypeError("Invalid number of snapshots: {:s}".format(keep))
+
+
+def validate_workers(workers):
+    try:
+        w = int(workers)
+        if w >= 0:
+            return w
+        else:
+            raise argparse.ArgumentTypeError("Invalid number of workers: {:s}".format(workers))
+    except Exception:
+        raise argparse.ArgumentTypeError("Invalid number of workers: {:s}".format(workers))
+
+
+def validate_cache_size(size):
+    try:
+        s = int(size)
+        if s >= 0:
+            return s
+        else:
+            raise argparse.ArgumentTypeError("Invalid cache size: {:s}".format(size))
+    except Exception:
+        raise argparse.ArgumentTypeError("Invalid cache size: {:s}".format(size))
+
+
+def validate_controller_weight(weight):
+    try:
+        (controller_id, w) = weight.split("=")
+        (controller_id, w) = (uuid.UUID(controller_id), int(w))
+        if w > 0:
+            return (controller_id, w)
+        else:
+            raise argparse.ArgumentTypeError("Invalid controller weight: {:s}".format(weight))
+    except Exception:
+        raise argparse.ArgumentTypeError("Invalid controller weight: {:s}".format(weight))
+
+
+def validate_dns_port(port):
+    try:
+        p = int(port)
+        if p in range(0, 0x10000):
+            return p
+        else:
+            raise argparse.ArgumentTypeError("Invalid DNS port: {:s}".format(port))
+    except Exception:
+        raise argparse.ArgumentTypeError("Invalid DNS port: {:s}".format(port))
+
 
 def parse_arguments():
 
@@ -69,5 +150,107 @@ def parse_arguments():
                         help="IPv6 Network for Hosts (default (archsdn in hex): %(default)s)",
                         type=validate_ipv6network,
                         default="fd61:7263:6873:646e::0/64")  # 61:7263:6873:646e -> archsdn in hex
+    parser.add_argument("-w", "--workers",
+                        help="Number of worker processes decoding the requests. "
+                             "Zero processes the requests in the main process (default: %(default)s)",
+                        type=validate_workers, default=0)
+    parser.add_argument("-rc", "--replyCache",
+                        help="Number of replies kept in the reply cache. Zero disables it. "
+                             "Only used when the requests are processed in the main process (default: %(default)s)",
+                        type=validate_cache_size, default=4096)
+    parser.add_argument("-rl", "--rateLimit",
+                        help="Requests per second accepted from each controller (or peer socket). Zero disables the "
+                             "limit. Cannot be used together with --workers (default: %(default)s)",
+                        type=validate_interval, default=0)
+    parser.add_argument("-rb", "--rateBurst",
+                        help="Requests accepted in a burst from each controller, over the rate limit "
+                             "(default: %(default)s)",
+                        type=validate_keep, default=100)
+    parser.add_argument("-qd", "--queueDepth",
+                        help="Requests queued from each controller, after which they are throttled. Zero disables "
+                             "the limit. Only used when the requests are processed in the main process "
+                             "(default: %(default)s)",
+                        type=validate_cache_size, default=1000)
+    parser.add_argument("-cw", "--controllerWeight",
+                        help="Weight of a controller in the fair queue, as UUID=WEIGHT: the number of its queued "
+                             "requests served in each round, instead of 1. Can be given for multiple controllers. "
+                             "Cannot be used together with --workers (default: %(default)s)",
+                        type=validate_controller_weight, action="append", default=None)
+    parser.add_argument("-sp", "--shedPending",
+                        help="Requests pending (queued or being processed) above which the requests which do not "
+                             "change registrations are shed. Zero disables the threshold. Cannot be used together "
+                             "with --workers (default: %(default)s)",
+                        type=validate_cache_size, default=0)
+    parser.add_argument("-sl", "--shedLatency",
+                        help="Database latency, in milliseconds, above which the requests which do not change "
+                             "registrations are shed. Zero disables the threshold. Cannot be used together with "
+                             "--workers (default: %(default)s)",
+                        type=validate_interval, default=0)
+    parser.add_argument("-dc", "--dedupCache",
+                        help="Number of replies to requests with an idempotency key kept, so their retries are "
+                             "replied with the original reply. Zero disables it. Only used when the requests are "
+                             "processed in the main process (default: %(default)s)",
+                        type=validate_cache_size, default=4096)
+    parser.add_argument("-dw", "--dedupWindow",
+                        help="Seconds the replies to requests with an idempotency key are kept "
+                             "(default: %(default)s)",
+                        type=validate_interval, default=60)
+    parser.add_argument("-ht", "--heartbeatTimeout",
+                        help="Seconds without heartbeats after which a controller which sent heartbeats is reaped: "
+                             "its clients are released and its registration removed. Zero disables it. Cannot be "
+                             "used together with --workers (default: %(default)s)",
+                        type=validate_interval, default=0)
+    parser.add_argument("-dp", "--dnsPort",
+                        help="UDP port where the names of the controllers and clients (*.archsdn) are resolved. Zero "
+                             "disables the DNS responder (default: %(default)s)",
+                        type=validate_dns_port, default=0)
+    parser.add_argument("-dt", "--dnsTtl", help="TTL, in seconds, of the DNS records (default: %(default)s)",
+                        type=validate_keep, default=60)
+    parser.add_argument("-sd", "--snapshotDirectory",
+                        help="Directory where the database snapshots are written. "
+                             "Without it, snapshots are disabled (default: %(default)s)",
+                        type=validate_directory, default=None)
+    parser.add_argument("-si", "--snapshotInterval",
+                        help="Seconds between periodic snapshots. Zero only takes requested snapshots "
+                             "(default: %(default)s)",
+                        type=validate_interval, default=0)
+    parser.add_argument("-sk", "--snapshotKeep", help="Number of snapshots kept (default: %(default)s)",
+                        type=validate_keep, default=5)
+    parser.add_argument("-qc", "--quickCheck",
+                        help="Verify the database integrity at startup, before accepting requests "
+                             "(default: %(default)s)",
+                        action="store_true", default=False)
+    parser.add_argument("-md", "--migrationsDryRun",
+                        help="Report the pending database schema migrations and their estimated work, "
+                             "and exit without applying them (default: %(default)s)",
+                        action="store_true", default=False)
+    parser.add_argument("-li", "--lagInterval",
+                        help="Seconds between the event loop lag probes. Zero disables the lag monitor "
+                             "(default: %(default)s)",
+                        type=validate_interval, default=0.1)
+    parser.add_argument("-lt", "--lagThreshold",
+                        help="Seconds an event loop can be blocked before the stack of its thread is sampled. "
+                             "Zero disables the stack samples (default: %(default)s)",
+                        type=validate_interval, default=0.25)
+    parser.add_argument("-lf", "--lagStacksFile",
+                        help="Rotating file where the stack samples of the blocked event loops are written. "
+                             "Without it, they are written to the log (default: %(default)s)",
+                        type=validate_file, default=None)
+    parser.add_argument("-pd", "--profileDirectory",
+                        help="Directory where the sampling profiler writes the profiles. The profiler is started and "
+                             "stopped by the SIGUSR1 signal or by a REQProfiler request (default: the temporary "
+                             "directory)",
+                        type=validate_directory, default=None)
+
+    args = parser.parse_args()
 
-    return parser.parse_args()
\ No newline at end of file
+    # The request protections are implemented by the main process request path only, so they cannot be enabled
+    #   together with worker processes (see main, which warns about the ones enabled by default).
+    if args.workers:
+        for (option, name) in (
+            ("--rateLimit", "rateLimit"), ("--shedPending", "shedPending"), ("--shedLatency", "shedLatency"),
+            ("--heartbeatTimeout", "heartbeatTimeout"), ("--controllerWeight", "controllerWeight")
+        ):
+            if getattr(args, name):
+                parser.error("argument {:s}: cannot be used together with --workers".format(option))
+    return args
\ No newline at end of file
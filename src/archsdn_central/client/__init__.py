@@ -0,0 +1,10 @@
+__all__ = ["AsyncClient",
+           "Client",
+           "RequestTimeout",
+           "ConnectionReset",
+           "LookupCache",
+           ]
+
+from .connection import AsyncClient, RequestTimeout, ConnectionReset
+from .sync import Client
+from .cache import LookupCache
@@ -0,0 +1,136 @@
+# coding=utf-8
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from archsdn_central.zmq_messages import RPLNoResultsAvailable, RPLControllerNotRegistered
+
+
+class LookupCache:
+    '''
+        Read-through cache for the client lookups (address and controller information).
+        It is a bounded LRU cache, where every entry expires after a time-to-live. Negative replies (the error messages
+          in negative_replies) are also cached, with their own time-to-live.
+        Concurrent lookups for the same key share the same in-flight request.
+        Invalidation hooks are called with the key of every entry invalidated.
+    '''
+    def __init__(self, max_entries=4096, ttl=30.0, negative_ttl=5.0,
+                 negative_replies=(RPLNoResultsAvailable, RPLControllerNotRegistered)):
+        assert isinstance(max_entries, int) and max_entries > 0, "max_entries expected to be a positive int"
+        assert ttl > 0, "ttl expected to be positive"
+        assert negative_ttl >= 0, "negative_ttl expected to be non-negative"
+
+        self.__entries = OrderedDict()
+        self.__in_flight = {}
+        self.__invalidation_hooks = []
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__negative_ttl = negative_ttl
+        self.__negative_replies = tuple(negative_replies)
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def stats(self):
+        return {
+            "entries": len(self.__entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    async def get(self, key, fetch):
+        '''
+            Returns the value cached for key, or awaits fetch() to obtain it.
+            A cached negative reply is raised again.
+        '''
+        entry = self.__entries.get(key)
+        if entry is not None:
+            (expiration, negative, value) = entry
+            if expiration > time.monotonic():
+                self.__entries.move_to_end(key)
+                if negative:
+                    self.negative_hits += 1
+                    raise value()
+                self.hits += 1
+                return value
+            del self.__entries[key]
+
+        if key in self.__in_flight:
+            self.coalesced += 1
+            return await asyncio.shield(self.__in_flight[key])
+
+        self.misses += 1
+        future = asyncio.get_event_loop().create_future()
+        self.__in_flight[key] = future
+        try:
+            value = await fetch()
+            self.__store(key, False, value, self.__ttl)
+            future.set_result(value)
+            return value
+
+        except self.__negative_replies as ex:
+            if self.__negative_ttl:
+                self.__store(key, True, type(ex), self.__negative_ttl)
+            future.set_exception(ex)
+            raise ex
+
+        except asyncio.CancelledError as ex:
+            future.cancel()
+            raise ex
+
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise ex
+
+        finally:
+            del self.__in_flight[key]
+            # Retrieve the exception, so it is not reported as never retrieved when there are no other waiters.
+            if future.done() and not future.cancelled():
+                future.exception()
+
+    def __store(self, key, negative, value, ttl):
+        self.__entries[key] = (time.monotonic() + ttl, negative, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
+            self.evictions += 1
+
+    def add_invalidation_hook(self, hook):
+        self.__invalidation_hooks.append(hook)
+
+    def remove_invalidation_hook(self, hook):
+        self.__invalidation_hooks.remove(hook)
+
+    def invalidate(self, key):
+        if key in self.__entries:
+            del self.__entries[key]
+            self.__invalidated(key)
+
+    def invalidate_if(self, predicate):
+        '''
+            Invalidates every entry for which predicate(key, negative, value) is True.
+        '''
+        keys = list((key for (key, (_, negative, value)) in self.__entries.items() if predicate(key, negative, value)))
+        for key in keys:
+            del self.__entries[key]
+            self.__invalidated(key)
+
+    def clear(self):
+        self.invalidate_if(lambda key, negative, value: True)
+
+    def __invalidated(self, key):
+        self.invalidations += 1
+        for hook in self.__invalidation_hooks:
+            hook(key)
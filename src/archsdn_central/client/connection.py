@@ -0,0 +1,347 @@
+# coding=utf-8
+
+import logging
+import asyncio
+import itertools
+from uuid import uuid4
+import zmq
+from zmq.asyncio import Context
+import blosc
+
+from archsdn_central.helpers import logger_module_name
+
+from archsdn_central.zmq_messages import BaseError, \
+    loads, dumps, dumps_header, \
+    RPLAfirmative, \
+    REQLocalTime, \
+    REQCentralNetworkPolicies, \
+    REQRegisterController, REQQueryControllerInfo, REQUnregisterController, \
+    REQUpdateControllerInfo, REQUnregisterAllClients, REQIsControllerRegistered, REQHeartbeat, \
+    REQRegisterControllerClient, REQRegisterControllerClients, REQRemoveControllerClient, REQIsClientAssociated, \
+    REQClientInformation, \
+    REQAddressInfo, \
+    REQListControllers, REQListClients, \
+    REQSnapshot, \
+    REQMetrics, REQProfiler, REQMemoryDiagnostics, \
+    REQRegisterLink, REQRemoveLink, REQPathQuery
+
+_log = logging.getLogger(logger_module_name(__file__))
+
+# Requests which do not change the central manager state (or leave it the same when repeated, like the heartbeats and
+#   the link registrations), and which are safely retried without an idempotency key.
+_idempotent_requests = {
+    REQLocalTime,
+    REQCentralNetworkPolicies,
+    REQQueryControllerInfo,
+    REQIsControllerRegistered,
+    REQHeartbeat,
+    REQIsClientAssociated,
+    REQClientInformation,
+    REQAddressInfo,
+    REQListControllers,
+    REQListClients,
+    REQMetrics,
+    REQRegisterLink,
+    REQPathQuery,
+}
+
+
+class RequestTimeout(Exception):
+    def __str__(self):
+        return "Request deadline expired"
+
+
+class ConnectionReset(Exception):
+    def __str__(self):
+        return "Connection reset while waiting for the reply"
+
+
+class _Connection:
+    '''
+        DEALER socket connected to the central manager.
+        Every request is sent with its request id as routing envelope, which is returned by the central manager with
+          the reply. This allows multiple requests to be in-flight in the same socket.
+        Every request is also sent with a header holding its timeout, so the central manager does not process the
+          requests it would reply after the client gave up on them, and its idempotency key, if any.
+    '''
+    def __init__(self, context, location):
+        self.__context = context
+        self.__location = location
+        self.__pending = {}
+        self.__socket = None
+        self.__receiver = None
+        self.connect()
+
+    def connect(self):
+        self.__socket = self.__context.socket(zmq.DEALER)
+        self.__socket.setsockopt(zmq.LINGER, 0)
+        self.__socket.connect(self.__location)
+        self.__receiver = asyncio.get_event_loop().create_task(self.__recv_replies(self.__socket))
+
+    def close(self):
+        self.__receiver.cancel()
+        self.__socket.close()
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_exception(ConnectionReset())
+        self.__pending.clear()
+
+    def reconnect(self):
+        '''
+            Discards the socket, together with the requests still queued in it, and connects a new one.
+        '''
+        self.close()
+        self.connect()
+
+    async def __recv_replies(self, socket):
+        while True:
+            frames = await socket.recv_multipart()
+            future = self.__pending.pop(frames[0], None)
+            if future and not future.done():
+                future.set_result(frames[-1])
+
+    async def request(self, request_id, frame, timeout, header=None):
+        future = asyncio.get_event_loop().create_future()
+        self.__pending[request_id] = future
+        try:
+            await self.__socket.send_multipart(
+                (request_id, b'', dumps_header(dict(header or {}, timeout_ms=int(timeout * 1000))), frame)
+            )
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise RequestTimeout()
+        finally:
+            if self.__pending.get(request_id) is future:
+                del self.__pending[request_id]
+
+
+class AsyncClient:
+    '''
+        Asynchronous client for the ArchSDN Central Manager.
+        Requests are distributed over a pool of connections, and each connection can have multiple requests in-flight.
+        A request without reply until its deadline causes its connection to be re-established. Requests which do not
+          change the central manager state are retried, up to the configured number of retries. Requests which change
+          it are sent with an idempotency key (the client peer id and the request id of the first attempt), and are
+          only retried with retry_mutations: their retries are replied with the reply to the first attempt, if it was
+          processed, only by central managers which de-duplicate them (a single process, with the --dedupCache option).
+          Otherwise, a retry of a processed registration would be replied with e.g. RPLControllerAlreadyRegistered.
+        The typed methods raise the error messages replied by the central manager (e.g. RPLControllerNotRegistered).
+        If a LookupCache is given, the address and controller information lookups are served through it, and the
+          requests changing registrations invalidate the affected entries.
+    '''
+    def __init__(self, location="tcp://127.0.0.1:12345", connections=1, timeout=5.0, retries=2, cache=None,
+                 retry_mutations=False):
+        assert isinstance(connections, int) and connections > 0, "connections expected to be a positive int"
+        assert timeout > 0, "timeout expected to be positive"
+        assert isinstance(retries, int) and retries >= 0, "retries expected to be a non-negative int"
+
+        self.__context = Context()
+        self.__connections = list((_Connection(self.__context, location) for _ in range(connections)))
+        self.__connections_cycle = itertools.cycle(self.__connections)
+        self.__request_ids = itertools.count(1)
+        self.__peer = uuid4().bytes
+        self.__timeout = timeout
+        self.__retries = retries
+        self.__retry_mutations = retry_mutations
+        self.__cache = cache
+
+    def close(self):
+        for connection in self.__connections:
+            connection.close()
+        self.__context.destroy(linger=0)
+
+    async def request(self, request, timeout=None):
+        '''
+            Sends a request and returns the reply message, without raising the error messages.
+        '''
+        frame = blosc.compress(dumps(request))
+        timeout = timeout if timeout is not None else self.__timeout
+        attempts = (self.__retries + 1) if self.__retry_mutations or (type(request) in _idempotent_requests) else 1
+        header = None
+
+        for attempt in range(attempts):
+            connection = next(self.__connections_cycle)
+            request_id = next(self.__request_ids).to_bytes(8, 'big')
+            if (header is None) and (type(request) not in _idempotent_requests):
+                header = {"peer": self.__peer, "request_id": request_id}
+            try:
+                reply = await connection.request(request_id, frame, timeout, header)
+                return loads(blosc.decompress(reply))
+
+            except RequestTimeout as ex:
+                _log.warning("Request {:s} expired (attempt {:d} of {:d}).".format(
+                    repr(request), attempt + 1, attempts))
+                connection.reconnect()
+                if attempt + 1 == attempts:
+                    raise ex
+
+            except ConnectionReset as ex:
+                if attempt + 1 == attempts:
+                    raise ex
+
+    async def __call(self, request, timeout):
+        reply = await self.request(request, timeout)
+        if isinstance(reply, BaseError):
+            raise reply
+        return reply
+
+    async def __cached_call(self, key, request, timeout):
+        if self.__cache is None:
+            return await self.__call(request, timeout)
+        return await self.__cache.get(key, lambda: self.__call(request, timeout))
+
+    def __invalidate_controller(self, controller_id):
+        '''
+            Invalidates the cached information about a controller and the addresses it holds.
+        '''
+        if self.__cache is not None:
+            self.__cache.invalidate_if(
+                lambda key, negative, value:
+                    key == ("controller", controller_id) or
+                    (key[0] == "address" and not negative and value.controller_id == controller_id)
+            )
+
+    def __invalidate_negative(self):
+        '''
+            Invalidates the cached negative replies, which new registrations can turn stale.
+        '''
+        if self.__cache is not None:
+            self.__cache.invalidate_if(lambda key, negative, value: negative)
+
+    async def local_time(self, timeout=None):
+        return await self.__call(REQLocalTime(), timeout)
+
+    async def central_network_policies(self, timeout=None):
+        return await self.__call(REQCentralNetworkPolicies(), timeout)
+
+    async def register_controller(self, controller_id, ipv4_info=None, ipv6_info=None, timeout=None):
+        try:
+            await self.__call(REQRegisterController(controller_id, ipv4_info, ipv6_info), timeout)
+        finally:
+            self.__invalidate_negative()
+
+    async def query_controller_info(self, controller_id, timeout=None):
+        return await self.__cached_call(
+            ("controller", controller_id), REQQueryControllerInfo(controller_id), timeout
+        )
+
+    async def remove_controller(self, controller_id, timeout=None):
+        try:
+            await self.__call(REQUnregisterController(controller_id), timeout)
+        finally:
+            self.__invalidate_controller(controller_id)
+
+    async def is_controller_registered(self, controller_id, timeout=None):
+        return isinstance(await self.__call(REQIsControllerRegistered(controller_id), timeout), RPLAfirmative)
+
+    async def heartbeat(self, controller_id, timeout=None):
+        await self.__call(REQHeartbeat(controller_id), timeout)
+
+    async def update_controller_addresses(self, controller_id, ipv4_info=None, ipv6_info=None, timeout=None):
+        try:
+            await self.__call(REQUpdateControllerInfo(controller_id, ipv4_info, ipv6_info), timeout)
+        finally:
+            self.__invalidate_controller(controller_id)
+            self.__invalidate_negative()
+
+    async def remove_all_clients(self, controller_id, timeout=None):
+        try:
+            await self.__call(REQUnregisterAllClients(controller_id), timeout)
+        finally:
+            self.__invalidate_controller(controller_id)
+
+    async def register_client(self, controller_id, client_id, timeout=None):
+        try:
+            await self.__call(REQRegisterControllerClient(controller_id, client_id), timeout)
+        finally:
+            self.__invalidate_negative()
+
+    async def register_clients(self, controller_id, client_ids, timeout=None):
+        try:
+            await self.__call(REQRegisterControllerClients(controller_id, tuple(client_ids)), timeout)
+        finally:
+            self.__invalidate_negative()
+
+    async def query_client_info(self, controller_id, client_id, timeout=None):
+        return await self.__call(REQClientInformation(controller_id, client_id), timeout)
+
+    async def remove_client(self, controller_id, client_id, timeout=None):
+        try:
+            await self.__call(REQRemoveControllerClient(controller_id, client_id), timeout)
+        finally:
+            self.__invalidate_controller(controller_id)
+
+    async def is_client_registered(self, controller_id, client_id, timeout=None):
+        return isinstance(await self.__call(REQIsClientAssociated(controller_id, client_id), timeout), RPLAfirmative)
+
+    async def query_address_info(self, ipv4=None, ipv6=None, timeout=None):
+        return await self.__cached_call(("address", ipv4, ipv6), REQAddressInfo(ipv4, ipv6), timeout)
+
+    async def snapshot(self, timeout=None):
+        '''
+            Requests a snapshot of the central manager database. Returns the RPLSnapshot reply, with its name and size.
+        '''
+        return await self.__call(REQSnapshot(), timeout)
+
+    async def metrics(self, timeout=None):
+        '''
+            Requests the central manager metrics. Returns the metrics dict of the RPLMetrics reply.
+        '''
+        return (await self.__call(REQMetrics(), timeout)).metrics
+
+    async def profiler(self, enable, timeout=None):
+        '''
+            Starts (enable) or stops the central manager sampling profiler. Returns the RPLProfile reply, which has the
+              location of the profile written when the profiler is stopped.
+        '''
+        return await self.__call(REQProfiler(enable), timeout)
+
+    async def memory_diagnostics(self, action="report", timeout=None):
+        '''
+            Starts ("start") or stops ("stop") the central manager memory diagnostics, or requests their report
+              ("report"). Returns the RPLMemoryReport reply.
+        '''
+        return await self.__call(REQMemoryDiagnostics(action), timeout)
+
+    async def register_link(self, controller_id, peer_id, capacity, latency, timeout=None):
+        await self.__call(REQRegisterLink(controller_id, peer_id, capacity, latency), timeout)
+
+    async def remove_link(self, controller_id, peer_id, timeout=None):
+        await self.__call(REQRemoveLink(controller_id, peer_id), timeout)
+
+    async def query_path(self, controller_id, destination_id, timeout=None):
+        '''
+            Queries the lowest latency path between the sectors of two controllers. Returns the RPLPath reply, with the
+              path, its latency and its capacity.
+        '''
+        return await self.__call(REQPathQuery(controller_id, destination_id), timeout)
+
+    async def list_controllers_page(self, cursor=0, limit=100, timeout=None):
+        return await self.__call(REQListControllers(cursor, limit), timeout)
+
+    async def list_clients_page(self, controller_id, cursor=0, limit=100, timeout=None):
+        return await self.__call(REQListClients(controller_id, cursor, limit), timeout)
+
+    async def list_controllers(self, page_size=100, timeout=None):
+        '''
+            Yields the (controller_id, ipv4_info, ipv6_info, name, registration_date) of every registered controller.
+            The controllers are requested one page at a time, as the generator is consumed.
+        '''
+        cursor = 0
+        while cursor is not None:
+            page = await self.list_controllers_page(cursor, page_size, timeout)
+            for controller in page.controllers:
+                yield controller
+            cursor = page.cursor
+
+    async def list_clients(self, controller_id, page_size=100, timeout=None):
+        '''
+            Yields the (client_id, ipv4, ipv6, name, registration_date) of every client registered by a controller.
+            The clients are requested one page at a time, as the generator is consumed.
+        '''
+        cursor = 0
+        while cursor is not None:
+            page = await self.list_clients_page(controller_id, cursor, page_size, timeout)
+            for client in page.clients:
+                yield client
+            cursor = page.cursor
@@ -0,0 +1,71 @@
+# coding=utf-8
+
+import asyncio
+import inspect
+from threading import Thread, Event
+
+from .connection import AsyncClient
+
+
+class Client:
+    '''
+        Blocking client for the ArchSDN Central Manager.
+        It runs an AsyncClient in a dedicated thread with its own event loop, and exposes the same methods as
+          blocking calls. The asynchronous generators (e.g. list_controllers) are exposed as generators.
+    '''
+    def __init__(self, *args, **kwargs):
+        self.__thread_loop = asyncio.new_event_loop()
+        self.__shutdown_event = Event()
+        boot_event = Event()
+
+        def client_thread_main(event_loop):
+            try:
+                asyncio.set_event_loop(event_loop)
+                event_loop.call_soon(boot_event.set)
+                event_loop.run_forever()
+            finally:
+                self.__shutdown_event.set()
+
+        self.__client_thread = Thread(target=client_thread_main, args=(self.__thread_loop,), daemon=True)
+        self.__client_thread.start()
+        boot_event.wait()
+
+        async def create_client():
+            return AsyncClient(*args, **kwargs)
+
+        self.__client = asyncio.run_coroutine_threadsafe(create_client(), self.__thread_loop).result()
+
+    def close(self):
+        async def close_client():
+            self.__client.close()
+
+        asyncio.run_coroutine_threadsafe(close_client(), self.__thread_loop).result()
+        self.__thread_loop.call_soon_threadsafe(self.__thread_loop.stop)
+        self.__shutdown_event.wait()
+        self.__thread_loop.close()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError("client has no member called {:s}".format(name))
+        method = getattr(self.__client, name)
+
+        if inspect.isasyncgenfunction(method):
+            def attr(*args, **kwargs):
+                generator = method(*args, **kwargs)
+
+                async def next_item():
+                    return await generator.__anext__()
+
+                try:
+                    while True:
+                        yield asyncio.run_coroutine_threadsafe(next_item(), self.__thread_loop).result()
+                except StopAsyncIteration:
+                    pass
+                finally:
+                    asyncio.run_coroutine_threadsafe(generator.aclose(), self.__thread_loop).result()
+            return attr
+
+        def attr(*args, **kwargs):
+            return asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self.__thread_loop).result()
+
+        return attr
@@ -5,13 +5,26 @@ __all__ = ["initialise",
            "query_controller_info",
            "remove_controller",
            "is_controller_registered",
+           "list_controllers",
            "update_controller_addresses",
            "remove_all_clients",
+           "release_clients",
            "register_client",
+           "register_clients",
            "query_client_info",
            "remove_client",
            "is_client_registered",
+           "list_clients",
            "query_address_info",
+           "warm_up",
+           "migrate",
+           "configure_snapshots",
+           "snapshot",
+           "index_names",
+           "register_link",
+           "remove_link",
+           "query_path",
+           "topology_metrics",
            "ControllerNotRegistered",
            "ControllerAlreadyRegistered",
            "ClientNotRegistered",
@@ -19,15 +32,27 @@ __all__ = ["initialise",
            "IPv4InfoAlreadyRegistered",
            "IPv6InfoAlreadyRegistered",
            "NoResultsAvailable",
+           "SnapshotsNotConfigured",
+           "IntegrityCheckFailed",
+           "AddressPoolExhausted",
+           "DeadlineExpired",
+           "LinkNotRegistered",
            ]
 
 
 import asyncio
+import concurrent.futures
 from threading import Thread, Event
 import sys
+import time
 import atexit
 import logging
 from archsdn_central.helpers import logger_module_name
+from archsdn_central import loop_monitor
+from archsdn_central import profiler
+from archsdn_central import deadlines
+
+from .lanes import LaneScheduler as __LaneScheduler, operation_lanes as _operation_lanes
 
 from .internals.exceptions import \
     ControllerNotRegistered as __ControllerNotRegistered, \
@@ -36,7 +61,12 @@ from .internals.exceptions import \
     ClientAlreadyRegistered as __ClientAlreadyRegistered, \
     IPv4InfoAlreadyRegistered as __IPv4InfoAlreadyRegistered, \
     IPv6InfoAlreadyRegistered as __IPv6InfoAlreadyRegistered,  \
-    NoResultsAvailable as __NoResultsAvailable
+    NoResultsAvailable as __NoResultsAvailable, \
+    SnapshotsNotConfigured as __SnapshotsNotConfigured, \
+    IntegrityCheckFailed as __IntegrityCheckFailed, \
+    AddressPoolExhausted as __AddressPoolExhausted, \
+    DeadlineExpired as __DeadlineExpired, \
+    LinkNotRegistered as __LinkNotRegistered
 
 from .internals import \
     init_database as __initialise, \
@@ -46,13 +76,26 @@ from .internals import \
     controller_infos as __query_controller_info, \
     remove_controller as __remove_controller, \
     is_controller_registered as __is_controller_registered, \
+    controllers_page as __list_controllers, \
     update_controller_addresses as __update_controller_addresses, \
     remove_all_clients as __remove_all_clients, \
+    release_clients as __release_clients, \
     register_client as __register_client, \
+    register_clients as __register_clients, \
     client_info as __query_client_info, \
     remove_client as __remove_client, \
     is_client_registered as __is_client_registered, \
-    query_address_info as __query_address_info
+    clients_page as __list_clients, \
+    query_address_info as __query_address_info, \
+    warm_up as __warm_up, \
+    migrate as __migrate, \
+    configure_snapshots as __configure_snapshots, \
+    snapshot as __snapshot, \
+    index_names as __index_names, \
+    register_link as __register_link, \
+    remove_link as __remove_link, \
+    query_path as __query_path, \
+    topology_metrics as __topology_metrics
 
 __log = logging.getLogger(logger_module_name(__file__))
 
@@ -65,13 +108,26 @@ _callbacks = {
     "query_controller_info": __query_controller_info,
     "remove_controller": __remove_controller,
     "is_controller_registered": __is_controller_registered,
+    "list_controllers": __list_controllers,
     "update_controller_addresses": __update_controller_addresses,
     "remove_all_clients": __remove_all_clients,
+    "release_clients": __release_clients,
     "register_client": __register_client,
+    "register_clients": __register_clients,
     "query_client_info": __query_client_info,
     "remove_client": __remove_client,
     "is_client_registered": __is_client_registered,
-    "query_address_info": __query_address_info
+    "list_clients": __list_clients,
+    "query_address_info": __query_address_info,
+    "warm_up": __warm_up,
+    "migrate": __migrate,
+    "configure_snapshots": __configure_snapshots,
+    "snapshot": __snapshot,
+    "index_names": __index_names,
+    "register_link": __register_link,
+    "remove_link": __remove_link,
+    "query_path": __query_path,
+    "topology_metrics": __topology_metrics
 }
 
 _exceptions = {
@@ -81,13 +137,39 @@ _exceptions = {
     "ClientAlreadyRegistered": __ClientAlreadyRegistered,
     "IPv4InfoAlreadyRegistered": __IPv4InfoAlreadyRegistered,
     "IPv6InfoAlreadyRegistered": __IPv6InfoAlreadyRegistered,
-    "NoResultsAvailable": __NoResultsAvailable
+    "NoResultsAvailable": __NoResultsAvailable,
+    "SnapshotsNotConfigured": __SnapshotsNotConfigured,
+    "IntegrityCheckFailed": __IntegrityCheckFailed,
+    "AddressPoolExhausted": __AddressPoolExhausted,
+    "DeadlineExpired": __DeadlineExpired,
+    "LinkNotRegistered": __LinkNotRegistered
 }
 
+profiler.label_functions(dict(((callback, "database.{:s}".format(name)) for (name, callback) in _callbacks.items())))
+
 
 class __Wrapper:
-    def __init__(self, wrapped):
+    '''
+        Replaces the database module, forwarding the database operations to the database thread.
+        The database thread and its event loop are only started by the first operation (normally initialise), so
+          importing the module is cheap.
+        The operations are scheduled by priority (see lanes.LaneScheduler): point reads run before point writes, which
+          run before bulk and maintenance operations, so a queued bulk operation does not delay the cheap reads queued
+          after it.
+        Operations submitted while processing a request with a deadline (see deadlines) raise DeadlineExpired, without
+          running, if the deadline expires before they are submitted or taken by the database thread.
+        Besides the database operations, it provides monitor(interval, threshold), which starts the lag monitor of the
+          database thread loop (see loop_monitor), lanes_metrics(), which returns the metrics of the lanes, latency(),
+          which returns the current latency of the operations (see lanes.LaneScheduler.latency), and shutdown.
+    '''
+    def __init__(self, wrapped, scheduler):
         self.__wrapped = wrapped
+        self.__scheduler = scheduler
+        self.__thread_loop = None
+        self.__shutdown_event = None
+        self.__database_thread = None
+
+    def __start(self):
         self.__thread_loop = asyncio.new_event_loop()
         self.__shutdown_event = Event()
         boot_event = Event()
@@ -108,32 +190,103 @@ class __Wrapper:
             finally:
                 self.__shutdown_event.set()
 
-        self.__database_thread = Thread(target=database_thread_main, args=(self.__thread_loop,), daemon=True)
+        self.__database_thread = Thread(
+            target=database_thread_main, args=(self.__thread_loop,), name="database", daemon=True
+        )
         self.__database_thread.start()
         boot_event.wait()
 
+    def __run_next(self):
+        '''
+            Runs the next scheduled operation, in the database thread.
+        '''
+        scheduled = self.__scheduler.get()
+        if scheduled is None:
+            return
+        (lane, waited, (name, args, kwargs, future, deadline, request_type)) = scheduled
+        if not future.set_running_or_notify_cancel():
+            return
+        if deadlines.expired(deadline, request_type, "database"):
+            future.set_exception(_exceptions["DeadlineExpired"]())
+            return
+        start = time.monotonic()
+
+        def done(result=None, exception=None):
+            self.__scheduler.record(lane, waited, time.monotonic() - start)
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+        def task_done(task):
+            # The future is already running, so it cannot be cancelled: the cancellation is set as its exception.
+            if task.cancelled():
+                done(exception=asyncio.CancelledError())
+            elif task.exception() is not None:
+                done(exception=task.exception())
+            else:
+                done(task.result())
+
+        try:
+            result = _callbacks[name](*args, **kwargs)
+        except Exception as ex:
+            done(exception=ex)
+            return
+
+        # Operations which wait for work outside the database thread (e.g. snapshot) are coroutines.
+        if asyncio.iscoroutine(result):
+            self.__thread_loop.create_task(result).add_done_callback(task_done)
+        else:
+            done(result)
+
     def __getattr__(self, name):
         if name in _exceptions:
             return _exceptions[name]
 
-        if (name != 'shutdown') and (name not in _callbacks):
+        if (name not in ('shutdown', 'monitor', 'lanes_metrics', 'latency')) and (name not in _callbacks):
             raise AttributeError("module has no member called {:s}".format(name))
 
-        if name is 'shutdown':
+        if name == 'latency':
+            # Not a coroutine function: it is called for every received request.
+            return self.__scheduler.latency
+
+        if name == 'lanes_metrics':
+            # A coroutine function, like the operations, although it does not run in the database thread.
+            async def attr():
+                return self.__scheduler.metrics()
+            return attr
+
+        if name == 'monitor':
+            def attr(interval=0.1, threshold=0.25):
+                if self.__database_thread is None:
+                    self.__start()
+                loop_monitor.monitor(self.__thread_loop, "database", interval, threshold)
+            return attr
+
+        if name == 'shutdown':
             def attr():
+                if self.__database_thread is None:
+                    return
+                loop_monitor.stop("database")
                 self.__thread_loop.call_soon_threadsafe(self.__thread_loop.stop)
                 self.__shutdown_event.wait()
                 self.__thread_loop.call_soon_threadsafe(self.__thread_loop.close)
             return attr
 
         def attr(*args, **kwargs):
-            async def cr(*args, **kwargs):
-                return _callbacks[name](*args, **kwargs)
-
-            return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(cr(*args, **kwargs), self.__thread_loop))
+            deadlines.check("submit")
+            if self.__database_thread is None:
+                self.__start()
+            future = concurrent.futures.Future()
+            self.__scheduler.put(
+                _operation_lanes.get(name, "bulk"),
+                (name, args, kwargs, future, deadlines.current(), deadlines.current_request_type())
+            )
+            self.__thread_loop.call_soon_threadsafe(self.__run_next)
+            return asyncio.wrap_future(future)
 
         return attr
 
 
-sys.modules[__name__] = __Wrapper(sys.modules[__name__])
+sys.modules[__name__] = __Wrapper(sys.modules[__name__], __LaneScheduler())
 atexit.register(sys.modules[__name__].shutdown)
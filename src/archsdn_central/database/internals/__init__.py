@@ -5,26 +5,54 @@ __all__ = ["init_database",
            "controller_infos",
            "remove_controller",
            "is_controller_registered",
+           "controllers_page",
            "update_controller_addresses",
            "remove_all_clients",
+           "release_clients",
            "register_client",
+           "register_clients",
            "client_info",
            "remove_client",
            "is_client_registered",
-            "query_address_info"
+           "clients_page",
+            "query_address_info",
+           "warm_up",
+           "migrate",
+           "configure_snapshots",
+           "snapshot",
+           "index_names",
+           "register_link",
+           "remove_link",
+           "query_path",
+           "topology_metrics"
            ]
 
 from .generics import init_database, close_database, info
+from .warmup import warm_up
+from .schema import migrate
 from .controller import \
     register as register_controller, \
     infos as controller_infos, \
     remove as remove_controller, \
     is_registered as is_controller_registered, \
+    page as controllers_page, \
     update_addresses as update_controller_addresses, \
-    clean_slate as remove_all_clients
+    clean_slate as remove_all_clients, \
+    release_clients
 from .client import \
     register as register_client, \
+    register_many as register_clients, \
     info as client_info, \
     remove as remove_client, \
     exists as is_client_registered, \
+    page as clients_page, \
     query_address_info
+from .snapshot import \
+    configure as configure_snapshots, \
+    snapshot
+from .names import enable as index_names
+from .topology import \
+    register_link, \
+    remove_link, \
+    query_path, \
+    metrics as topology_metrics
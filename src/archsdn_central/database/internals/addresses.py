@@ -0,0 +1,178 @@
+# Bulk address engine.
+# The client addresses are allocated by id: the address of the id n is the network address plus n. The used ids of a
+#   pool are loaded from its table (clients_ipv4s or clients_ipv6s), sorted, and the free ranges, the next free ids and
+#   the collisions are computed over the whole pool at once.
+# With NumPy installed, the computations are vectorized. Otherwise, an equivalent pure Python implementation is used.
+#
+import itertools
+import bisect
+
+from .exceptions import AddressPoolExhausted
+
+# The ids are 64 bits signed integers, so the IPv6 pools are limited to the first 2^63 - 1 addresses.
+__max_id = (1 << 63) - 1
+
+__backend = None
+
+
+def backend():
+    '''
+        Returns the numpy module if it is installed and enabled, or None otherwise. NumPy is only imported when the
+          engine is first used.
+    '''
+    global __backend
+    if __backend is None:
+        try:
+            import numpy
+            __backend = numpy
+        except ImportError:
+            __backend = False
+    return __backend if __backend is not False else None
+
+
+def use_numpy(enabled):
+    '''
+        Enables or disables the NumPy implementation.
+    '''
+    global __backend
+    __backend = None if enabled else False
+
+
+def pool_limits(network):
+    '''
+        Returns the first and last ids which can be allocated in network. The network address is never allocated,
+          neither is the broadcast address of IPv4 networks.
+    '''
+    last = network.num_addresses - (2 if network.version == 4 else 1)
+    return (1, min(last, __max_id))
+
+
+def used_ids(db_cursor, table):
+    '''
+        Returns the sorted ids used in table, as an array (or a list, without NumPy).
+    '''
+    db_cursor.execute("SELECT id FROM {:s} ORDER BY id".format(table))
+    numpy = backend()
+    if numpy:
+        return numpy.fromiter((row[0] for row in db_cursor), dtype=numpy.int64)
+    return list((row[0] for row in db_cursor))
+
+
+def free_ranges(ids, first, last):
+    '''
+        Returns the (start, stop) inclusive ranges of the ids between first and last which are not in the sorted ids.
+    '''
+    numpy = backend()
+    if numpy:
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        ids = ids[(ids >= first) & (ids <= last)]
+        starts = numpy.concatenate(((first,), ids + 1))
+        stops = numpy.concatenate((ids - 1, (last,)))
+        free = starts <= stops
+        return numpy.stack((starts[free], stops[free]), axis=1)
+
+    ranges = []
+    start = first
+    for used in ids:
+        if used < first or used > last:
+            continue
+        if used > start:
+            ranges.append((start, used - 1))
+        start = used + 1
+    if start <= last:
+        ranges.append((start, last))
+    return ranges
+
+
+def next_free(ids, count, first, last, after=None):
+    '''
+        Returns count free ids, in allocation order: the free ids after the id after (by default, the largest used id),
+          followed by the free ids from first, when the end of the pool is reached.
+        Raises AddressPoolExhausted if the pool has less than count free ids.
+    '''
+    if after is None:
+        after = ids[-1] if len(ids) else first - 1
+    numpy = backend()
+    if numpy:
+        ranges = free_ranges(ids, first, last)
+        (starts, stops) = (ranges[:, 0], ranges[:, 1])
+        upper = stops > after
+        lower = starts <= after
+        starts = numpy.concatenate((numpy.maximum(starts[upper], after + 1), starts[lower]))
+        stops = numpy.concatenate((stops[upper], numpy.minimum(stops[lower], after)))
+        lengths = stops - starts + 1
+        totals = lengths.cumsum()
+        if count == 0:
+            return numpy.empty(0, dtype=numpy.int64)
+        if len(totals) == 0 or totals[-1] < count:
+            raise AddressPoolExhausted()
+        needed = int(numpy.searchsorted(totals, count)) + 1
+        (starts, lengths) = (starts[:needed], lengths[:needed].copy())
+        lengths[-1] -= totals[needed - 1] - count
+        offsets = numpy.concatenate(((0,), lengths.cumsum()[:-1]))
+        return numpy.repeat(starts - offsets, lengths) + numpy.arange(count, dtype=numpy.int64)
+
+    ranges = free_ranges(ids, first, last)
+    ordered = list(((max(start, after + 1), stop) for (start, stop) in ranges if stop > after))
+    ordered.extend(((start, min(stop, after)) for (start, stop) in ranges if start <= after))
+    result = list(itertools.islice(
+        itertools.chain.from_iterable((range(start, stop + 1) for (start, stop) in ordered)), count
+    ))
+    if len(result) < count:
+        raise AddressPoolExhausted()
+    return result
+
+
+def collisions(ids, candidates):
+    '''
+        Returns the candidates which are in the sorted ids.
+    '''
+    numpy = backend()
+    if numpy:
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        candidates = numpy.asarray(candidates, dtype=numpy.int64)
+        return candidates[numpy.isin(candidates, ids, assume_unique=False)]
+
+    result = []
+    for candidate in candidates:
+        index = bisect.bisect_left(ids, candidate)
+        if index < len(ids) and ids[index] == candidate:
+            result.append(candidate)
+    return result
+
+
+def ipv4_addresses(network, ids):
+    '''
+        Returns the list of the IPv4 addresses of ids in network, as ints, as stored in clients_ipv4s.
+    '''
+    base = int(network.network_address)
+    numpy = backend()
+    if numpy:
+        return (numpy.asarray(ids, dtype=numpy.int64) + base).tolist()
+    return list((base + int(i) for i in ids))
+
+
+def ipv6_addresses(network, ids):
+    '''
+        Returns the list of the IPv6 addresses of ids in network, as 16 bytes big endian values, as stored in
+          clients_ipv6s.
+    '''
+    base = int(network.network_address)
+    numpy = backend()
+    if numpy:
+        ids = numpy.asarray(ids, dtype=numpy.int64).astype(numpy.uint64)
+        low = ids + numpy.uint64(base & 0xFFFFFFFFFFFFFFFF)
+        high = (low < ids).astype(numpy.uint64) + numpy.uint64(base >> 64)
+        packed = numpy.empty((len(ids), 2), dtype=">u8")
+        packed[:, 0] = high
+        packed[:, 1] = low
+        data = packed.tobytes()
+        return list((data[offset:offset + 16] for offset in range(0, len(data), 16)))
+    return list(((base + int(i)).to_bytes(16, 'big') for i in ids))
+
+
+def to_list(ids):
+    '''
+        Returns ids as a list of ints, which can be bound to SQLite statements.
+    '''
+    return ids.tolist() if hasattr(ids, "tolist") else list(ids)
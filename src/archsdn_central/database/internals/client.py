@@ -1,18 +1,42 @@
 import logging
 import sqlite3
 import time
+import itertools
 from uuid import UUID
 from contextlib import closing
 from ipaddress import IPv4Network, IPv6Network, IPv4Address, IPv6Address
 
 from archsdn_central.helpers import logger_module_name
 
-from .shared_data import GetConnector
+from .shared_data import GetConnector, GetControllerIds
+from .addresses import pool_limits, used_ids, next_free, collisions, ipv4_addresses, ipv6_addresses, to_list
 from .exceptions import ControllerNotRegistered, ClientNotRegistered, ClientAlreadyRegistered, NoResultsAvailable
+from . import names
 
 __log = logging.getLogger(logger_module_name(__file__))
 
 
+def client_name(client_id, controller_uuid):
+    '''
+        Returns the name of a client, which is derived from its id and the uuid of its controller.
+    '''
+    return ".".join((str(client_id), str(controller_uuid), "archsdn"))
+
+
+def allocate(db_cursor, table, network, count):
+    '''
+        Returns count free ids of the address pool of network, whose used ids are in table.
+        The ids are allocated sequentially after the largest used id. The used ids are only loaded by the address engine
+          when the end of the pool is reached, to reuse the ids freed since.
+    '''
+    (first, last) = pool_limits(network)
+    db_cursor.execute("SELECT max(id) FROM {:s}".format(table))
+    largest = db_cursor.fetchone()[0] or 0
+    if largest + count <= last:
+        return range(largest + 1, largest + count + 1)
+    return next_free(used_ids(db_cursor, table), count, first, last)
+
+
 def register(client_id, controller_uuid):
     assert GetConnector(), "database not initialized"
     assert not GetConnector().in_transaction, "database with active transaction"
@@ -23,79 +47,104 @@ def register(client_id, controller_uuid):
     try:
         database_connector = GetConnector()
         with closing(database_connector.cursor()) as db_cursor:
-            db_cursor.execute("SELECT id FROM controllers WHERE uuid == ?", (controller_uuid.bytes,))
-
-            res = db_cursor.fetchone()
-            if res is None:
+            controller_id = GetControllerIds().get(controller_uuid.bytes)
+            if controller_id is None:
                 raise ControllerNotRegistered()
-            controller_id = res[0]
 
             db_cursor.execute("SELECT ipv4_network, ipv6_network FROM configurations")
             res = db_cursor.fetchone()
             ipv4_network = IPv4Network(res[0])
             ipv6_network = IPv6Network(res[1])
 
-            # Generating a private IPv4 for a new client registration
-            db_cursor.execute("SELECT max(id) FROM clients_ipv4s")
-            res = db_cursor.fetchone()[0]
-            if res:
-                if res == ipv4_network.num_addresses:
-                    ipv4_id = 1
-                    while True:
-                        db_cursor.execute("SELECT count(id) FROM clients_ipv4s WHERE id == ?", (ipv4_id,))
-                        res = db_cursor.fetchone()[0]
-                        if not res:
-                            break
-                        ipv4_id += 1
-                else:
-                    ipv4_id = res+1
-            else:
-                ipv4_id = 1
-
+            # Generating a private IPv4 and IPv6 for a new client registration
+            ipv4_id = int(allocate(db_cursor, "clients_ipv4s", ipv4_network, 1)[0])
             ipv4_address = ipv4_network.network_address + ipv4_id
             db_cursor.execute("INSERT INTO clients_ipv4s(id, address) VALUES (?,?)", (ipv4_id, int(ipv4_address),))
 
-            # Generating a private IPv6 for a new client registration
-            db_cursor.execute("SELECT max(id) FROM clients_ipv6s")
-            res = db_cursor.fetchone()[0]
-            if res:
-                if res == ipv6_network.num_addresses:
-                    ipv6_id = 1
-                    while True:
-                        db_cursor.execute("SELECT count(id) FROM clients_ipv6s WHERE id == ?", (ipv6_id,))
-                        res = db_cursor.fetchone()[0]
-                        if not res:
-                            break
-                        ipv6_id += 1
-                else:
-                    ipv6_id = res+1
-            else:
-                ipv6_id = 1
-
+            ipv6_id = int(allocate(db_cursor, "clients_ipv6s", ipv6_network, 1)[0])
             ipv6_address = ipv6_network.network_address + ipv6_id
             db_cursor.execute("INSERT INTO clients_ipv6s(id, address) VALUES (?,?)", (ipv6_id, ipv6_address.packed,))
 
-            hostname = (".".join((str(client_id), str(controller_uuid), "archsdn")))
-            db_cursor.execute("INSERT INTO names(name) "
-                              "VALUES (?)", (hostname,))
-            name_id = db_cursor.lastrowid
-
-            db_cursor.execute("INSERT INTO clients(id, controller, ipv4, ipv6, name) VALUES (?,?,?,?,?)",
+            db_cursor.execute("INSERT INTO clients(id, controller, ipv4, ipv6, ipv4_address, ipv6_address) "
+                              "VALUES (?,?,?,?,?,?)",
                               (client_id,
                                controller_id,
                                ipv4_id,
                                ipv6_id,
-                               name_id
+                               int(ipv4_address),
+                               ipv6_address.packed
                                )
                               )
             database_connector.commit()
             assert not GetConnector().in_transaction, "database with active transaction"
+            if names.enabled():
+                names.add_clients(controller_uuid.bytes, (client_id,), (int(ipv4_address),), (ipv6_address.packed,))
             return
 
     except sqlite3.IntegrityError as ex:
         __log.error(str(ex))
         assert not GetConnector().in_transaction, "database with active transaction"
-        if "names.name" in ex.args[0]:
+        if "clients.id, clients.controller" in ex.args[0]:
+            raise ClientAlreadyRegistered()
+        raise ex
+    except Exception as ex:
+        assert not GetConnector().in_transaction, "database with active transaction"
+        raise ex
+
+
+def register_many(client_ids, controller_uuid):
+    '''
+        Registers the clients with the ids in client_ids, for the controller with controller_uuid, in a single
+          transaction. Their addresses are allocated in bulk by the address engine.
+        Raises ClientAlreadyRegistered, without registering any client, if any of them is already registered.
+    '''
+    assert GetConnector(), "database not initialized"
+    assert not GetConnector().in_transaction, "database with active transaction"
+    assert all((isinstance(client_id, int) and client_id >= 0 for client_id in client_ids)), \
+        "client_ids expected to be non-negative ints"
+    assert len(set(client_ids)) == len(client_ids), "client_ids cannot have repeated ids"
+    assert isinstance(controller_uuid, UUID), "controller expected to be an instance of type uuid.UUID"
+
+    try:
+        database_connector = GetConnector()
+        with closing(database_connector.cursor()) as db_cursor:
+            controller_id = GetControllerIds().get(controller_uuid.bytes)
+            if controller_id is None:
+                raise ControllerNotRegistered()
+            if len(client_ids) == 0:
+                return
+
+            db_cursor.execute("SELECT id FROM clients WHERE controller == ? ORDER BY id", (controller_id,))
+            if len(collisions(list((row[0] for row in db_cursor)), sorted(client_ids))):
+                raise ClientAlreadyRegistered()
+
+            db_cursor.execute("SELECT ipv4_network, ipv6_network FROM configurations")
+            res = db_cursor.fetchone()
+            ipv4_network = IPv4Network(res[0])
+            ipv6_network = IPv6Network(res[1])
+
+            ipv4_ids = allocate(db_cursor, "clients_ipv4s", ipv4_network, len(client_ids))
+            ipv6_ids = allocate(db_cursor, "clients_ipv6s", ipv6_network, len(client_ids))
+            ipv4_values = ipv4_addresses(ipv4_network, ipv4_ids)
+            ipv6_values = ipv6_addresses(ipv6_network, ipv6_ids)
+            ipv4_ids = to_list(ipv4_ids)
+            ipv6_ids = to_list(ipv6_ids)
+
+            db_cursor.executemany("INSERT INTO clients_ipv4s(id, address) VALUES (?,?)", zip(ipv4_ids, ipv4_values))
+            db_cursor.executemany("INSERT INTO clients_ipv6s(id, address) VALUES (?,?)", zip(ipv6_ids, ipv6_values))
+            db_cursor.executemany(
+                "INSERT INTO clients(id, controller, ipv4, ipv6, ipv4_address, ipv6_address) VALUES (?,?,?,?,?,?)",
+                zip(client_ids, itertools.repeat(controller_id), ipv4_ids, ipv6_ids, ipv4_values, ipv6_values)
+            )
+            database_connector.commit()
+            assert not GetConnector().in_transaction, "database with active transaction"
+            if names.enabled():
+                names.add_clients(controller_uuid.bytes, client_ids, ipv4_values, ipv6_values)
+
+    except sqlite3.IntegrityError as ex:
+        __log.error(str(ex))
+        assert not GetConnector().in_transaction, "database with active transaction"
+        if "clients.id, clients.controller" in ex.args[0]:
             raise ClientAlreadyRegistered()
         raise ex
     except Exception as ex:
@@ -111,9 +160,13 @@ def info(client_id, controller_id):
     assert isinstance(client_id, int), "client_id is not a int object instance: {:s}".format(repr(client_id))
     assert 0 < client_id < 0xFFFFFFFF, "client_id value is invalid: value {:d}".format(client_id)
 
+    controller_row_id = GetControllerIds().get(controller_id.bytes)
+    if controller_row_id is None:
+        raise ClientNotRegistered()
+
     with closing(GetConnector().cursor()) as db_cursor:
-        db_cursor.execute("SELECT ipv4, ipv6, name, registration_date FROM clients_view WHERE "
-                          "(clients_view.id == ?) AND (clients_view.controller == ?)", (client_id, controller_id.bytes))
+        db_cursor.execute("SELECT ipv4_address, ipv6_address, registration_date FROM clients WHERE "
+                          "(clients.id == ?) AND (clients.controller == ?)", (client_id, controller_row_id))
 
         res = db_cursor.fetchone()
         if not res:
@@ -122,11 +175,50 @@ def info(client_id, controller_id):
         return {
             "ipv4": IPv4Address(res[0]) if res[0] else None,
             "ipv6": IPv6Address(res[1]) if res[1] else None,
-            "name": res[2],
-            "registration_date": time.localtime(res[3]),
+            "name": client_name(client_id, controller_id),
+            "registration_date": time.localtime(res[2]),
         }
 
 
+def page(controller, after=0, limit=100):
+    '''
+        Returns a page of the clients registered by a controller, ordered by their row id, with at most limit clients
+          registered after the row id given by after.
+        Returns a dict with the clients (a tuple of (client_id, ipv4, ipv6, name, registration_date) tuples) and the
+          cursor of the next page, which is None when this is the last page.
+    '''
+    assert GetConnector(), "database not initialized"
+    assert not GetConnector().in_transaction, "database with active transaction"
+    assert isinstance(controller, UUID), "controller expected to be an instance of type uuid.UUID"
+    assert isinstance(after, int) and after >= 0, "after expected to be a non-negative int"
+    assert isinstance(limit, int) and limit > 0, "limit expected to be a positive int"
+
+    with closing(GetConnector().cursor()) as db_cursor:
+        controller_id = GetControllerIds().get(controller.bytes)
+        if controller_id is None:
+            raise ControllerNotRegistered()
+
+        db_cursor.execute(
+            "SELECT rowid, id, ipv4_address, ipv6_address, registration_date FROM clients "
+            "WHERE (controller == ?) AND (rowid > ?) ORDER BY rowid LIMIT ?",
+            (controller_id, after, limit)
+        )
+        rows = db_cursor.fetchall()
+
+    return {
+        "clients": tuple((
+            (
+                row[1],
+                IPv4Address(row[2]) if row[2] is not None else None,
+                IPv6Address(row[3]) if row[3] is not None else None,
+                client_name(row[1], controller),
+                time.localtime(row[4]),
+            ) for row in rows
+        )),
+        "cursor": rows[-1][0] if len(rows) == limit else None,
+    }
+
+
 def remove(client_id, controller):
     assert GetConnector(), "database not initialized"
     assert not GetConnector().in_transaction, "database with active transaction"
@@ -137,12 +229,9 @@ def remove(client_id, controller):
     try:
         database_connector = GetConnector()
         with closing(database_connector.cursor()) as db_cursor:
-            db_cursor.execute("SELECT id FROM controllers WHERE uuid == ?", (controller.bytes,))
-
-            res = db_cursor.fetchone()
-            if res is None:
+            controller_id = GetControllerIds().get(controller.bytes)
+            if controller_id is None:
                 raise ControllerNotRegistered()
-            controller_id = res[0]
 
             db_cursor.execute("DELETE FROM clients "
                               "WHERE (clients.id == ?) AND (clients.controller == ?)", (client_id, controller_id))
@@ -151,6 +240,8 @@ def remove(client_id, controller):
             assert not GetConnector().in_transaction, "database with active transaction"
             if db_cursor.rowcount == 0:
                 raise ClientNotRegistered()
+            if names.enabled():
+                names.remove_clients(controller.bytes, (client_id,))
 
     except Exception as ex:
         assert not GetConnector().in_transaction, "database with active transaction"
@@ -165,13 +256,11 @@ def exists(client_id, controller):
     assert isinstance(controller, UUID), "controller expected to be an instance of type uuid.UUID"
 
     with closing(GetConnector().cursor()) as db_cursor:
-        db_cursor.execute("SELECT id FROM controllers WHERE uuid == ?", (controller.bytes,))
-
-        res = db_cursor.fetchone()
-        if res is None:
+        controller_id = GetControllerIds().get(controller.bytes)
+        if controller_id is None:
             raise ControllerNotRegistered()
 
-        db_cursor.execute("SELECT count(id) FROM clients_view WHERE (id == ?) AND (controller == ?)", (client_id, controller.bytes))
+        db_cursor.execute("SELECT count(id) FROM clients WHERE (id == ?) AND (controller == ?)", (client_id, controller_id))
 
         if db_cursor.fetchone()[0] == 0:
             return False
@@ -204,7 +293,9 @@ def query_address_info(ipv4=None, ipv6=None):
             }
 
         db_cursor.execute(
-            "SELECT id, controller, name, registration_date FROM clients_view WHERE (ipv4 == ?) OR (ipv6 == ?)",
+            "SELECT clients.id, controllers.uuid, clients.registration_date FROM clients "
+            "JOIN controllers ON controllers.id == clients.controller "
+            "WHERE (clients.ipv4_address == ?) OR (clients.ipv6_address == ?)",
             (
                 int(ipv4) if ipv4 else None,
                 ipv6.packed if ipv6 else None
@@ -213,11 +304,12 @@ def query_address_info(ipv4=None, ipv6=None):
 
         res = db_cursor.fetchone()
         if res:
+            controller_id = UUID(bytes=res[1])
             return {
                 "client_id": res[0],
-                "controller_id": UUID(bytes=res[1]),
-                "name": res[2],
-                "registration_date": time.localtime(res[3])
+                "controller_id": controller_id,
+                "name": client_name(res[0], controller_id),
+                "registration_date": time.localtime(res[2])
             }
         raise NoResultsAvailable()
 
@@ -10,7 +10,9 @@ from archsdn_central.helpers import logger_module_name
 from .data_validation import is_ipv4_port_tuple, is_ipv6_port_tuple
 from .exceptions import ControllerNotRegistered, IPv4InfoAlreadyRegistered, IPv6InfoAlreadyRegistered, \
     ControllerAlreadyRegistered
-from .shared_data import GetConnector
+from .shared_data import GetConnector, GetControllerIds
+from . import names
+from . import topology
 
 __log = logging.getLogger(logger_module_name(__file__))
 
@@ -26,10 +28,7 @@ def register(uuid, ipv4_info=None, ipv6_info=None):
     try:
         database_connector = GetConnector()
         with closing(database_connector.cursor()) as db_cursor:
-            db_cursor.execute("SELECT count(*) FROM controllers "
-                              "WHERE controllers.uuid == ?", (uuid.bytes,))
-            res = db_cursor.fetchone()
-            if res[0] == 1:
+            if uuid.bytes in GetControllerIds():
                 assert not GetConnector().in_transaction, "database with active transaction"
                 raise ControllerAlreadyRegistered()
 
@@ -51,8 +50,14 @@ def register(uuid, ipv4_info=None, ipv6_info=None):
 
             db_cursor.execute("INSERT INTO controllers(name, ipv4, ipv6, uuid) "
                               "VALUES (?,?,?,?)", (name_id, ipv4_id, ipv6_id, uuid.bytes))
+            controller_id = db_cursor.lastrowid
 
             database_connector.commit()
+            GetControllerIds()[uuid.bytes] = controller_id
+            if names.enabled():
+                names.add_controller(
+                    uuid.bytes, int(ipv4_info[0]) if ipv4_info else None, ipv6_info[0].packed if ipv6_info else None
+                )
             assert not GetConnector().in_transaction, "database with active transaction"
             return
 
@@ -99,6 +104,44 @@ def infos(uuid):
         raise ex
 
 
+def page(after=0, limit=100):
+    '''
+        Returns a page of registered controllers, ordered by their row id, with at most limit controllers registered
+          after the row id given by after.
+        Returns a dict with the controllers (a tuple of (uuid, ipv4_info, ipv6_info, name, registration_date) tuples)
+          and the cursor of the next page, which is None when this is the last page.
+    '''
+    assert GetConnector(), "database not initialized"
+    assert not GetConnector().in_transaction, "database with active transaction"
+    assert isinstance(after, int) and after >= 0, "after expected to be a non-negative int"
+    assert isinstance(limit, int) and limit > 0, "limit expected to be a positive int"
+
+    with closing(GetConnector().cursor()) as db_cursor:
+        db_cursor.execute(
+            "SELECT controllers.id, controllers.uuid, "
+            "controllers_ipv4s.address, controllers_ipv4s.port, controllers_ipv6s.address, controllers_ipv6s.port, "
+            "names.name, controllers.registration_date FROM controllers "
+            "LEFT JOIN controllers_ipv4s ON controllers_ipv4s.id == controllers.ipv4 "
+            "LEFT JOIN controllers_ipv6s ON controllers_ipv6s.id == controllers.ipv6 "
+            "LEFT JOIN names ON names.id == controllers.name "
+            "WHERE controllers.id > ? ORDER BY controllers.id LIMIT ?", (after, limit)
+        )
+        rows = db_cursor.fetchall()
+
+    return {
+        "controllers": tuple((
+            (
+                UUID(bytes=row[1]),
+                (IPv4Address(row[2]), row[3]) if row[2] is not None else None,
+                (IPv6Address(row[4]), row[5]) if row[4] is not None else None,
+                row[6],
+                time.localtime(row[7]),
+            ) for row in rows
+        )),
+        "cursor": rows[-1][0] if len(rows) == limit else None,
+    }
+
+
 def remove(uuid):
     assert GetConnector(), "database not initialized"
     assert not GetConnector().in_transaction, "database with active transaction"
@@ -113,6 +156,10 @@ def remove(uuid):
             assert not GetConnector().in_transaction, "database with active transaction"
             if db_cursor.rowcount == 0:
                 raise ControllerNotRegistered()
+            del GetControllerIds()[uuid.bytes]
+            if names.enabled():
+                names.remove_controller(uuid.bytes)
+            topology.remove_controller(uuid)
     except Exception as ex:
         __log.error(str(ex))
         assert not GetConnector().in_transaction, "database with active transaction"
@@ -124,20 +171,7 @@ def is_registered(uuid):
     assert not GetConnector().in_transaction, "database with active transaction"
     assert isinstance(uuid, UUID), "uuid is not a uuid.UUID object instance"
 
-    try:
-        with closing(GetConnector().cursor()) as db_cursor:
-            db_cursor.execute("SELECT count(*) FROM controllers "
-                              "WHERE controllers.uuid == ?", (uuid.bytes,))
-            res = db_cursor.fetchone()
-            return res[0] == 1
-    except sqlite3.Error as ex:
-        __log.error(str(ex))
-        assert not GetConnector().in_transaction, "database with active transaction"
-        raise Exception(str(ex))
-    except Exception as ex:
-        __log.error(str(ex))
-        assert not GetConnector().in_transaction, "database with active transaction"
-        raise ex
+    return uuid.bytes in GetControllerIds()
 
 
 def update_addresses(uuid, ipv4_info=None, ipv6_info=None):
@@ -151,13 +185,13 @@ def update_addresses(uuid, ipv4_info=None, ipv6_info=None):
     try:
         database_connector = GetConnector()
         with closing(database_connector.cursor()) as db_cursor:
-            db_cursor.execute("SELECT count(*) FROM controllers "
-                              "WHERE controllers.uuid == ?", (uuid.bytes,))
-            res = db_cursor.fetchone()
-            if res[0] == 0:
+            if uuid.bytes not in GetControllerIds():
                 assert not GetConnector().in_transaction, "database with active transaction"
                 raise ControllerNotRegistered()
 
+            # An address is only updated if the controller was registered with an address of its family, so the names
+            #   index is only updated with the addresses whose UPDATE matched a row.
+            (ipv4_updated, ipv6_updated) = (False, False)
             if ipv4_info:
                 db_cursor.execute("SELECT count(*) FROM controllers_ipv4s "
                                   "WHERE address == ?", (int(ipv4_info[0]),))
@@ -170,6 +204,7 @@ def update_addresses(uuid, ipv4_info=None, ipv6_info=None):
                                   "WHERE id = ("
                                   "SELECT ipv4 FROM controllers WHERE controllers.uuid = ?);",
                                   (int(ipv4_info[0]), ipv4_info[1], uuid.bytes))
+                ipv4_updated = db_cursor.rowcount > 0
 
             if ipv6_info:
                 db_cursor.execute("SELECT count(*) FROM controllers_ipv6s "
@@ -183,8 +218,15 @@ def update_addresses(uuid, ipv4_info=None, ipv6_info=None):
                                   "WHERE id = ("
                                   "SELECT ipv6 FROM controllers WHERE controllers.uuid = ?);",
                                   (ipv6_info[0].packed, ipv6_info[1], uuid.bytes))
+                ipv6_updated = db_cursor.rowcount > 0
             database_connector.commit()
             assert not GetConnector().in_transaction, "database with active transaction"
+            if names.enabled() and (ipv4_updated or ipv6_updated):
+                names.add_controller(
+                    uuid.bytes,
+                    int(ipv4_info[0]) if ipv4_updated else None,
+                    ipv6_info[0].packed if ipv6_updated else None
+                )
 
     except sqlite3.Error as ex:
         __log.error(str(ex))
@@ -196,6 +238,41 @@ def update_addresses(uuid, ipv4_info=None, ipv6_info=None):
         raise ex
 
 
+def release_clients(uuid, limit=1000):
+    '''
+        Removes up to limit clients of a controller, in a single transaction, and returns the number of clients removed.
+          Releasing the clients of a controller in chunks keeps each transaction short.
+    '''
+    assert GetConnector(), "database not initialized"
+    assert not GetConnector().in_transaction, "database with active transaction"
+    assert isinstance(uuid, UUID), "uuid is not a uuid.UUID object instance"
+    assert isinstance(limit, int) and limit > 0, "limit expected to be a positive int"
+
+    try:
+        database_connector = GetConnector()
+        with closing(database_connector.cursor()) as db_cursor:
+            controller_id = GetControllerIds().get(uuid.bytes)
+            if controller_id is None:
+                raise ControllerNotRegistered()
+
+            db_cursor.execute("SELECT rowid, id FROM clients WHERE controller == ? LIMIT ?", (controller_id, limit))
+            rows = db_cursor.fetchall()
+            db_cursor.executemany("DELETE FROM clients WHERE rowid == ?", ((row[0],) for row in rows))
+            database_connector.commit()
+            assert not GetConnector().in_transaction, "database with active transaction"
+            if names.enabled():
+                names.remove_clients(uuid.bytes, tuple((row[1] for row in rows)))
+            return len(rows)
+    except sqlite3.Error as ex:
+        __log.error(str(ex))
+        assert not GetConnector().in_transaction, "database with active transaction"
+        raise Exception(str(ex))
+    except Exception as ex:
+        __log.error(str(ex))
+        assert not GetConnector().in_transaction, "database with active transaction"
+        raise ex
+
+
 def clean_slate(uuid):
     assert GetConnector(), "database not initialized"
     assert not GetConnector().in_transaction, "database with active transaction"
@@ -204,17 +281,14 @@ def clean_slate(uuid):
     try:
         database_connector = GetConnector()
         with closing(database_connector.cursor()) as db_cursor:
-            db_cursor.execute("SELECT count(*) FROM controllers "
-                              "WHERE controllers.uuid == ?", (uuid.bytes,))
-            res = db_cursor.fetchone()
-            if res[0] == 0:
+            controller_id = GetControllerIds().get(uuid.bytes)
+            if controller_id is None:
                 raise ControllerNotRegistered()
 
-            db_cursor.execute("DELETE FROM clients "
-                              "WHERE controller = ("
-                              "SELECT id FROM controllers WHERE controllers.uuid = ?);",
-                              (uuid.bytes,))
+            db_cursor.execute("DELETE FROM clients WHERE controller == ?", (controller_id,))
             database_connector.commit()
+            if names.enabled():
+                names.remove_clients(uuid.bytes)
     except sqlite3.Error as ex:
         __log.error(str(ex))
         assert not GetConnector().in_transaction, "database with active transaction"
@@ -40,3 +40,28 @@ class NameAlreadyRegistered(Exception):
         return "Name already registered"
 
 
+class SnapshotsNotConfigured(Exception):
+    def __str__(self):
+        return "Snapshots directory not configured"
+
+
+class IntegrityCheckFailed(Exception):
+    def __str__(self):
+        return "Database integrity check failed"
+
+
+class AddressPoolExhausted(Exception):
+    def __str__(self):
+        return "Address pool exhausted"
+
+
+
+
+class DeadlineExpired(Exception):
+    def __str__(self):
+        return "Request deadline expired"
+
+
+class LinkNotRegistered(Exception):
+    def __str__(self):
+        return "Link not registered"
@@ -9,7 +9,12 @@ from netaddr import EUI
 
 from archsdn_central.helpers import logger_module_name
 
-from .shared_data import GetConnector, SetConnector
+from .shared_data import GetConnector, SetConnector, GetControllerIds
+from .snapshot import stop as stop_snapshots
+from .warmup import build_indexes
+from .schema import migrate as migrate_schema
+from . import names
+from . import topology
 
 __log = logging.getLogger(logger_module_name(__file__))
 
@@ -17,8 +22,13 @@ __log = logging.getLogger(logger_module_name(__file__))
 def init_database(
         location=":memory:",
         ipv4_network=IPv4Network(("10.0.0.0", 8)),
-        ipv6_network=IPv6Network("fd61:7263:6873:646e::0/64") # 61:7263:6873:646e -> archsdn in hex
+        ipv6_network=IPv6Network("fd61:7263:6873:646e::0/64"), # 61:7263:6873:646e -> archsdn in hex
+        migrate=True
 ):
+    '''
+        Opens the database at location, creating it if it does not exist, and upgrades its schema with the pending
+          migrations, unless migrate is False.
+    '''
     assert GetConnector() is None, "database already initialized"
     assert isinstance(location, Path) or (isinstance(location, str) and location == ":memory:"), \
         "location is not an instance of Path nor str equal to :memory:"
@@ -85,12 +95,20 @@ def init_database(
             )
         )
 
+    if migrate:
+        migrate_schema()
+    build_indexes()
+
 
 def close_database():
     assert GetConnector(), "database not initialized"
     assert not GetConnector().in_transaction, "database with active transaction"
 
     __log.debug("Closing Database...")
+    stop_snapshots()
+    GetControllerIds().clear()
+    names.clear()
+    topology.clear()
     database_connector = GetConnector()
     database_connector.commit()
     database_connector.close()
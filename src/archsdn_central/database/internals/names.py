@@ -0,0 +1,143 @@
+# In-process index of the names of the registered controllers and clients, and of their addresses, used to resolve
+#   them (see dns_responder) without querying the database.
+# Controllers are named "<uuid>.controller.archsdn" and clients "<client id>.<controller uuid>.archsdn", so the index
+#   is keyed by the controller uuid bytes and the client id, and the names are only built to answer reverse lookups.
+# Addresses are kept as stored in the database: IPv4 addresses as ints, and IPv6 addresses as 16 bytes.
+# The index is only built and maintained once enabled, so it costs no memory otherwise. It is updated by the database
+#   thread, after each registration or removal is committed, and read from other threads: its entries are replaced,
+#   never modified in place, so a reader sees either the previous entry or the new one.
+import time
+import logging
+from contextlib import closing
+
+from archsdn_central.helpers import logger_module_name
+
+from .shared_data import GetConnector
+
+__log = logging.getLogger(logger_module_name(__file__))
+
+__enabled = False
+# controller uuid bytes -> (ipv4, ipv6)
+__controllers = {}
+# (controller uuid bytes, client id) -> (ipv4, ipv6)
+__clients = {}
+# controller uuid bytes -> set of client ids
+__controller_clients = {}
+# ipv4 int or ipv6 bytes -> (controller uuid bytes, client id or None for the controller)
+__owners = {}
+
+
+def enabled():
+    return __enabled
+
+
+def enable():
+    '''
+        Builds the index from the database tables, and keeps it up to date from then on.
+    '''
+    global __enabled
+    assert GetConnector(), "database not initialized"
+    assert not GetConnector().in_transaction, "database with active transaction"
+
+    start = time.monotonic()
+    clear()
+    with closing(GetConnector().cursor()) as db_cursor:
+        db_cursor.execute("SELECT controllers.uuid, controllers_ipv4s.address, controllers_ipv6s.address "
+                          "FROM controllers "
+                          "LEFT JOIN controllers_ipv4s ON controllers_ipv4s.id == controllers.ipv4 "
+                          "LEFT JOIN controllers_ipv6s ON controllers_ipv6s.id == controllers.ipv6")
+        for (uuid, ipv4, ipv6) in db_cursor:
+            add_controller(uuid, ipv4, ipv6)
+        db_cursor.execute("SELECT controllers.uuid, clients.id, clients.ipv4_address, clients.ipv6_address "
+                          "FROM clients JOIN controllers ON controllers.id == clients.controller")
+        for (uuid, client_id, ipv4, ipv6) in db_cursor:
+            __add_client(uuid, client_id, ipv4, ipv6)
+    __enabled = True
+
+    __log.info("Names index built with {:d} controllers and {:d} clients in {:.3f} ms.".format(
+        len(__controllers), len(__clients), (time.monotonic() - start) * 1000
+    ))
+
+
+def clear():
+    global __enabled
+    __enabled = False
+    __controllers.clear()
+    __clients.clear()
+    __controller_clients.clear()
+    __owners.clear()
+
+
+def add_controller(uuid, ipv4, ipv6):
+    '''
+        Indexes (or updates) the addresses of a controller. Addresses which are None are kept unchanged.
+    '''
+    previous = __controllers.get(uuid, (None, None))
+    entry = (ipv4 if ipv4 is not None else previous[0], ipv6 if ipv6 is not None else previous[1])
+    __controllers[uuid] = entry
+    for (old, new) in zip(previous, entry):
+        if (old is not None) and (old != new):
+            __owners.pop(old, None)
+        if new is not None:
+            __owners[new] = (uuid, None)
+
+
+def remove_controller(uuid):
+    '''
+        Removes a controller, and its clients, from the index.
+    '''
+    remove_clients(uuid)
+    for address in __controllers.pop(uuid, ()):
+        if address is not None:
+            __owners.pop(address, None)
+
+
+def add_clients(uuid, client_ids, ipv4s, ipv6s):
+    for (client_id, ipv4, ipv6) in zip(client_ids, ipv4s, ipv6s):
+        __add_client(uuid, client_id, ipv4, ipv6)
+
+
+def remove_clients(uuid, client_ids=None):
+    '''
+        Removes the clients of a controller with client_ids (by default, all of them) from the index.
+    '''
+    ids = __controller_clients.get(uuid)
+    if not ids:
+        return
+    for client_id in (tuple(ids) if client_ids is None else client_ids):
+        ids.discard(client_id)
+        for address in __clients.pop((uuid, client_id), ()):
+            __owners.pop(address, None)
+
+
+def controller_addresses(uuid):
+    '''
+        Returns the (ipv4, ipv6) addresses of a controller, or None if it is not registered.
+    '''
+    return __controllers.get(uuid)
+
+
+def client_addresses(uuid, client_id):
+    '''
+        Returns the (ipv4, ipv6) addresses of a client, or None if it is not registered.
+    '''
+    return __clients.get((uuid, client_id))
+
+
+def owner(address):
+    '''
+        Returns the owner of an address (an IPv4 int or IPv6 bytes), as (controller uuid bytes, client id or None for
+          the controller), or None if no controller or client has it.
+    '''
+    return __owners.get(address)
+
+
+def sizes():
+    return {"controllers": len(__controllers), "clients": len(__clients)}
+
+
+def __add_client(uuid, client_id, ipv4, ipv6):
+    __clients[(uuid, client_id)] = (ipv4, ipv6)
+    __controller_clients.setdefault(uuid, set()).add(client_id)
+    __owners[ipv4] = (uuid, client_id)
+    __owners[ipv6] = (uuid, client_id)
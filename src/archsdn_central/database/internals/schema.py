@@ -0,0 +1,191 @@
+import logging
+import pathlib
+import re
+import sqlite3
+import time
+from contextlib import closing
+
+from archsdn_central.helpers import logger_module_name
+
+from .shared_data import GetConnector
+
+__log = logging.getLogger(logger_module_name(__file__))
+
+# The schema created by database.sql is the version 1. Each migration script upgrades the schema to its version.
+__base_version = 1
+__migrations_directory = pathlib.Path(str(pathlib.Path(__file__).parents[1])) / "migrations"
+__migration_name = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# A statement preceded by a "-- chunk: <table> <rows>" comment is executed once per range of <rows> row ids of
+#   <table>, with the first and last row id of the range bound to the :first and :last parameters.
+__chunk_directive = re.compile(r"^\s*--\s*chunk:\s*(\w+)\s+(\d+)\s*$", re.MULTILINE)
+__target_table = re.compile(r"\b(?:ON|UPDATE|INTO|TABLE|FROM)\s+(\w+)", re.IGNORECASE)
+
+# Number of SQLite virtual machine instructions between the progress messages of a long statement.
+__progress_instructions = 1000000
+# Minimum number of seconds between the progress messages of a long statement.
+__progress_interval = 5
+
+
+def migrations(directory=None):
+    '''
+        Returns the migration scripts in directory (by default, the bundled ones), as a tuple of
+          (version, name, path) tuples ordered by version.
+    '''
+    directory = __migrations_directory if directory is None else directory
+    scripts = []
+    if directory.is_dir():
+        for path in directory.iterdir():
+            match = __migration_name.match(path.name)
+            if match:
+                scripts.append((int(match.group(1)), match.group(2), path))
+    scripts.sort()
+    assert len(set((script[0] for script in scripts))) == len(scripts), "duplicated migration versions"
+    return tuple(scripts)
+
+
+def version():
+    '''
+        Returns the schema version of the database.
+        Databases created before the schema was versioned have no schema_version table, and are at the base version.
+    '''
+    assert GetConnector(), "database not initialized"
+    with closing(GetConnector().cursor()) as db_cursor:
+        db_cursor.execute("SELECT count(*) FROM sqlite_master WHERE type == 'table' AND name == 'schema_version'")
+        if db_cursor.fetchone()[0] == 0:
+            return __base_version
+        db_cursor.execute("SELECT max(version) FROM schema_version")
+        res = db_cursor.fetchone()[0]
+        return res if res is not None else __base_version
+
+
+def statements(script):
+    '''
+        Splits an SQL script into a tuple of (statement, chunk) tuples, where chunk is None or the (table, rows) of the
+          chunk directive preceding the statement.
+    '''
+    result = []
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            directive = __chunk_directive.search(statement)
+            chunk = (directive.group(1), int(directive.group(2))) if directive else None
+            result.append((statement.strip(), chunk))
+            statement = ""
+    assert not statement.strip() or all(
+        (line.strip().startswith("--") or not line.strip() for line in statement.splitlines())
+    ), "incomplete statement at the end of the script"
+    return tuple(result)
+
+
+def __table_rows(db_cursor, table):
+    db_cursor.execute("SELECT count(*) FROM sqlite_master WHERE type == 'table' AND name == ?", (table,))
+    if db_cursor.fetchone()[0] == 0:
+        return 0
+    db_cursor.execute("SELECT count(*) FROM \"{:s}\"".format(table))
+    return db_cursor.fetchone()[0]
+
+
+def __estimate(db_cursor, statement, chunk):
+    if chunk:
+        return __table_rows(db_cursor, chunk[0])
+    match = __target_table.search(re.sub(r"--[^\n]*", "", statement))
+    return __table_rows(db_cursor, match.group(1)) if match else 0
+
+
+def __execute(db_cursor, statement, chunk):
+    if chunk is None:
+        db_cursor.execute(statement)
+        return
+
+    (table, rows) = chunk
+    db_cursor.execute("SELECT min(rowid), max(rowid) FROM \"{:s}\"".format(table))
+    (first, last) = db_cursor.fetchone()
+    if first is None:
+        return
+    for start in range(first, last + 1, rows):
+        db_cursor.execute(statement, {"first": start, "last": min(start + rows - 1, last)})
+        __log.info("  {:s}: row ids up to {:d} of {:d} done.".format(table, min(start + rows - 1, last), last))
+
+
+def migrate(dry_run=False, directory=None):
+    '''
+        Upgrades the database schema, by running the pending migration scripts in a single transaction. If any
+          statement fails, the transaction is rolled back and the schema is left unchanged.
+        If dry_run is True, nothing is changed, and the work of each pending migration is estimated by the number of
+          rows in the tables its statements work on.
+        Returns a dict with the schema version before and after the migrations, and the list of the pending
+          migrations, as dicts with their version, name, number of statements and estimated rows.
+    '''
+    assert GetConnector(), "database not initialized"
+    assert not GetConnector().in_transaction, "database with active transaction"
+
+    database_connector = GetConnector()
+    current = version()
+    pending = tuple(((v, name, path) for (v, name, path) in migrations(directory) if v > current))
+    report = {"version": current, "target": pending[-1][0] if pending else current, "migrations": []}
+
+    with closing(database_connector.cursor()) as db_cursor:
+        scripts = []
+        for (v, name, path) in pending:
+            with open(str(path), "r") as fp:
+                script = statements(fp.read())
+            scripts.append((v, name, script))
+            report["migrations"].append({
+                "version": v,
+                "name": name,
+                "statements": len(script),
+                "rows": sum((__estimate(db_cursor, statement, chunk) for (statement, chunk) in script)),
+            })
+
+        for migration in report["migrations"]:
+            __log.info("Migration {:d} ({:s}): {:d} statements, about {:d} rows.".format(
+                migration["version"], migration["name"], migration["statements"], migration["rows"]
+            ))
+        if dry_run or not pending:
+            __log.info("Database schema at version {:d}{:s}.".format(
+                current, ", {:d} migrations pending".format(len(pending)) if pending else ""
+            ))
+            return report
+
+        start = time.monotonic()
+        progress = {"last": start, "statement": ""}
+
+        def progress_handler():
+            now = time.monotonic()
+            if now - progress["last"] >= __progress_interval:
+                progress["last"] = now
+                __log.info("  still running after {:.0f} s: {:s}".format(now - start, progress["statement"]))
+            return 0
+
+        database_connector.set_progress_handler(progress_handler, __progress_instructions)
+        try:
+            db_cursor.execute("BEGIN IMMEDIATE")
+            db_cursor.execute("CREATE TABLE IF NOT EXISTS schema_version ("
+                              "version INTEGER PRIMARY KEY, "
+                              "name TEXT NOT NULL, "
+                              "applied_date DATETIME DEFAULT (CAST (strftime('%s', 'now') AS INTEGER)))")
+            db_cursor.execute("INSERT OR IGNORE INTO schema_version(version, name) VALUES (?, 'database')",
+                              (__base_version,))
+            for (v, name, script) in scripts:
+                __log.info("Applying migration {:d} ({:s})...".format(v, name))
+                for (statement, chunk) in script:
+                    progress["statement"] = next((
+                        line for line in statement.splitlines() if not line.strip().startswith("--")
+                    ), "")[:80]
+                    __execute(db_cursor, statement, chunk)
+                db_cursor.execute("INSERT INTO schema_version(version, name) VALUES (?, ?)", (v, name))
+            database_connector.commit()
+        except Exception as ex:
+            __log.error("Migration failed, the database schema is unchanged: {:s}".format(str(ex)))
+            database_connector.rollback()
+            assert not GetConnector().in_transaction, "database with active transaction"
+            raise ex
+        finally:
+            database_connector.set_progress_handler(None, 0)
+
+    __log.info("Database schema upgraded from version {:d} to {:d} in {:.3f} ms.".format(
+        current, report["target"], (time.monotonic() - start) * 1000
+    ))
+    return report
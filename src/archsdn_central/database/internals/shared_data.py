@@ -10,4 +10,12 @@ def GetConnector():
 
 def SetConnector(conn):
     global __database_connector
-    __database_connector = conn
\ No newline at end of file
+    __database_connector = conn
+
+# In-process index of the registered controllers, mapping the controller uuid bytes to the controller row id.
+# It is built when the database is initialised, and kept up to date by the controller register and remove operations.
+__controller_ids = {}
+
+
+def GetControllerIds():
+    return __controller_ids
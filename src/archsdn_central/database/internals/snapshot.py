@@ -0,0 +1,134 @@
+import os
+import logging
+import asyncio
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from archsdn_central.helpers import logger_module_name
+
+from .shared_data import GetConnector
+from .exceptions import SnapshotsNotConfigured
+
+__log = logging.getLogger(logger_module_name(__file__))
+
+__directory = None
+__keep = 0
+__periodic_task = None
+
+# Number of database pages written to the snapshot file in each backup step.
+__pages_per_step = 1024
+__snapshot_prefix = "archsdn-central-"
+__snapshot_suffix = ".sqlite3"
+
+
+def configure(directory, keep=5, interval=0):
+    '''
+        Configures the directory where the snapshots are written, and the number of snapshots kept in it.
+        If interval is not zero, a snapshot is taken every interval seconds.
+    '''
+    global __directory, __keep, __periodic_task
+    assert GetConnector(), "database not initialized"
+    assert isinstance(directory, Path) and directory.is_dir(), "directory expected to be an existing directory"
+    assert isinstance(keep, int) and keep > 0, "keep expected to be a positive int"
+    assert interval >= 0, "interval expected to be non-negative"
+
+    stop()
+    __directory = directory
+    __keep = keep
+    if interval:
+        __periodic_task = asyncio.get_event_loop().create_task(__periodic_snapshots(interval))
+    __log.info("Snapshots will be written to {:s}, keeping the last {:d}{:s}.".format(
+        str(directory), keep, ", every {:.0f} seconds".format(interval) if interval else ""
+    ))
+
+
+def stop():
+    global __directory, __periodic_task
+    if __periodic_task is not None:
+        __periodic_task.cancel()
+        __periodic_task = None
+    __directory = None
+
+
+async def __periodic_snapshots(interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await snapshot()
+        except Exception as ex:
+            __log.error("Periodic snapshot failed: {:s}".format(str(ex)))
+
+
+async def snapshot():
+    '''
+        Writes a snapshot of the database to the snapshots directory, and removes the oldest snapshots.
+        The database is first copied into an in-memory database, in the database thread. The copy is then written to a
+          temporary file, in page-sized steps, by an executor thread, while the database thread keeps serving requests.
+          The temporary file is renamed to the snapshot name once complete, so snapshots are never seen partially
+          written.
+        Returns a dict with the snapshot name and size.
+    '''
+    assert GetConnector(), "database not initialized"
+    assert not GetConnector().in_transaction, "database with active transaction"
+    if __directory is None:
+        raise SnapshotsNotConfigured()
+
+    directory = __directory
+    keep = __keep
+    start = time.monotonic()
+    memory_copy = sqlite3.connect(":memory:", check_same_thread=False)
+    try:
+        GetConnector().backup(memory_copy)
+        copy_time = time.monotonic() - start
+
+        name = "{:s}{:s}{:s}".format(
+            __snapshot_prefix, datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ"), __snapshot_suffix
+        )
+        size = await asyncio.get_event_loop().run_in_executor(None, __write, memory_copy, directory, name)
+    finally:
+        memory_copy.close()
+
+    __rotate(directory, keep)
+    __log.info(
+        "Snapshot {:s} written ({:d} bytes). Database copied in {:.3f} ms, snapshot written in {:.3f} ms.".format(
+            name, size, copy_time * 1000, (time.monotonic() - start) * 1000
+        )
+    )
+    return {"name": name, "size": size}
+
+
+def __write(memory_copy, directory, name):
+    temporary = directory / ".{:s}.tmp".format(name)
+    try:
+        snapshot_connector = sqlite3.connect(str(temporary))
+        try:
+            memory_copy.backup(snapshot_connector, pages=__pages_per_step)
+        finally:
+            snapshot_connector.close()
+
+        with open(str(temporary), "rb") as fp:
+            os.fsync(fp.fileno())
+        os.replace(str(temporary), str(directory / name))
+        directory_fd = os.open(str(directory), os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+        return (directory / name).stat().st_size
+
+    except Exception as ex:
+        if temporary.exists():
+            temporary.unlink()
+        raise ex
+
+
+def __rotate(directory, keep):
+    snapshots = sorted((
+        path for path in directory.iterdir()
+        if path.name.startswith(__snapshot_prefix) and path.name.endswith(__snapshot_suffix)
+    ))
+    for path in snapshots[:-keep]:
+        __log.info("Removing snapshot {:s}.".format(path.name))
+        path.unlink()
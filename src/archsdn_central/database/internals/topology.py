@@ -0,0 +1,236 @@
+# In-process topology of the links between the sectors, reported by their controllers, and cache of the shortest
+#   (lowest latency) paths between them.
+# The links are kept in an undirected networkx graph of the registered controllers, each with its capacity (Mbps) and
+#   latency (ms). They are not stored in the database: the controllers report their links again after a restart.
+# Paths are answered from the shortest path tree of their source (the parent of each sector in its shortest path, and
+#   its distance), computed once (Dijkstra) and cached for the following queries from the same source. On a link
+#   change, the cached trees are repaired in place, instead of computed again:
+#   - a link added, or whose latency decreased, only changes the trees in which it shortens the distance to one of its
+#     ends: the shorter distances are propagated from that end, visiting only the sectors whose distance decreases;
+#   - a link removed, or whose latency increased, only changes the trees which use it: the distances of the sectors
+#     below it in the tree are computed again, from the sectors around them.
+#   Whether a tree is changed is checked in constant time. Capacity changes do not change the paths: the capacity of a
+#   path (the capacity of its narrowest link) is computed when it is queried.
+# The topology is only used from the database thread, like the remaining database state.
+# networkx is only imported, and the graph created, once the first link is registered, so importing the database does
+#   not import networkx.
+import heapq
+import itertools
+from collections import OrderedDict
+from uuid import UUID
+
+from .shared_data import GetControllerIds
+from .exceptions import ControllerNotRegistered, LinkNotRegistered, NoResultsAvailable
+
+__graph = None
+# source uuid -> (parents, distances) of its shortest path tree, least recently used first. Each tree takes memory in
+#   proportion to the number of sectors, so only the trees of the __max_trees most recent sources are kept.
+__trees = OrderedDict()
+__max_trees = 1024
+__counters = {"hits": 0, "misses": 0, "repaired": 0}
+
+
+def register_link(controller_uuid, peer_uuid, capacity, latency):
+    '''
+        Registers (or updates) the link between the sectors of two registered controllers.
+    '''
+    assert isinstance(controller_uuid, UUID), "controller_uuid is not a uuid.UUID object instance"
+    assert isinstance(peer_uuid, UUID), "peer_uuid is not a uuid.UUID object instance"
+    assert controller_uuid != peer_uuid, "a link cannot connect a controller to itself"
+    assert isinstance(capacity, int) and capacity > 0, "capacity expected to be a positive int"
+    assert isinstance(latency, (int, float)) and latency >= 0, "latency expected to be a non-negative number"
+
+    ids = GetControllerIds()
+    if (controller_uuid.bytes not in ids) or (peer_uuid.bytes not in ids):
+        raise ControllerNotRegistered()
+
+    global __graph
+    if __graph is None:
+        import networkx
+        __graph = networkx.Graph()
+
+    # The attributes of a link are updated in place, so its previous latency is taken before.
+    previous = __graph.get_edge_data(controller_uuid, peer_uuid, {}).get("latency")
+    __graph.add_edge(controller_uuid, peer_uuid, capacity=capacity, latency=latency)
+    if (previous is None) or (latency < previous):
+        __repair_shortened(controller_uuid, peer_uuid, latency)
+    elif latency > previous:
+        __repair_lengthened(controller_uuid, peer_uuid)
+
+
+def remove_link(controller_uuid, peer_uuid):
+    assert isinstance(controller_uuid, UUID), "controller_uuid is not a uuid.UUID object instance"
+    assert isinstance(peer_uuid, UUID), "peer_uuid is not a uuid.UUID object instance"
+
+    if (__graph is None) or (not __graph.has_edge(controller_uuid, peer_uuid)):
+        raise LinkNotRegistered()
+    __graph.remove_edge(controller_uuid, peer_uuid)
+    __repair_lengthened(controller_uuid, peer_uuid)
+
+
+def remove_controller(controller_uuid):
+    '''
+        Removes the links of a controller (e.g. once it is unregistered).
+    '''
+    if (__graph is None) or (controller_uuid not in __graph):
+        return
+    __graph.remove_node(controller_uuid)
+    __trees.pop(controller_uuid, None)
+    for (parents, distances) in __trees.values():
+        if controller_uuid in distances:
+            __recompute_below(parents, distances, controller_uuid)
+            __counters["repaired"] += 1
+
+
+def query_path(controller_uuid, destination_uuid):
+    '''
+        Returns the lowest latency path between the sectors of two registered controllers, as a dict with the path
+          (the tuple of the controllers crossed, from the source to the destination), its latency and its capacity
+          (None for the path from a sector to itself).
+        Raises NoResultsAvailable if the sectors are not connected.
+    '''
+    assert isinstance(controller_uuid, UUID), "controller_uuid is not a uuid.UUID object instance"
+    assert isinstance(destination_uuid, UUID), "destination_uuid is not a uuid.UUID object instance"
+
+    ids = GetControllerIds()
+    if (controller_uuid.bytes not in ids) or (destination_uuid.bytes not in ids):
+        raise ControllerNotRegistered()
+    if controller_uuid == destination_uuid:
+        return {"path": (controller_uuid,), "latency": 0, "capacity": None}
+    if (__graph is None) or (controller_uuid not in __graph) or (destination_uuid not in __graph):
+        raise NoResultsAvailable()
+
+    (parents, distances) = __tree(controller_uuid)
+    if destination_uuid not in distances:
+        raise NoResultsAvailable()
+
+    path = [destination_uuid]
+    while path[-1] != controller_uuid:
+        path.append(parents[path[-1]])
+    path.reverse()
+    capacity = min((__graph[a][b]["capacity"] for (a, b) in zip(path, path[1:])))
+    return {"path": tuple(path), "latency": distances[destination_uuid], "capacity": capacity}
+
+
+def metrics():
+    '''
+        Returns the number of sectors and links, of shortest path trees cached, of paths queried from a cached tree
+          (hits) or after computing it (misses), and of trees repaired after link changes.
+    '''
+    return dict(
+        __counters,
+        sectors=__graph.number_of_nodes() if __graph is not None else 0,
+        links=__graph.number_of_edges() if __graph is not None else 0,
+        trees=len(__trees)
+    )
+
+
+def clear():
+    if __graph is not None:
+        __graph.clear()
+    __trees.clear()
+    for name in __counters:
+        __counters[name] = 0
+
+
+def __tree(source):
+    tree = __trees.get(source)
+    if tree is not None:
+        __counters["hits"] += 1
+        __trees.move_to_end(source)
+        return tree
+
+    import networkx
+    __counters["misses"] += 1
+    (predecessors, distances) = networkx.dijkstra_predecessor_and_distance(__graph, source, weight="latency")
+    # Of the predecessors of a sector in its (tied) shortest paths, only the first is kept as its parent. The source
+    #   has none, even when tied with a neighbour over a link of zero latency.
+    tree = (
+        dict(((node, nodes[0]) for (node, nodes) in predecessors.items() if nodes and (node != source))), distances
+    )
+    __trees[source] = tree
+    while len(__trees) > __max_trees:
+        __trees.popitem(last=False)
+    return tree
+
+
+def __repair_shortened(a, b, latency):
+    '''
+        Repairs the cached trees in which a link of latency between a and b shortens the distance to a or b.
+    '''
+    infinity = float("inf")
+    for (parents, distances) in __trees.values():
+        (distance_a, distance_b) = (distances.get(a, infinity), distances.get(b, infinity))
+        if distance_a + latency < distance_b:
+            (parents[b], distances[b]) = (a, distance_a + latency)
+            __propagate(parents, distances, ((distances[b], b),))
+        elif distance_b + latency < distance_a:
+            (parents[a], distances[a]) = (b, distance_b + latency)
+            __propagate(parents, distances, ((distances[a], a),))
+        else:
+            continue
+        __counters["repaired"] += 1
+
+
+def __repair_lengthened(a, b):
+    '''
+        Repairs the cached trees using the link between a and b, after it was removed or its latency increased.
+    '''
+    for (parents, distances) in __trees.values():
+        if parents.get(b) == a:
+            __recompute_below(parents, distances, b)
+        elif parents.get(a) == b:
+            __recompute_below(parents, distances, a)
+        else:
+            continue
+        __counters["repaired"] += 1
+
+
+def __recompute_below(parents, distances, root):
+    '''
+        Computes again the distances of root and of the sectors below it in a tree, from the sectors around them (whose
+          distances are kept). Sectors no longer in the graph are dropped from the tree.
+    '''
+    children = {}
+    for (node, parent) in parents.items():
+        children.setdefault(parent, []).append(node)
+    below = [root]
+    for node in below:
+        below.extend(children.get(node, ()))
+    for node in below:
+        parents.pop(node, None)
+        del distances[node]
+
+    starts = []
+    for node in below:
+        if node not in __graph:
+            continue
+        best = None
+        for (neighbour, link) in __graph[node].items():
+            if (neighbour in distances) and ((best is None) or (distances[neighbour] + link["latency"] < best[0])):
+                best = (distances[neighbour] + link["latency"], neighbour)
+        if best is not None:
+            (distances[node], parents[node]) = best
+            starts.append((best[0], node))
+    __propagate(parents, distances, starts)
+
+
+def __propagate(parents, distances, starts):
+    '''
+        Propagates the shorter distances of the (distance, sector) starts to the sectors they shorten (Dijkstra, from
+          the starts only).
+    '''
+    infinity = float("inf")
+    order = itertools.count()
+    heap = list(((distance, next(order), node) for (distance, node) in starts))
+    heapq.heapify(heap)
+    while heap:
+        (distance, _, node) = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        for (neighbour, link) in __graph[node].items():
+            neighbour_distance = distance + link["latency"]
+            if neighbour_distance < distances.get(neighbour, infinity):
+                distances[neighbour] = neighbour_distance
+                parents[neighbour] = node
+                heapq.heappush(heap, (neighbour_distance, next(order), neighbour))
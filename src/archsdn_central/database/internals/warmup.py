@@ -0,0 +1,83 @@
+import logging
+import mmap
+import time
+from contextlib import closing
+
+from archsdn_central.helpers import logger_module_name
+
+from .shared_data import GetConnector, GetControllerIds
+from .exceptions import IntegrityCheckFailed
+
+__log = logging.getLogger(logger_module_name(__file__))
+
+# Largest database size memory mapped by SQLite. Larger databases are read through the SQLite page cache beyond it.
+__max_mmap_size = 1 << 30
+# Number of bytes of the database file preloaded between progress messages.
+__progress_step = 64 << 20
+
+
+def build_indexes():
+    '''
+        Builds the in-process indexes of the database, from the database tables.
+    '''
+    assert GetConnector(), "database not initialized"
+
+    start = time.monotonic()
+    controller_ids = GetControllerIds()
+    controller_ids.clear()
+    with closing(GetConnector().cursor()) as db_cursor:
+        db_cursor.execute("SELECT uuid, id FROM controllers")
+        controller_ids.update(db_cursor.fetchall())
+
+    __log.info("Controllers index built with {:d} controllers in {:.3f} ms.".format(
+        len(controller_ids), (time.monotonic() - start) * 1000
+    ))
+
+
+def warm_up(quick_check=False):
+    '''
+        Prepares an on-disk database to serve requests, before the service starts accepting them.
+        If quick_check is True, the database integrity is verified first, raising IntegrityCheckFailed if it fails.
+        The database file is then memory mapped by SQLite, and read once through its own mapping, so all the tables
+          and indexes are in the operating system page cache when the first requests arrive.
+        Databases in memory only have their integrity verified.
+    '''
+    assert GetConnector(), "database not initialized"
+    assert not GetConnector().in_transaction, "database with active transaction"
+
+    database_connector = GetConnector()
+    if quick_check:
+        start = time.monotonic()
+        __log.info("Verifying the database integrity...")
+        with closing(database_connector.cursor()) as db_cursor:
+            db_cursor.execute("PRAGMA quick_check")
+            res = tuple((row[0] for row in db_cursor.fetchall()))
+        if res != ("ok",):
+            for problem in res:
+                __log.error(problem)
+            raise IntegrityCheckFailed()
+        __log.info("Database integrity verified in {:.3f} ms.".format((time.monotonic() - start) * 1000))
+
+    with closing(database_connector.cursor()) as db_cursor:
+        db_cursor.execute("PRAGMA database_list")
+        location = next((row[2] for row in db_cursor.fetchall() if row[1] == "main"), "")
+    if not location:
+        return
+
+    start = time.monotonic()
+    with open(location, "rb") as fp:
+        size = fp.seek(0, 2)
+        if size == 0:
+            return
+        database_connector.execute("PRAGMA mmap_size = {:d}".format(min(size, __max_mmap_size)))
+
+        __log.info("Preloading {:d} bytes of database {:s}...".format(size, location))
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_WILLNEED)
+            for offset in range(0, size, mmap.PAGESIZE):
+                mapped[offset]
+                if offset and offset % __progress_step == 0:
+                    __log.info("Preloaded {:.0f}% of the database.".format(offset * 100 / size))
+
+    __log.info("Database preloaded in {:.3f} ms.".format((time.monotonic() - start) * 1000))
@@ -0,0 +1,135 @@
+import time
+from collections import deque
+
+# Lanes of the database operations, from the highest to the lowest priority.
+lanes = ("read", "write", "bulk")
+
+# Lane of each database operation. Operations not listed run in the bulk lane.
+operation_lanes = {
+    "info": "read",
+    "query_controller_info": "read",
+    "is_controller_registered": "read",
+    "list_controllers": "read",
+    "query_client_info": "read",
+    "is_client_registered": "read",
+    "list_clients": "read",
+    "query_address_info": "read",
+    "query_path": "read",
+    "topology_metrics": "read",
+    "register_controller": "write",
+    "update_controller_addresses": "write",
+    "register_client": "write",
+    "remove_client": "write",
+    "register_link": "write",
+    "remove_link": "write",
+}
+
+# Upper bounds (in milliseconds) of the latency histogram buckets. The last bucket counts the larger latencies.
+_bounds = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# Weight of the latest operation in the moving average of the operations latency.
+_latency_weight = 0.1
+
+
+class LaneScheduler:
+    '''
+        Priority scheduler of the database operations.
+        Operations are queued in their lane, and the next operation is taken from the highest priority lane with queued
+          operations: point reads first, then point writes, then bulk and maintenance operations.
+        To prevent starvation, a lane whose oldest operation has waited for longer than its maximum wait is served
+          first (the oldest of such operations, if several lanes are overdue).
+        Operations can be queued from any thread, and are taken by the database thread.
+    '''
+    def __init__(self, max_waits=None):
+        self.__queues = dict(((lane, deque()) for lane in lanes))
+        self.__max_waits = max_waits if max_waits is not None else {"read": None, "write": 0.05, "bulk": 0.25}
+        self.__operations = dict(((lane, 0) for lane in lanes))
+        self.__promoted = dict(((lane, 0) for lane in lanes))
+        self.__waits = dict(((lane, [0.0, 0.0]) for lane in lanes))
+        self.__runs = dict(((lane, [0.0, 0.0]) for lane in lanes))
+        self.__counts = dict(((lane, [0] * (len(_bounds) + 1)) for lane in lanes))
+        self.__latency = 0.0
+
+    def __len__(self):
+        return sum((len(queue) for queue in self.__queues.values()))
+
+    def put(self, lane, item):
+        self.__queues[lane].append((time.monotonic(), item))
+
+    def get(self):
+        '''
+            Returns the next operation, as (lane, seconds waited, item), or None if no operation is queued.
+        '''
+        now = time.monotonic()
+        selected = None
+        for lane in lanes:
+            queue = self.__queues[lane]
+            max_wait = self.__max_waits.get(lane)
+            if queue and (max_wait is not None) and (now - queue[0][0] > max_wait):
+                if (selected is None) or (queue[0][0] < self.__queues[selected][0][0]):
+                    selected = lane
+        if selected is not None:
+            self.__promoted[selected] += 1
+        else:
+            selected = next((lane for lane in lanes if self.__queues[lane]), None)
+            if selected is None:
+                return None
+
+        (queued, item) = self.__queues[selected].popleft()
+        return (selected, now - queued, item)
+
+    def record(self, lane, waited, run):
+        '''
+            Records the seconds an operation of lane waited in its queue and took to run.
+        '''
+        self.__operations[lane] += 1
+        for (totals, value) in ((self.__waits[lane], waited), (self.__runs[lane], run)):
+            totals[0] += value
+            totals[1] = max(totals[1], value)
+        self.__latency += _latency_weight * (waited + run - self.__latency)
+        latency = (waited + run) * 1000
+        index = 0
+        while index < len(_bounds) and latency > _bounds[index]:
+            index += 1
+        self.__counts[lane][index] += 1
+
+    def latency(self):
+        '''
+            Returns the current latency of the operations, in seconds: the moving average of the latency of the last
+              operations run or, if larger, the time the oldest queued operation has been waiting. It can be called
+              from any thread.
+        '''
+        now = time.monotonic()
+        latency = self.__latency
+        for queue in self.__queues.values():
+            try:
+                latency = max(latency, now - queue[0][0])
+            except IndexError:
+                pass
+        return latency
+
+    def metrics(self):
+        '''
+            Returns the metrics of each lane. Times are in milliseconds:
+              - queued: number of operations queued;
+              - operations: number of operations run;
+              - promoted: number of operations run before those of higher priority lanes, for having waited too long;
+              - wait_mean, wait_max, run_mean and run_max: the mean and maximum time the operations waited and ran;
+              - bounds and counts: histogram of the latency (wait and run) of the operations, where the last bucket
+                counts the latencies larger than the last bound.
+        '''
+        metrics = {}
+        for lane in lanes:
+            operations = self.__operations[lane]
+            metrics[lane] = {
+                "queued": len(self.__queues[lane]),
+                "operations": operations,
+                "promoted": self.__promoted[lane],
+                "wait_mean": self.__waits[lane][0] * 1000 / operations if operations else 0.0,
+                "wait_max": self.__waits[lane][1] * 1000,
+                "run_mean": self.__runs[lane][0] * 1000 / operations if operations else 0.0,
+                "run_max": self.__runs[lane][1] * 1000,
+                "bounds": _bounds,
+                "counts": tuple(self.__counts[lane]),
+            }
+        return metrics
@@ -0,0 +1,3 @@
+-- The clients of a controller are looked up by the listing of its clients, and deleted when it is removed or
+--   requests a clean slate. The client_unique_id index starts by the client id, so it cannot be used for these.
+CREATE INDEX IF NOT EXISTS clients_controller ON clients (controller);
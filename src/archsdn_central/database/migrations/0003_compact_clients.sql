@@ -0,0 +1,46 @@
+-- Client rows carry their addresses inline, so the client lookups do not join clients_ipv4s and clients_ipv6s.
+-- The client names are derived from the client id and the controller uuid ("<client id>.<controller uuid>.archsdn")
+--   instead of being stored in the names table.
+-- clients_ipv4s and clients_ipv6s are kept, as they allocate the client addresses.
+ALTER TABLE clients ADD COLUMN ipv4_address INTEGER;
+ALTER TABLE clients ADD COLUMN ipv6_address BLOB;
+
+-- chunk: clients 10000
+UPDATE clients SET
+    ipv4_address = (SELECT address FROM clients_ipv4s WHERE clients_ipv4s.id == clients.ipv4),
+    ipv6_address = (SELECT address FROM clients_ipv6s WHERE clients_ipv6s.id == clients.ipv6),
+    name = NULL
+  WHERE rowid BETWEEN :first AND :last;
+
+DELETE FROM names WHERE id NOT IN (SELECT name FROM controllers);
+
+CREATE INDEX clients_ipv4_address ON clients (ipv4_address);
+CREATE INDEX clients_ipv6_address ON clients (ipv6_address);
+
+DROP TRIGGER IF EXISTS delete_client;
+CREATE TRIGGER delete_client
+        BEFORE DELETE
+            ON clients
+      FOR EACH ROW
+BEGIN
+  DELETE FROM clients_ipv4s
+        WHERE clients_ipv4s.id == old.ipv4;
+  DELETE FROM clients_ipv6s
+        WHERE clients_ipv6s.id == old.ipv6;
+END;
+
+DROP VIEW IF EXISTS clients_view;
+CREATE VIEW clients_view AS
+  SELECT clients.id AS id,
+         clients.ipv4_address AS ipv4,
+         clients.ipv6_address AS ipv6,
+         clients.id || '.' || lower(
+             substr(hex(controllers.uuid), 1, 8) || '-' || substr(hex(controllers.uuid), 9, 4) || '-' ||
+             substr(hex(controllers.uuid), 13, 4) || '-' || substr(hex(controllers.uuid), 17, 4) || '-' ||
+             substr(hex(controllers.uuid), 21)
+         ) || '.archsdn' AS name,
+         controllers.uuid AS controller,
+         clients.registration_date AS registration_date
+    FROM clients
+         LEFT JOIN
+         controllers ON controllers.id == clients.controller;
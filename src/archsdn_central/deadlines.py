@@ -0,0 +1,83 @@
+# coding=utf-8
+
+# Request deadlines.
+# A request can carry, in its envelope header, the time its sender waits for the reply (timeout_ms). Its deadline is the
+#   time it was received plus that timeout, and is kept in a context variable while the request is processed.
+# A request whose deadline has expired is not processed any further: the sender has given up on it, and may have sent
+#   it again. The deadline is checked when the request is taken from the requests queue, when its database operations
+#   are submitted, and when they are taken by the database thread. The expiries are counted per request type and stage.
+import time
+from contextvars import ContextVar
+
+from archsdn_central.database.internals.exceptions import DeadlineExpired
+
+__deadline = ContextVar("deadline", default=None)
+__request_type = ContextVar("request_type", default=None)
+__expiries = {}
+
+
+def deadline_from(header, received=None):
+    '''
+        Returns the deadline (in time.monotonic() seconds) of a request received at received (by default, now) with the
+          envelope header, or None if it has none.
+    '''
+    timeout_ms = header.get("timeout_ms") if header else None
+    if timeout_ms is None:
+        return None
+    return (received if received is not None else time.monotonic()) + timeout_ms / 1000
+
+
+def set_current(deadline, request_type):
+    '''
+        Sets the deadline and the type of the request processed in the current context.
+    '''
+    __deadline.set(deadline)
+    __request_type.set(request_type)
+
+
+def current():
+    '''
+        Returns the deadline of the request processed in the current context, or None.
+    '''
+    return __deadline.get()
+
+
+def current_request_type():
+    '''
+        Returns the type of the request processed in the current context, or None.
+    '''
+    return __request_type.get()
+
+
+def expired(deadline, request_type, stage):
+    '''
+        Returns True, counting the expiry, if deadline has expired.
+    '''
+    if (deadline is None) or (time.monotonic() < deadline):
+        return False
+    count(request_type, stage)
+    return True
+
+
+def check(stage, deadline=None, request_type=None):
+    '''
+        Raises DeadlineExpired, counting the expiry, if the deadline (by default, the deadline of the request processed
+          in the current context) has expired.
+    '''
+    if deadline is None:
+        deadline = __deadline.get()
+        request_type = __request_type.get()
+    if expired(deadline, request_type, stage):
+        raise DeadlineExpired()
+
+
+def count(request_type, stage):
+    stages = __expiries.setdefault(request_type if request_type is not None else "(unknown)", {})
+    stages[stage] = stages.get(stage, 0) + 1
+
+
+def metrics():
+    '''
+        Returns the number of expired requests of each request type, by stage (queue, submit or database).
+    '''
+    return dict(((request_type, dict(stages)) for (request_type, stages) in tuple(__expiries.items())))
@@ -0,0 +1,77 @@
+# coding=utf-8
+
+# Reply de-duplication cache.
+# A client retrying a request after losing its reply (e.g. after a timeout) cannot tell whether the request was
+#   processed: a retried registration is replied with RPLControllerAlreadyRegistered or RPLClientAlreadyRegistered when
+#   the first attempt succeeded. Requests sent with an idempotency key (the peer and the request id of the envelope
+#   header) have their encoded replies kept for a time window, so their retries are replied with the original reply,
+#   without being processed again. A retry received while the original request is being processed waits for its reply.
+import time
+import asyncio
+from collections import OrderedDict
+
+
+class DeduplicationCache:
+    '''
+        Bounded cache of the replies to the requests with an idempotency key, kept for window seconds, and up to
+          max_entries replies (the oldest are discarded first).
+        Must be used from a single event loop.
+    '''
+    def __init__(self, max_entries=4096, window=60.0):
+        assert isinstance(max_entries, int) and max_entries > 0, "max_entries expected to be a positive int"
+        assert window > 0, "window expected to be positive"
+
+        self.__max_entries = max_entries
+        self.__window = window
+        self.__entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key):
+        '''
+            Returns the future of the reply to the request of key, or None if it is not cached.
+        '''
+        self.__expire(time.monotonic())
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key):
+        '''
+            Returns a new future for the reply to the request of key, to be set once the request is processed.
+        '''
+        now = time.monotonic()
+        self.__expire(now)
+        self.misses += 1
+        future = asyncio.get_event_loop().create_future()
+        self.__entries[key] = (now, future)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
+        return future
+
+    def discard(self, key):
+        '''
+            Discards the reply to the request of key, so its retries are processed again.
+        '''
+        self.__entries.pop(key, None)
+
+    def metrics(self):
+        '''
+            Returns the number of replies cached, and the number of requests replied from the cache (hits) and
+              processed (misses).
+        '''
+        return {"entries": len(self.__entries), "hits": self.hits, "misses": self.misses}
+
+    def __expire(self, now):
+        while self.__entries:
+            (created, future) = next(iter(self.__entries.values()))
+            if now - created <= self.__window:
+                break
+            self.__entries.popitem(last=False)
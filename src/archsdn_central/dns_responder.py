@@ -0,0 +1,228 @@
+# coding=utf-8
+
+# DNS responder for the names of the controllers and clients.
+# An asyncio UDP server, authoritative for the archsdn zone, answering A and AAAA queries for the controller names
+#   ("<uuid>.controller.archsdn") and the client names ("<client id>.<controller uuid>.archsdn"), and PTR queries for
+#   their addresses (in in-addr.arpa and ip6.arpa).
+# The queries are answered from the names index of the database (see database.internals.names), which is kept up to
+#   date by the registrations and removals, without querying the database.
+# Replies:
+#   - NOERROR with the record, if the name has an address of the queried type;
+#   - NOERROR without records, if the name exists but has no address of the queried type (e.g. AAAA of a controller
+#     registered without an IPv6 address), or for other query types;
+#   - NXDOMAIN, for names in the archsdn zone (or addresses in the reverse zones) not registered;
+#   - REFUSED, for names outside the archsdn and reverse zones;
+#   - FORMERR, for malformed queries, and NOTIMP, for other operations than QUERY.
+import asyncio
+import logging
+import struct
+from uuid import UUID
+
+from archsdn_central.helpers import logger_module_name
+from archsdn_central.database.internals import names
+
+__log = logging.getLogger(logger_module_name(__file__))
+
+__transport = None
+__ttl = 60
+__counters = {"queries": 0, "answered": 0, "nodata": 0, "nxdomain": 0, "refused": 0, "errors": 0}
+
+# Record types and classes
+__A = 1
+__PTR = 12
+__AAAA = 28
+__IN = 1
+
+# Response codes
+__NOERROR = 0
+__FORMERR = 1
+__NXDOMAIN = 3
+__NOTIMP = 4
+__REFUSED = 5
+
+__header = struct.Struct("!HHHHHH")
+# Answer record, after its name: type, class, ttl and data length.
+__record = struct.Struct("!HHIH")
+# The answer name is a compression pointer to the question name, right after the header.
+__question_pointer = b"\xc0\x0c"
+
+
+def start(ip, port, ttl=60):
+    '''
+        Starts answering the queries received at (ip, port), with records of ttl seconds.
+    '''
+    global __ttl
+    assert isinstance(ttl, int) and ttl >= 0, "ttl expected to be a non-negative int"
+    __ttl = ttl
+    loop = asyncio.get_event_loop()
+    return loop.create_task(__listen(loop, str(ip), port))
+
+
+def stop():
+    global __transport
+    if __transport is not None:
+        __transport.close()
+        __transport = None
+
+
+def metrics():
+    '''
+        Returns the number of queries received, answered with records, answered without records (nodata), answered
+          with NXDOMAIN and REFUSED, and malformed or not supported (errors), and the number of names indexed.
+    '''
+    return dict(__counters, **names.sizes())
+
+
+async def __listen(loop, ip, port):
+    global __transport
+    (__transport, _) = await loop.create_datagram_endpoint(__Protocol, local_addr=(ip, port))
+    __log.info("DNS responder listening at {:s}:{:d}.".format(ip, port))
+
+
+class __Protocol(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        reply = answer(data)
+        if reply is not None:
+            self.transport.sendto(reply, addr)
+
+
+def answer(query):
+    '''
+        Returns the reply to a DNS query, or None if it is not to be replied (too short to have a header, or a
+          response).
+    '''
+    __counters["queries"] += 1
+    if len(query) < __header.size:
+        __counters["errors"] += 1
+        return None
+    (query_id, flags, questions, _, _, _) = __header.unpack_from(query)
+    if flags & 0x8000:
+        __counters["errors"] += 1
+        return None
+    # The recursion desired flag is copied to the reply.
+    reply_flags = 0x8400 | (flags & 0x0100)
+    if (flags >> 11) & 0xF != 0:
+        __counters["errors"] += 1
+        return __header.pack(query_id, reply_flags | __NOTIMP, 0, 0, 0, 0)
+
+    parsed = __parse_question(query) if questions == 1 else None
+    if parsed is None:
+        __counters["errors"] += 1
+        return __header.pack(query_id, reply_flags | __FORMERR, 0, 0, 0, 0)
+    (labels, qtype, qclass, end) = parsed
+    question = query[__header.size:end]
+
+    (rcode, records) = __resolve(labels, qtype) if qclass == __IN else (__REFUSED, ())
+    if rcode == __NXDOMAIN:
+        __counters["nxdomain"] += 1
+    elif rcode == __REFUSED:
+        __counters["refused"] += 1
+        # Not authoritative for the names outside its zones.
+        reply_flags &= ~0x0400
+    elif records:
+        __counters["answered"] += 1
+    else:
+        __counters["nodata"] += 1
+
+    parts = [__header.pack(query_id, reply_flags | rcode, 1, len(records), 0, 0), question]
+    for (rtype, rdata) in records:
+        parts.append(__question_pointer)
+        parts.append(__record.pack(rtype, __IN, __ttl, len(rdata)))
+        parts.append(rdata)
+    return b"".join(parts)
+
+
+def __parse_question(query):
+    '''
+        Returns the lower case labels, type and class of the question, and the offset of its end, or None if the
+          question is malformed. Compressed names are not expected in questions.
+    '''
+    labels = []
+    offset = __header.size
+    while True:
+        if offset >= len(query):
+            return None
+        length = query[offset]
+        offset += 1
+        if length == 0:
+            break
+        if (length & 0xC0) or (offset + length > len(query)):
+            return None
+        labels.append(query[offset:offset + length].decode("ascii", "replace").lower())
+        offset += length
+    if offset + 4 > len(query):
+        return None
+    (qtype, qclass) = struct.unpack_from("!HH", query, offset)
+    return (labels, qtype, qclass, offset + 4)
+
+
+def __resolve(labels, qtype):
+    '''
+        Returns the response code and the (type, data) records answering a question.
+    '''
+    if labels and labels[-1] == "archsdn":
+        addresses = __forward(labels)
+        if addresses is None:
+            return (__NXDOMAIN, ())
+        if qtype == __A and addresses[0] is not None:
+            return (__NOERROR, ((__A, addresses[0].to_bytes(4, "big")),))
+        if qtype == __AAAA and addresses[1] is not None:
+            return (__NOERROR, ((__AAAA, addresses[1]),))
+        return (__NOERROR, ())
+
+    if labels[-2:] in (["in-addr", "arpa"], ["ip6", "arpa"]):
+        address = __reverse(labels)
+        name = __name(names.owner(address)) if address is not None else None
+        if name is None:
+            return (__NXDOMAIN, ())
+        if qtype == __PTR:
+            return (__NOERROR, ((__PTR, __encode_name(name)),))
+        return (__NOERROR, ())
+
+    return (__REFUSED, ())
+
+
+def __forward(labels):
+    '''
+        Returns the (ipv4, ipv6) addresses of the name with labels, or None if it is not registered.
+    '''
+    try:
+        if len(labels) == 3 and labels[1] == "controller":
+            return names.controller_addresses(UUID(labels[0]).bytes)
+        if len(labels) == 3 and labels[0].isdigit():
+            return names.client_addresses(UUID(labels[1]).bytes, int(labels[0]))
+    except ValueError:
+        pass
+    return None
+
+
+def __reverse(labels):
+    '''
+        Returns the address (an IPv4 int or IPv6 bytes) of the reverse name with labels, or None if it is not a
+          complete address.
+    '''
+    try:
+        if labels[-2] == "in-addr" and len(labels) == 6:
+            octets = bytes((int(label) for label in reversed(labels[:4])))
+            return int.from_bytes(octets, "big")
+        if labels[-2] == "ip6" and len(labels) == 34 and all((len(label) == 1 for label in labels[:32])):
+            return bytes.fromhex("".join(reversed(labels[:32])))
+    except ValueError:
+        pass
+    return None
+
+
+def __name(owner):
+    if owner is None:
+        return None
+    (uuid, client_id) = owner
+    if client_id is None:
+        return "{:s}.controller.archsdn".format(str(UUID(bytes=uuid)))
+    return "{:d}.{:s}.archsdn".format(client_id, str(UUID(bytes=uuid)))
+
+
+def __encode_name(name):
+    return b"".join((bytes((len(label),)) + label.encode("ascii") for label in name.split("."))) + b"\x00"
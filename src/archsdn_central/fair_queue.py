@@ -0,0 +1,144 @@
+# coding=utf-8
+
+import time
+from collections import OrderedDict, deque
+
+
+class Throttled(Exception):
+    '''
+        Raised by FairQueue.put when a request is not queued: its key is over its rate limit, or its queue is full.
+        retry_after is the number of seconds after which the key can be served again.
+    '''
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    '''
+        Token bucket with rate tokens per second, holding up to burst tokens. It starts full.
+    '''
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        '''
+            Takes a token. Returns 0 if it was available, or the seconds until one is available otherwise.
+        '''
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class FairQueue:
+    '''
+        Weighted fair queue of requests, keyed by their origin (e.g. the controller id).
+        Each key has its own FIFO queue, and the keys with queued requests are served in round-robin: in each round, a
+          key is served up to its weight (by default, 1) requests. A key flooding the queue only delays its own requests.
+        With a rate, each key has a token bucket of rate requests per second and burst requests. The requests of a key
+          without tokens, or whose queue holds max_depth requests, are not queued, and put raises Throttled.
+    '''
+    def __init__(self, rate=0, burst=0, max_depth=0, max_idle_keys=4096):
+        assert rate >= 0, "rate expected to be non-negative"
+        assert burst >= 0, "burst expected to be non-negative"
+        assert isinstance(max_depth, int) and max_depth >= 0, "max_depth expected to be a non-negative int"
+
+        self.__rate = rate
+        self.__burst = max(burst, 1)
+        self.__max_depth = max_depth
+        self.__max_idle_keys = max_idle_keys
+        self.__queues = OrderedDict()
+        self.__credits = {}
+        self.__weights = {}
+        self.__buckets = {}
+        self.__length = 0
+
+        self.queued = 0
+        self.throttled = 0
+
+    def __len__(self):
+        return self.__length
+
+    def set_weight(self, key, weight):
+        '''
+            Sets the number of requests served from key in each round.
+        '''
+        assert isinstance(weight, int) and weight > 0, "weight expected to be a positive int"
+        if weight == 1:
+            self.__weights.pop(key, None)
+        else:
+            self.__weights[key] = weight
+
+    def put(self, key, item):
+        '''
+            Queues item under key. Raises Throttled if the key is over its rate limit, or if its queue is full.
+        '''
+        queue = self.__queues.get(key)
+        if self.__max_depth and (queue is not None) and (len(queue) >= self.__max_depth):
+            self.throttled += 1
+            raise Throttled(1 / self.__rate if self.__rate else 0)
+
+        if self.__rate:
+            now = time.monotonic()
+            bucket = self.__buckets.get(key)
+            if bucket is None:
+                if len(self.__buckets) >= self.__max_idle_keys:
+                    self.__discard_idle_buckets(now)
+                bucket = self.__buckets[key] = TokenBucket(self.__rate, self.__burst, now)
+            retry_after = bucket.take(now)
+            if retry_after:
+                self.throttled += 1
+                raise Throttled(retry_after)
+
+        if queue is None:
+            queue = self.__queues[key] = deque()
+        queue.append(item)
+        self.__length += 1
+        self.queued += 1
+
+    def get(self):
+        '''
+            Returns the next item, in the fair order. Raises IndexError if the queue is empty.
+        '''
+        if not self.__queues:
+            raise IndexError("get from an empty fair queue")
+        (key, queue) = next(iter(self.__queues.items()))
+        credit = self.__credits.get(key)
+        if credit is None:
+            credit = self.__weights.get(key, 1)
+        item = queue.popleft()
+        self.__length -= 1
+        credit -= 1
+
+        if not queue:
+            del self.__queues[key]
+            self.__credits.pop(key, None)
+        elif credit == 0:
+            self.__queues.move_to_end(key)
+            self.__credits.pop(key, None)
+        else:
+            self.__credits[key] = credit
+        return item
+
+    def depths(self):
+        '''
+            Returns the number of queued requests of each key with queued requests.
+        '''
+        return dict(((key, len(queue)) for (key, queue) in self.__queues.items()))
+
+    def __discard_idle_buckets(self, now):
+        for (key, bucket) in tuple(self.__buckets.items()):
+            bucket.refill(now)
+            if (bucket.tokens >= bucket.burst) and (key not in self.__queues):
+                del self.__buckets[key]
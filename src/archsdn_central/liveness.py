@@ -0,0 +1,179 @@
+# coding=utf-8
+
+# Controller liveness.
+# Controllers which send heartbeats (REQHeartbeat) are tracked in a timer wheel, in memory: a heartbeat only moves the
+#   controller to the wheel slot of its new expiry, without touching the database. Controllers are only tracked after
+#   their first heartbeat, so the controllers which do not send heartbeats are never reaped.
+# A controller which sends no heartbeat for the configured timeout is considered dead, and is reaped in the background:
+#   its clients are released in chunks, each in its own transaction in the bulk lane of the database (see
+#   database.lanes), so the requests keep being served while a large address block is released. Then the controller
+#   is removed. Reaping stops, keeping the controller, if it sends a heartbeat meanwhile.
+# Dead controllers are reaped one at a time.
+import time
+import asyncio
+import logging
+
+from archsdn_central import database
+from archsdn_central.helpers import logger_module_name
+
+__log = logging.getLogger(logger_module_name(__file__))
+
+__wheel = None
+__timeout = None
+__chunk = None
+__on_released = None
+__reaper = None
+__reaping = None
+__reaped = 0
+__released = 0
+
+
+class TimerWheel:
+    '''
+        Hashed timer wheel of slots covering tick seconds each. Each key is kept in the slot of its expiry tick, so
+          (re)scheduling and cancelling a key take constant time, and advancing the wheel only visits the slots of the
+          elapsed ticks. Keys expiring in later revolutions of the wheel are kept in their slot until then.
+    '''
+    def __init__(self, tick, slots, now):
+        assert tick > 0, "tick expected to be positive"
+        assert isinstance(slots, int) and slots > 0, "slots expected to be a positive int"
+        self.__tick = tick
+        self.__slots = list((set() for _ in range(slots)))
+        self.__expiries = {}
+        self.__current = int(now / tick)
+
+    def __len__(self):
+        return len(self.__expiries)
+
+    def __contains__(self, key):
+        return key in self.__expiries
+
+    def schedule(self, key, delay, now):
+        '''
+            Schedules key to expire delay seconds after now, replacing its previous expiry.
+        '''
+        self.cancel(key)
+        # The expiry is rounded up to the next tick, so keys never expire early.
+        expiry = int((now + delay) / self.__tick) + 1
+        self.__expiries[key] = expiry
+        self.__slots[expiry % len(self.__slots)].add(key)
+
+    def cancel(self, key):
+        expiry = self.__expiries.pop(key, None)
+        if expiry is not None:
+            self.__slots[expiry % len(self.__slots)].discard(key)
+
+    def advance(self, now):
+        '''
+            Advances the wheel to now, and returns the keys expired meanwhile.
+        '''
+        target = int(now / self.__tick)
+        expired = []
+        for tick in range(self.__current + 1, min(target, self.__current + len(self.__slots)) + 1):
+            slot = self.__slots[tick % len(self.__slots)]
+            for key in tuple(slot):
+                if self.__expiries[key] <= target:
+                    slot.discard(key)
+                    del self.__expiries[key]
+                    expired.append(key)
+        self.__current = max(self.__current, target)
+        return expired
+
+
+def start(timeout, chunk=1000, on_released=None):
+    '''
+        Starts tracking the controllers heartbeats, and reaping the controllers without heartbeats for timeout
+          seconds, releasing chunk clients per transaction.
+        on_released, if given, is called with the controller id after each chunk of clients released, and after the
+          controller is removed (e.g. to invalidate the cached replies about it).
+    '''
+    global __wheel, __timeout, __chunk, __on_released, __reaper
+    assert timeout > 0, "timeout expected to be positive"
+    assert isinstance(chunk, int) and chunk > 0, "chunk expected to be a positive int"
+    __timeout = timeout
+    __chunk = chunk
+    __on_released = on_released
+    # The wheel covers twice the timeout in a revolution, so heartbeats are scheduled in the current revolution.
+    __wheel = TimerWheel(timeout / 32, 64, time.monotonic())
+    __reaper = asyncio.get_event_loop().create_task(__reaper_main(timeout / 32))
+
+
+def stop():
+    global __wheel, __reaper
+    if __reaper is not None:
+        __reaper.cancel()
+    __wheel = None
+    __reaper = None
+
+
+def heartbeat(controller_id):
+    '''
+        Records a heartbeat of a controller. Does nothing unless the liveness tracking is started.
+    '''
+    if __wheel is not None:
+        __wheel.schedule(controller_id, __timeout, time.monotonic())
+
+
+def forget(controller_id):
+    '''
+        Stops tracking a controller (e.g. once it is unregistered).
+    '''
+    if __wheel is not None:
+        __wheel.cancel(controller_id)
+
+
+def metrics():
+    '''
+        Returns the number of controllers tracked, the controller being reaped (if any), and the number of controllers
+          reaped and of clients released since the start.
+    '''
+    return {
+        "tracked": len(__wheel) if __wheel is not None else 0,
+        "reaping": str(__reaping) if __reaping is not None else None,
+        "reaped": __reaped,
+        "released": __released,
+    }
+
+
+async def __reaper_main(tick):
+    while True:
+        await asyncio.sleep(tick)
+        for controller_id in __wheel.advance(time.monotonic()):
+            try:
+                await __reap(controller_id)
+            except Exception as ex:
+                __log.error("Reaping of controller {:s} failed: {:s}".format(str(controller_id), str(ex)))
+
+
+async def __reap(controller_id):
+    global __reaping, __reaped, __released
+    __log.warning("Controller {:s} sent no heartbeat for {:.1f} seconds: reaping it.".format(
+        str(controller_id), __timeout
+    ))
+    __reaping = controller_id
+    released = 0
+    try:
+        while True:
+            if controller_id in __wheel:
+                __log.warning("Controller {:s} is alive again: reaping stopped after {:d} clients released.".format(
+                    str(controller_id), released
+                ))
+                return
+            count = await database.release_clients(controller_id, __chunk)
+            released += count
+            __released += count
+            if __on_released is not None:
+                __on_released(controller_id)
+            if count < __chunk:
+                break
+        if controller_id in __wheel:
+            return
+        await database.remove_controller(controller_id)
+        __reaped += 1
+        if __on_released is not None:
+            __on_released(controller_id)
+        __log.warning("Controller {:s} reaped: {:d} clients released.".format(str(controller_id), released))
+    except database.ControllerNotRegistered:
+        __log.info("Controller {:s} was already unregistered.".format(str(controller_id)))
+    finally:
+        __reaping = None
@@ -0,0 +1,71 @@
+# coding=utf-8
+
+# Load shedding.
+# When requests arrive faster than they are processed, the backlog, and the latency of every request, grow without
+#   bound, and the controllers only see timeouts. Above the configured thresholds of requests pending (queued and
+#   in-flight) or of database latency, the received requests which are not protected are not queued: they are replied
+#   at once with RPLBusy(retry_after_ms), so the backlog drains and the protected requests (registrations and
+#   removals) keep being served.
+# Shedding stops once the load falls below a fraction (recovery) of the thresholds, so it does not flap around them.
+
+
+class LoadShedder:
+    '''
+        Decides which requests are shed. Requests are shed while more than max_pending requests are pending, or while
+          the database latency is larger than max_latency seconds. A zero threshold is not used.
+        Requests whose type is in protected are never shed.
+    '''
+    def __init__(self, max_pending=0, max_latency=0, protected=(), recovery=0.75, max_retry_after=5.0):
+        assert isinstance(max_pending, int) and max_pending >= 0, "max_pending expected to be a non-negative int"
+        assert max_latency >= 0, "max_latency expected to be non-negative"
+        assert 0 < recovery <= 1, "recovery expected to be in ]0, 1]"
+
+        self.__max_pending = max_pending
+        self.__max_latency = max_latency
+        self.__protected = frozenset(protected)
+        self.__recovery = recovery
+        self.__max_retry_after = max_retry_after
+        self.__shed = {}
+
+        self.shedding = False
+        self.episodes = 0
+
+    def __bool__(self):
+        return bool(self.__max_pending or self.__max_latency)
+
+    def overloaded(self, pending, latency):
+        '''
+            Updates and returns the shedding state, given the number of pending requests and the database latency.
+        '''
+        factor = self.__recovery if self.shedding else 1
+        overloaded = bool(
+            (self.__max_pending and pending > self.__max_pending * factor) or
+            (self.__max_latency and latency > self.__max_latency * factor)
+        )
+        if overloaded and not self.shedding:
+            self.episodes += 1
+        self.shedding = overloaded
+        return overloaded
+
+    def check(self, request_type, pending, latency):
+        '''
+            Returns 0 if a request of request_type is to be queued or, if it is to be shed, the seconds after which it
+              can be sent again: the time the database takes to serve the pending requests, estimated from its latency.
+        '''
+        if (request_type in self.__protected) or not self.overloaded(pending, latency):
+            return 0
+        name = request_type.__name__ if isinstance(request_type, type) else str(request_type)
+        self.__shed[name] = self.__shed.get(name, 0) + 1
+        return min(max(latency, 0.01) * max(pending / self.__max_pending if self.__max_pending else 1, 1),
+                   self.__max_retry_after)
+
+    def metrics(self):
+        '''
+            Returns whether requests are being shed, the number of times shedding started, and the number of requests
+              shed per request type.
+        '''
+        return {
+            "shedding": self.shedding,
+            "episodes": self.episodes,
+            "shed": dict(self.__shed),
+        }
@@ -0,0 +1,175 @@
+# coding=utf-8
+
+# Event loop lag monitor.
+# A probe is scheduled on every monitored event loop each interval seconds, and measures how late the loop runs it (the
+#   loop lag) into a histogram.
+# A watchdog thread checks the probes of every loop. When a loop has not run its probe for longer than the threshold,
+#   the loop is blocked, and the stack of its thread is sampled (with sys._current_frames) and written to the stacks
+#   log: a rotating file, when configured, or the program log otherwise. A single sample is taken per blocking.
+import sys
+import time
+import logging
+import threading
+import traceback
+from logging.handlers import RotatingFileHandler
+
+from archsdn_central.helpers import logger_module_name
+
+__log = logging.getLogger(logger_module_name(__file__))
+__stacks_log = logging.getLogger("{:s}.stacks".format(logger_module_name(__file__)))
+
+# Upper bounds (in milliseconds) of the lag histogram buckets. The last bucket counts the larger lags.
+_bounds = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+__monitors = {}
+__monitors_lock = threading.Lock()
+__watchdog = None
+
+
+class _Monitor:
+    '''
+        Lag probe of an event loop.
+        The probe state is only changed by the loop thread, and read by the watchdog thread.
+    '''
+    def __init__(self, loop, name, interval, threshold):
+        self.loop = loop
+        self.name = name
+        self.interval = interval
+        self.threshold = threshold
+        self.thread_id = None
+        self.handle = None
+        self.last_run = None
+        self.sampled = False
+        self.stopped = False
+        self.counts = [0] * (len(_bounds) + 1)
+        self.total = 0.0
+        self.maximum = 0.0
+        self.stalls = 0
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.last_run = time.monotonic()
+        self.schedule()
+
+    def schedule(self):
+        if not self.stopped:
+            expected = self.loop.time() + self.interval
+            self.handle = self.loop.call_at(expected, self.probe, expected)
+
+    def probe(self, expected):
+        lag = max(self.loop.time() - expected, 0.0) * 1000
+        index = 0
+        while index < len(_bounds) and lag > _bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += lag
+        self.maximum = max(self.maximum, lag)
+        self.last_run = time.monotonic()
+        self.sampled = False
+        self.schedule()
+
+    def stop(self):
+        self.stopped = True
+        if self.handle is not None:
+            self.handle.cancel()
+
+    def histogram(self):
+        counts = tuple(self.counts)
+        count = sum(counts)
+        return {
+            "bounds": _bounds,
+            "counts": counts,
+            "count": count,
+            "mean": self.total / count if count else 0.0,
+            "max": self.maximum,
+            "stalls": self.stalls,
+        }
+
+
+def configure_stacks(location, max_bytes=1 << 20, backups=5):
+    '''
+        Writes the stack samples of the blocked loops to the rotating file at location, instead of the program log.
+    '''
+    for handler in tuple(__stacks_log.handlers):
+        __stacks_log.removeHandler(handler)
+        handler.close()
+    handler = RotatingFileHandler(str(location), maxBytes=max_bytes, backupCount=backups)
+    handler.setFormatter(logging.Formatter('[{asctime:^s}]: {message:s}', style='{'))
+    __stacks_log.addHandler(handler)
+    __stacks_log.propagate = False
+
+
+def monitor(loop, name, interval=0.1, threshold=0.25):
+    '''
+        Starts monitoring the lag of loop, reported as name.
+        The probe runs every interval seconds. A stack sample of the loop thread is taken when the loop is blocked for
+          longer than threshold seconds (zero disables the samples).
+        Can be called from any thread.
+    '''
+    global __watchdog
+    assert isinstance(name, str), "name expected to be a str"
+    assert interval > 0, "interval expected to be positive"
+    assert threshold >= 0, "threshold expected to be non-negative"
+
+    stop(name)
+    monitor_info = _Monitor(loop, name, interval, threshold)
+    with __monitors_lock:
+        __monitors[name] = monitor_info
+        if __watchdog is None:
+            __watchdog = threading.Thread(target=__watchdog_main, name="loop-watchdog", daemon=True)
+            __watchdog.start()
+    loop.call_soon_threadsafe(monitor_info.start)
+
+
+def stop(name):
+    '''
+        Stops monitoring the loop reported as name. Its histogram is discarded.
+    '''
+    with __monitors_lock:
+        monitor_info = __monitors.pop(name, None)
+    if (monitor_info is not None) and not monitor_info.loop.is_closed():
+        monitor_info.loop.call_soon_threadsafe(monitor_info.stop)
+
+
+def histograms():
+    '''
+        Returns the lag histogram of every monitored loop, by name. Lags are in milliseconds:
+          - bounds: upper bounds of the buckets, except the last bucket, which counts the larger lags;
+          - counts: number of probes per bucket;
+          - count, mean and max: number of probes, mean lag and maximum lag;
+          - stalls: number of blockings longer than the threshold, whose stacks were sampled.
+    '''
+    with __monitors_lock:
+        monitors = tuple(__monitors.values())
+    return dict(((monitor_info.name, monitor_info.histogram()) for monitor_info in monitors))
+
+
+def __sample(monitor_info, blocked):
+    frame = sys._current_frames().get(monitor_info.thread_id)
+    if frame is None:
+        return
+    __stacks_log.warning(
+        "Event loop {:s} blocked for {:.3f} seconds. Stack of its thread (most recent call last):\n{:s}".format(
+            monitor_info.name, blocked, "".join(traceback.format_stack(frame))
+        )
+    )
+
+
+def __watchdog_main():
+    while True:
+        with __monitors_lock:
+            monitors = tuple(__monitors.values())
+        thresholds = tuple((monitor_info.threshold for monitor_info in monitors if monitor_info.threshold))
+        now = time.monotonic()
+        for monitor_info in monitors:
+            if (not monitor_info.threshold) or (monitor_info.last_run is None) or monitor_info.sampled:
+                continue
+            blocked = now - monitor_info.last_run - monitor_info.interval
+            if blocked > monitor_info.threshold:
+                monitor_info.sampled = True
+                monitor_info.stalls += 1
+                try:
+                    __sample(monitor_info, blocked)
+                except Exception:
+                    __log.exception("Cannot sample the stack of the event loop {:s}".format(monitor_info.name))
+        time.sleep(max(min(thresholds, default=1.0) / 4, 0.01))
@@ -10,7 +10,6 @@ This program is part of the ArchSDN system, which is composed of a Central manag
 management controller program.
 """
 
-import asyncio
 import logging
 import sys
 import signal
@@ -18,11 +17,6 @@ import functools
 
 from archsdn_central.helpers import custom_logging_callback, logger_module_name
 from archsdn_central.arg_parsing import parse_arguments
-from archsdn_central import database
-from archsdn_central import zmq_requests
-
-
-
 
 
 # Initialize Exception Hook
@@ -37,11 +31,23 @@ __log = logging.getLogger(logger_module_name(__file__))
 
 
 def quit_callback(signame):
+    import asyncio
     __log.warning('Got signal {:s}: exit'.format(signame))
     asyncio.get_event_loop().stop()
 
 
 def main():
+    parsed_args = parse_arguments()
+
+    # asyncio, the database and the ZMQ modules (and their zmq, blosc and netaddr dependencies) are only imported after
+    #   the arguments are parsed, so --help and invalid arguments do not pay for them.
+    import asyncio
+    from archsdn_central import database
+    if parsed_args.workers:
+        from archsdn_central import zmq_workers
+    else:
+        from archsdn_central import zmq_requests
+
     try:
         loop = asyncio.get_event_loop()
 
@@ -49,7 +55,18 @@ def main():
         for signame in ('SIGINT', 'SIGTERM'):
             loop.add_signal_handler(getattr(signal, signame), functools.partial(quit_callback, signame))
 
-        parsed_args = parse_arguments()
+        # SIGUSR1 starts and stops the sampling profiler
+        from archsdn_central import profiler
+        profiler.configure(parsed_args.profileDirectory)
+        loop.add_signal_handler(signal.SIGUSR1, profiler.toggle)
+
+        # SIGUSR2 starts the memory diagnostics, and logs their report afterwards
+        from archsdn_central import memory_diagnostics
+        loop.add_signal_handler(
+            signal.SIGUSR2,
+            lambda: memory_diagnostics.log_report() if memory_diagnostics.is_started() else memory_diagnostics.start()
+        )
+
         if sys.flags.debug:
             logging.basicConfig(format=__log_format_debug, datefmt=__log_datefmt, style='{', level=logging.DEBUG)
         else:
@@ -64,15 +81,74 @@ def main():
         fut = database.initialise(
             location=parsed_args.storage,
             ipv4_network=parsed_args.ipv4network,
-            ipv6_network=parsed_args.ipv6network
+            ipv6_network=parsed_args.ipv6network,
+            migrate=not parsed_args.migrationsDryRun
         )
         loop.run_until_complete(fut)
         fut.result()
 
-        zmq_requests.zmq_context_initialize(parsed_args.ip, parsed_args.port)
+        if parsed_args.migrationsDryRun:
+            fut = database.migrate(dry_run=True)
+            loop.run_until_complete(fut)
+            fut.result()
+            loop.run_until_complete(database.close())
+            return
+
+        fut = database.warm_up(quick_check=parsed_args.quickCheck)
+        loop.run_until_complete(fut)
+        fut.result()
+
+        if parsed_args.snapshotDirectory:
+            fut = database.configure_snapshots(
+                parsed_args.snapshotDirectory, parsed_args.snapshotKeep, parsed_args.snapshotInterval
+            )
+            loop.run_until_complete(fut)
+            fut.result()
+
+        if parsed_args.lagInterval:
+            from archsdn_central import loop_monitor
+            if parsed_args.lagStacksFile:
+                loop_monitor.configure_stacks(parsed_args.lagStacksFile)
+            loop_monitor.monitor(loop, "main", parsed_args.lagInterval, parsed_args.lagThreshold)
+            database.monitor(parsed_args.lagInterval, parsed_args.lagThreshold)
+
+        if parsed_args.dnsPort:
+            from archsdn_central import dns_responder
+            fut = database.index_names()
+            loop.run_until_complete(fut)
+            fut.result()
+            loop.run_until_complete(dns_responder.start(parsed_args.ip, parsed_args.dnsPort, parsed_args.dnsTtl))
+
+        if parsed_args.workers:
+            ignored = list((
+                option for (option, name) in (
+                    ("--replyCache", "replyCache"), ("--queueDepth", "queueDepth"), ("--dedupCache", "dedupCache")
+                ) if getattr(parsed_args, name)
+            ))
+            if ignored:
+                __log.warning(
+                    "The requests are processed by worker processes, without the reply cache, the fair queue and the "
+                    "de-duplication cache: {:s} not used.".format(", ".join(ignored))
+                )
+            zmq_workers.zmq_workers_initialize(
+                parsed_args.ip, parsed_args.port, parsed_args.workers, parsed_args.lagInterval, parsed_args.lagThreshold
+            )
+        else:
+            zmq_requests.zmq_context_initialize(
+                parsed_args.ip, parsed_args.port, parsed_args.replyCache,
+                parsed_args.rateLimit, parsed_args.rateBurst, parsed_args.queueDepth,
+                shed_pending=parsed_args.shedPending, shed_latency=parsed_args.shedLatency / 1000,
+                dedup_size=parsed_args.dedupCache, dedup_window=parsed_args.dedupWindow,
+                heartbeat_timeout=parsed_args.heartbeatTimeout, weights=dict(parsed_args.controllerWeight or ())
+            )
 
         loop.run_forever()
-        zmq_requests.zmq_context_close()
+        if parsed_args.workers:
+            zmq_workers.zmq_workers_close()
+        else:
+            zmq_requests.zmq_context_close()
+        if parsed_args.dnsPort:
+            dns_responder.stop()
 
     except Exception:
         custom_logging_callback(__log, logging.ERROR, *sys.exc_info())
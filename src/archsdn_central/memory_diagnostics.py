@@ -0,0 +1,199 @@
+# coding=utf-8
+
+# Live memory diagnostics.
+# When started, tracemalloc traces the memory blocks allocated by the process, and a baseline snapshot is taken. Each
+#   report takes a new snapshot and compares it to the baseline: the memory grown since the baseline is grouped by the
+#   module of the allocation site (e.g. archsdn_central.zmq_messages, sqlite3, logging), and the top allocation sites
+#   are listed.
+# While started, the memory retained by each request (the traced bytes and the allocated blocks, after the request
+#   minus before it) is accumulated per request type, so the requests leaking memory stand out. Memory allocated and
+#   freed by a request is not retained, so its churn is accounted apart: the traced bytes peak during the request
+#   (the traced peak is reset before each request) minus the traced bytes before it, also accumulated per request
+#   type. Resetting the peak needs Python 3.9 (tracemalloc.reset_peak): before, the churn is not accounted (zero).
+# Requests processed concurrently are accounted together, so the accounting is exact only for requests processed one
+#   at a time.
+import os
+import sys
+import logging
+import tracemalloc
+
+from archsdn_central.helpers import logger_module_name
+
+__log = logging.getLogger(logger_module_name(__file__))
+
+__filters = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+__baseline = None
+__requests = {}
+__module_names = {}
+# Whether tracing was started by start (and not e.g. by -X tracemalloc), so stop only stops it in that case.
+__started_tracing = False
+# Traced peak before its last reset (see mark), so the reported peak is the peak since the diagnostics started.
+__peak = 0
+
+
+def is_started():
+    return __baseline is not None
+
+
+def start(frames=1):
+    '''
+        Starts tracing the memory allocations, and takes the baseline snapshot. If already started, only the baseline
+          snapshot and the requests accounting are reset.
+        frames is the number of frames stored per allocation. Only the innermost frame is used in the reports.
+    '''
+    global __baseline, __started_tracing, __peak
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        __started_tracing = True
+    __peak = 0
+    __baseline = tracemalloc.take_snapshot().filter_traces(__filters)
+    __requests.clear()
+    __log.warning("Memory diagnostics started: {:d} bytes traced in the baseline.".format(
+        tracemalloc.get_traced_memory()[0]
+    ))
+
+
+def stop():
+    '''
+        Stops tracing the memory allocations (unless tracing was started before start), and discards the baseline
+          snapshot and the requests accounting.
+    '''
+    global __baseline, __started_tracing
+    __baseline = None
+    __requests.clear()
+    __module_names.clear()
+    if __started_tracing:
+        tracemalloc.stop()
+        __started_tracing = False
+    __log.warning("Memory diagnostics stopped.")
+
+
+def mark():
+    '''
+        Returns the memory counters to be given to account, after a request, and resets the traced peak.
+    '''
+    global __peak
+    (traced, peak) = tracemalloc.get_traced_memory()
+    if hasattr(tracemalloc, "reset_peak"):
+        __peak = max(__peak, peak)
+        tracemalloc.reset_peak()
+    return (sys.getallocatedblocks(), traced)
+
+
+def account(request_type, marker):
+    '''
+        Accumulates the memory retained since marker (see mark), and the memory peak above it, for request_type.
+    '''
+    blocks = sys.getallocatedblocks()
+    (traced, peak) = tracemalloc.get_traced_memory()
+    entry = __requests.get(request_type)
+    if entry is None:
+        entry = __requests[request_type] = [0, 0, 0, 0]
+    entry[0] += 1
+    entry[1] += blocks - marker[0]
+    entry[2] += traced - marker[1]
+    if hasattr(tracemalloc, "reset_peak"):
+        entry[3] += max(peak - marker[1], 0)
+
+
+def report(limit=10):
+    '''
+        Returns the memory report, as a dict:
+          - tracing: whether the diagnostics are started (the remaining values are empty otherwise);
+          - traced and peak: the memory traced now, and its peak, in bytes;
+          - modules: the limit modules whose allocations grew the most since the baseline, as
+            (module, size difference, blocks difference, size, blocks) tuples;
+          - sites: the limit allocation sites which grew the most since the baseline, as
+            ("file:line", size difference, blocks difference) tuples;
+          - requests: the requests accounting, as request type -> (requests, retained blocks, retained bytes, peak
+            bytes), the peak bytes being the sum of the peaks above the memory traced before each request.
+    '''
+    if __baseline is None:
+        return {"tracing": False, "traced": 0, "peak": 0, "modules": (), "sites": (), "requests": {}}
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(__filters)
+    (traced, peak) = tracemalloc.get_traced_memory()
+    peak = max(peak, __peak)
+
+    modules = {}
+    for statistic in snapshot.compare_to(__baseline, "filename"):
+        module = __module_name(statistic.traceback[0].filename)
+        totals = modules.setdefault(module, [0, 0, 0, 0])
+        totals[0] += statistic.size_diff
+        totals[1] += statistic.count_diff
+        totals[2] += statistic.size
+        totals[3] += statistic.count
+
+    sites = []
+    for statistic in snapshot.compare_to(__baseline, "lineno")[:limit]:
+        frame = statistic.traceback[0]
+        sites.append((
+            "{:s}:{:d}".format(__module_name(frame.filename), frame.lineno), statistic.size_diff, statistic.count_diff
+        ))
+
+    return {
+        "tracing": True,
+        "traced": traced,
+        "peak": peak,
+        "modules": tuple(sorted(
+            ((module,) + tuple(totals) for (module, totals) in modules.items()),
+            key=(lambda entry: entry[1]), reverse=True
+        )[:limit]),
+        "sites": tuple(sites),
+        "requests": dict(((request_type, tuple(entry)) for (request_type, entry) in __requests.items())),
+    }
+
+
+def log_report(limit=10):
+    '''
+        Logs the memory report (see report).
+    '''
+    memory_report = report(limit)
+    if not memory_report["tracing"]:
+        __log.warning("Memory diagnostics not started.")
+        return
+    lines = [
+        "Memory report: {:d} bytes traced, {:d} bytes peak.".format(memory_report["traced"], memory_report["peak"]),
+        "{:<48s} {:>12s} {:>10s} {:>12s} {:>10s}".format("module", "size diff", "blocks diff", "size", "blocks")
+    ]
+    lines.extend(("{:<48s} {:>12d} {:>10d} {:>12d} {:>10d}".format(*entry) for entry in memory_report["modules"]))
+    lines.append("{:<48s} {:>12s} {:>10s}".format("allocation site", "size diff", "blocks diff"))
+    lines.extend(("{:<48s} {:>12d} {:>10d}".format(*entry) for entry in memory_report["sites"]))
+    lines.append("{:<48s} {:>12s} {:>10s} {:>12s} {:>12s}".format(
+        "request", "requests", "blocks", "bytes", "peak bytes"
+    ))
+    lines.extend((
+        "{:<48s} {:>12d} {:>10d} {:>12d} {:>12d}".format(request_type, *entry)
+        for (request_type, entry) in sorted(memory_report["requests"].items(), key=(lambda item: -item[1][2]))
+    ))
+    __log.warning("\n".join(lines))
+
+
+def __module_name(filename):
+    '''
+        Returns the name of the module of filename: the name of the imported module loaded from it or, otherwise, its
+          dotted path relative to the longest sys.path entry containing it.
+    '''
+    name = __module_names.get(filename)
+    if name is None:
+        for (module_name, module) in tuple(sys.modules.items()):
+            module_file = getattr(module, "__file__", None)
+            if module_file and (module_name != "__main__"):
+                __module_names.setdefault(os.path.abspath(module_file), module_name)
+        name = __module_names.get(filename)
+    if name is None:
+        name = filename
+        for entry in sorted((os.path.abspath(entry) for entry in sys.path if entry), key=len, reverse=True):
+            if filename.startswith(entry + os.sep):
+                name = os.path.splitext(filename[len(entry) + 1:])[0].replace(os.sep, ".")
+                if name.endswith(".__init__"):
+                    name = name[:-len(".__init__")]
+                break
+        __module_names[filename] = name
+    return name
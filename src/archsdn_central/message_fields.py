@@ -0,0 +1,199 @@
+# coding=utf-8
+
+from abc import ABCMeta
+from uuid import UUID
+from ipaddress import IPv4Address, IPv6Address
+
+
+class Field:
+    '''
+        Declaration of a message field.
+        The encoding and decoding of the field value are expression templates, where {0} is replaced by the value.
+        The check is a predicate used to validate the value given to the message constructor, and message is the
+          assertion message, formatted with the value representation.
+        Optional fields default to None, which is sent as None.
+    '''
+    __slots__ = ("name", "encode", "decode", "check", "message", "optional", "namespace")
+
+    def __init__(self, name, encode="{0}", decode="{0}", check=None, message=None, optional=False, namespace=None):
+        assert isinstance(name, str) and name.isidentifier(), "name expected to be a valid identifier"
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.check = check
+        self.message = message if message else "{:s} is invalid: {{:s}}".format(name)
+        self.optional = optional
+        self.namespace = namespace if namespace else {}
+
+
+__address_namespace = {"UUID": UUID, "IPv4Address": IPv4Address, "IPv6Address": IPv6Address}
+
+
+def value_field(name, check=None, message=None, optional=False):
+    return Field(name, check=check, message=message, optional=optional)
+
+
+def uuid_field(name):
+    return Field(
+        name, "{0}.bytes", "UUID(bytes={0})",
+        check=lambda value: isinstance(value, UUID),
+        message="uuid is not a uuid.UUID object instance: {:s}",
+        namespace=__address_namespace
+    )
+
+
+def uuid_tuple_field(name):
+    return Field(
+        name, "tuple((value.bytes for value in {0}))", "tuple((UUID(bytes=value) for value in {0}))",
+        check=lambda value: isinstance(value, tuple) and all((isinstance(item, UUID) for item in value)),
+        message="{:s} is not a tuple of uuid.UUID object instances: {{:s}}".format(name),
+        namespace=__address_namespace
+    )
+
+
+def client_id_field(name, minimum=1):
+    return Field(
+        name, "{0}.to_bytes(4, 'big')", "int.from_bytes({0}, 'big')",
+        check=lambda value: isinstance(value, int) and minimum <= value < 0xFFFFFFFF,
+        message="{:s} value is invalid: {{:s}}".format(name)
+    )
+
+
+def ipv4_field(name, optional=False):
+    return Field(
+        name, "{0}.packed", "IPv4Address({0})",
+        check=lambda value: isinstance(value, IPv4Address),
+        message="{:s} is invalid: {{:s}}".format(name),
+        optional=optional, namespace=__address_namespace
+    )
+
+
+def ipv6_field(name, optional=False):
+    return Field(
+        name, "{0}.packed", "IPv6Address({0})",
+        check=lambda value: isinstance(value, IPv6Address),
+        message="{:s} is invalid: {{:s}}".format(name),
+        optional=optional, namespace=__address_namespace
+    )
+
+
+def ipv4_info_field(name):
+    return Field(
+        name, "({0}[0].packed, {0}[1])", "(IPv4Address({0}[0]), {0}[1])",
+        check=lambda value: isinstance(value, tuple) and isinstance(value[0], IPv4Address) and isinstance(value[1], int),
+        message="{:s} is invalid: {{:s}}".format(name),
+        optional=True, namespace=__address_namespace
+    )
+
+
+def ipv6_info_field(name):
+    return Field(
+        name, "({0}[0].packed, {0}[1])", "(IPv6Address({0}[0]), {0}[1])",
+        check=lambda value: isinstance(value, tuple) and isinstance(value[0], IPv6Address) and isinstance(value[1], int),
+        message="{:s} is invalid: {{:s}}".format(name),
+        optional=True, namespace=__address_namespace
+    )
+
+
+def ascii_field(name):
+    return Field(name, "{0}.encode('ascii')", "{0}.decode('ascii')")
+
+
+class MessageMeta(ABCMeta):
+    '''
+        Metaclass of the messages.
+        A class declaring _fields (a tuple of Field) gets the field names as __slots__, and the __init__, trusted,
+          from_state, __getstate__ and __setstate__ methods generated from the field declarations, unless the class
+          defines them.
+        The state of a message is False when it has no fields, the encoded value of its only field, or the tuple of the
+          encoded values of its fields.
+        A class can declare _checks, a tuple of (predicate, message) pairs, to validate the whole message after its
+          construction.
+        A class not declaring _fields nor __slots__ gets empty __slots__, so instances have no __dict__.
+    '''
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        fields = namespace.get("_fields")
+        if fields is not None:
+            namespace["__slots__"] = tuple((field.name for field in fields))
+        elif "__slots__" not in namespace:
+            namespace["__slots__"] = ()
+
+        cls = super().__new__(mcs, name, bases, namespace, **kwargs)
+        if fields is not None:
+            for (method_name, method) in _generate_methods(cls, fields, namespace.get("_checks", ())).items():
+                if method_name not in namespace:
+                    setattr(cls, method_name, method)
+            cls.__abstractmethods__ = frozenset((
+                name for name in cls.__abstractmethods__ if getattr(getattr(cls, name), "__isabstractmethod__", False)
+            ))
+        return cls
+
+
+def _generate_methods(cls, fields, checks):
+    namespace = {"_new": cls.__new__}
+    for field in fields:
+        namespace.update(field.namespace)
+        namespace["_check_{:s}".format(field.name)] = field.check
+        namespace["_message_{:s}".format(field.name)] = field.message
+    for (index, (predicate, message)) in enumerate(checks):
+        namespace["_predicate_{:d}".format(index)] = predicate
+        namespace["_predicate_message_{:d}".format(index)] = message
+
+    arguments = ", ".join(("{:s}=None".format(f.name) if f.optional else f.name for f in fields))
+    assignments = list(("self.{0:s} = {0:s}".format(f.name) for f in fields))
+
+    validations = []
+    for field in fields:
+        if field.check:
+            validations.append(
+                "assert {1:s}_check_{0:s}({0:s}), _message_{0:s}.format(repr({0:s}))".format(
+                    field.name, "{:s} is None or ".format(field.name) if field.optional else ""
+                )
+            )
+    predicates = list((
+        "assert _predicate_{0:d}(self), _predicate_message_{0:d}".format(index) for index in range(len(checks))
+    ))
+
+    def encoded(field):
+        expression = field.encode.format("self.{:s}".format(field.name))
+        if field.optional:
+            return "({:s} if self.{:s} is not None else None)".format(expression, field.name)
+        return expression
+
+    def decoded(field, value):
+        expression = field.decode.format(value)
+        if field.optional:
+            return "({:s} if {:s} is not None else None)".format(expression, value)
+        return expression
+
+    if len(fields) == 0:
+        state = "False"
+        decoding = []
+    elif len(fields) == 1:
+        state = encoded(fields[0])
+        decoding = ["self.{:s} = {:s}".format(fields[0].name, decoded(fields[0], "state"))]
+    else:
+        state = "({:s},)".format(", ".join((encoded(f) for f in fields)))
+        decoding = ["({:s},) = state".format(", ".join(("_{:d}".format(i) for i in range(len(fields)))))]
+        decoding.extend((
+            "self.{:s} = {:s}".format(f.name, decoded(f, "_{:d}".format(i))) for (i, f) in enumerate(fields)
+        ))
+
+    sources = {
+        "__init__":
+            ["def __init__(self, {:s}):".format(arguments)] + (validations + assignments + predicates or ["pass"]),
+        "trusted": ["def trusted(cls, {:s}):".format(arguments), "self = _new(cls)"] + assignments + ["return self"],
+        "from_state": ["def from_state(cls, state):", "self = _new(cls)"] + decoding + ["return self"],
+        "__getstate__": ["def __getstate__(self):", "return {:s}".format(state)],
+        "__setstate__": ["def __setstate__(self, state):"] + (decoding if decoding else ["pass"]),
+    }
+
+    methods = {}
+    for (method_name, lines) in sources.items():
+        source = "\n    ".join(lines).replace("(self, )", "(self)").replace("(cls, )", "(cls)")
+        exec(compile(source, "<{:s}.{:s}>".format(cls.__name__, method_name), "exec"), namespace)
+        methods[method_name] = namespace.pop(method_name)
+
+    methods["trusted"] = classmethod(methods["trusted"])
+    methods["from_state"] = classmethod(methods["from_state"])
+    return methods
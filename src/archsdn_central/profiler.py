@@ -0,0 +1,175 @@
+# coding=utf-8
+
+# Statistical profiler, started and stopped at runtime.
+# While running, a sampler thread takes the stacks of every other thread of the process (the main loop thread, the
+#   database thread, ...) each interval seconds, with sys._current_frames, and counts them. The sampled threads are
+#   never paused or traced, so requests keep being processed.
+# When stopped, the samples are written to the profiles directory:
+#   - <name>.collapsed: one "thread;frame;frame... samples" line per distinct stack, the input of flamegraph.pl and
+#     speedscope;
+#   - <name>.handlers: the samples attributed to each labeled function (the request handlers and the database
+#     operations), which is the innermost labeled function of each stack.
+import sys
+import time
+import logging
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from archsdn_central.helpers import logger_module_name
+
+__log = logging.getLogger(logger_module_name(__file__))
+
+__profile_prefix = "archsdn-central-profile-"
+
+__labels = {}
+__directory = None
+__sampler = None
+__stop_event = None
+__stacks = Counter()
+__handlers = Counter()
+__counters_lock = threading.Lock()
+__samples = 0
+__started = None
+
+
+def label_functions(functions):
+    '''
+        Labels functions (a function -> label dict) for the handlers breakdown. A sample is attributed to the label of
+          the innermost labeled function in its stack.
+    '''
+    for (function, label) in functions.items():
+        code = getattr(function, "__code__", None)
+        if code is not None:
+            __labels[code] = label
+
+
+def configure(directory):
+    '''
+        Configures the directory where the profiles are written (by default, the temporary directory).
+    '''
+    global __directory
+    assert directory is None or (isinstance(directory, Path) and directory.is_dir()), \
+        "directory expected to be an existing directory"
+    __directory = directory
+
+
+def start(interval=0.005):
+    '''
+        Starts sampling every interval seconds. Does nothing if the profiler is already running.
+    '''
+    global __sampler, __stop_event, __samples, __started
+    assert interval > 0, "interval expected to be positive"
+    if __sampler is not None:
+        return
+    __stacks.clear()
+    __handlers.clear()
+    __samples = 0
+    __started = time.monotonic()
+    __stop_event = threading.Event()
+    __sampler = threading.Thread(target=__sampler_main, args=(interval, __stop_event), name="profiler", daemon=True)
+    __sampler.start()
+    __log.warning("Profiler started, sampling every {:.1f} ms.".format(interval * 1000))
+
+
+def stop():
+    '''
+        Stops sampling, and writes the profile to the profiles directory.
+        Returns the profile status (see status), with the location of the collapsed stacks file. Does nothing but
+          returning the status if the profiler is not running.
+    '''
+    global __sampler
+    if __sampler is None:
+        return status()
+    __stop_event.set()
+    __sampler.join()
+    __sampler = None
+
+    name = "{:s}{:s}".format(__profile_prefix, datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ"))
+    directory = Path(__directory if __directory is not None else tempfile.gettempdir())
+    location = directory / "{:s}.collapsed".format(name)
+    with open(str(location), "w") as fp:
+        for (stack, samples) in sorted(__stacks.items(), key=(lambda item: item[1]), reverse=True):
+            fp.write("{:s} {:d}\n".format(";".join(stack), samples))
+    with open(str(directory / "{:s}.handlers".format(name)), "w") as fp:
+        fp.write("{:<48s} {:>10s} {:>8s}\n".format("label", "samples", "%"))
+        for (label, samples) in __handlers.most_common():
+            fp.write("{:<48s} {:>10d} {:>8.2f}\n".format(label, samples, samples * 100 / max(__samples, 1)))
+
+    __log.warning("Profiler stopped after {:.1f} seconds and {:d} samples. Profile written to {:s}.".format(
+        time.monotonic() - __started, __samples, str(location)
+    ))
+    return dict(status(), location=str(location))
+
+
+def toggle():
+    '''
+        Starts the profiler if it is not running, or stops it otherwise.
+    '''
+    if __sampler is None:
+        start()
+    else:
+        stop()
+
+
+def status():
+    '''
+        Returns the profile status: whether the profiler is running, the number of samples of the last (or current)
+          profile, and its samples per label (the threads' unlabeled samples are labeled "<thread>:(other)").
+    '''
+    with __counters_lock:
+        return {
+            "running": __sampler is not None,
+            "samples": __samples,
+            "handlers": dict(__handlers),
+            "location": None,
+        }
+
+
+def __frame_name(code):
+    # Frames are named <module>:<function>. Package modules are named after their package.
+    path = Path(code.co_filename)
+    module = path.parent.name if path.stem == "__init__" else path.stem
+    return "{:s}:{:s}".format(module, code.co_name)
+
+
+def __sampler_main(interval, stop_event):
+    global __samples
+    own_id = threading.get_ident()
+    names = {}
+    frame_names = {}
+    while not stop_event.wait(interval):
+        frames = sys._current_frames()
+        if not names.keys() >= frames.keys():
+            names = dict(((thread.ident, thread.name) for thread in threading.enumerate()))
+
+        samples = []
+        for (thread_id, frame) in frames.items():
+            if thread_id == own_id:
+                continue
+            thread_name = names.get(thread_id, str(thread_id))
+            codes = []
+            label = None
+            while frame is not None:
+                code = frame.f_code
+                codes.append(code)
+                if label is None:
+                    label = __labels.get(code)
+                frame = frame.f_back
+
+            stack = [thread_name]
+            for code in reversed(codes):
+                frame_name = frame_names.get(code)
+                if frame_name is None:
+                    frame_name = frame_names[code] = __frame_name(code)
+                stack.append(frame_name)
+            samples.append((tuple(stack), label if label is not None else "{:s}:(other)".format(thread_name)))
+        del frames
+
+        with __counters_lock:
+            for (stack, label) in samples:
+                __stacks[stack] += 1
+                __handlers[label] += 1
+            __samples += 1
@@ -1,7 +1,7 @@
 # coding=utf-8
 
 import logging
-from abc import ABC, abstractmethod
+from abc import abstractmethod
 from uuid import UUID
 from netaddr import EUI
 from ipaddress import IPv4Address, IPv6Address, ip_network
@@ -10,19 +10,18 @@ import sys
 import pickle
 
 from archsdn_central.helpers import logger_module_name
+from archsdn_central.message_fields import MessageMeta, \
+    value_field, uuid_field, uuid_tuple_field, client_id_field, ipv4_field, ipv6_field, ipv4_info_field, ipv6_info_field, ascii_field
 
 __log = logging.getLogger(logger_module_name(__file__))
 
 __loading_dict = {}
+__registered_classes = []
 
 
 def __register_msg(cls):
-    def load_obj(state):
-        obj = cls.__new__(cls)
-        if state:
-            obj.__setstate__(state)
-        return obj
-    __loading_dict[cls.__name__] = load_obj
+    __loading_dict[cls.__name__] = cls.from_state
+    __registered_classes.append(cls)
 
 
 def dumps(obj):
@@ -36,17 +35,72 @@ def loads(obj_bytes):
     assert obj_name in __loading_dict, "class {:s} not registered".format(obj_name)
     return __loading_dict[obj_name](obj_state)
 
+
+# Optional envelope header frame, sent before the request frame. It is a dict, with the time the sender waits for the
+#   reply (timeout_ms) and the idempotency key of the request (request_id, unique per peer, and peer, which identifies
+#   the sender across reconnections).
+__header_prefix = b"ARCHSDN-HEADER"
+
+
+def dumps_header(header):
+    return __header_prefix + pickle.dumps(header)
+
+
+def split_envelope(frames):
+    '''
+        Splits the frames of a received request into its routing envelope (the frames which are returned with the
+          reply), its header (a dict, empty if the request has no header frame) and its request frame.
+    '''
+    if (len(frames) > 2) and frames[-2].startswith(__header_prefix):
+        header = pickle.loads(frames[-2][len(__header_prefix):])
+        assert isinstance(header, dict), "header is not a dict"
+        return (frames[:-2], header, frames[-1])
+    return (frames[:-1], {}, frames[-1])
+
+
+def registered_messages():
+    '''
+        Returns the registered message classes.
+    '''
+    return tuple(__registered_classes)
+
+
+def stateless_messages():
+    '''
+        Returns the registered message classes which have no state.
+    '''
+    return tuple((
+        cls for cls in __registered_classes if issubclass(cls, (REQWithoutState, RPLWithoutState, RPLErrorNoState))
+    ))
+
 ########################
 ## Abstract Messages ###
 ########################
 
 
-class BaseMessage(ABC):
+class BaseMessage(metaclass=MessageMeta):
     '''
         Abstract Base Message for all message types
+        Messages declare their fields in _fields, from which their methods are generated (see MessageMeta).
     '''
     _version = 1
 
+    @classmethod
+    def trusted(cls, *args, **kwargs):
+        '''
+            Creates a message from values known to be valid, skipping their validation.
+        '''
+        return cls(*args, **kwargs)
+
+    @classmethod
+    def from_state(cls, state):
+        '''
+            Creates a message from its serialized state.
+        '''
+        obj = cls.__new__(cls)
+        obj.__setstate__(state)
+        return obj
+
     @abstractmethod
     def __getstate__(self):
         pass
@@ -65,7 +119,10 @@ class BaseMessage(ABC):
     def __str__(self):
         return "{:s}: {:s}".format(
             str(self.__class__),
-            "; ".join(list(("{}: {}".format(key, self.__dict__[key]) for key in self.__dict__)))
+            "; ".join(list((
+                "{}: {}".format(key, getattr(self, key))
+                for cls in reversed(type(self).__mro__) for key in cls.__dict__.get("__slots__", ())
+            )))
         )
 
 
@@ -97,13 +154,8 @@ class ReplyMessage(BaseMessage):
 class REQWithoutState(RequestMessage):
     '''
         Base Message for messages which have no internal state.
-        It implements the __getstate__ and __setstate__ for no state serialization.
     '''
-    def __getstate__(self):
-        return False
-
-    def __setstate__(self, s):
-        pass
+    _fields = ()
 
 
 class REQLocalTime(REQWithoutState):
@@ -121,6 +173,41 @@ class REQCentralNetworkPolicies(REQWithoutState):
     pass
 
 
+class REQSnapshot(REQWithoutState):
+    '''
+        Message used to request a snapshot of the central manager database, written to the snapshots directory.
+    '''
+    pass
+
+
+class REQMetrics(REQWithoutState):
+    '''
+        Message used to request the central manager metrics.
+    '''
+    pass
+
+
+class REQProfiler(RequestMessage):
+    '''
+        Message used to start (enable) or stop the central manager sampling profiler.
+        Attributes:
+            - Enable - (bool) True to start the profiler, False to stop it and write the profile
+    '''
+    _fields = (value_field("enable", lambda value: isinstance(value, bool), "enable is not a bool: {:s}"),)
+
+
+class REQMemoryDiagnostics(RequestMessage):
+    '''
+        Message used to control the central manager memory diagnostics, and to request their report.
+        Attributes:
+            - Action - (str) "start" to start tracing the memory allocations (taking the baseline snapshot), "report" to
+                request the report, or "stop" to stop tracing them
+    '''
+    _fields = (
+        value_field("action", lambda value: value in ("start", "report", "stop"), "action is invalid: {:s}"),
+    )
+
+
 class REQRegisterController(RequestMessage):
     '''
         Message used to register controllers at the central manager.
@@ -133,37 +220,13 @@ class REQRegisterController(RequestMessage):
               - IPv6 (ipaddress.IPv6Address)
               - Port (int) [0;0xFFFF]
     '''
-
-    def __init__(self, controller_id, ipv4_info=None, ipv6_info=None):
-        assert isinstance(controller_id, UUID), "uuid is not a uuid.UUID object instance"
-        assert not ((ipv4_info is None) and (ipv6_info is None)), \
+    _fields = (uuid_field("controller_id"), ipv4_info_field("ipv4_info"), ipv6_info_field("ipv6_info"))
+    _checks = (
+        (
+            lambda msg: not ((msg.ipv4_info is None) and (msg.ipv6_info is None)),
             "ipv4_info and ipv6_info cannot be null at the same time"
-        assert (
-                   isinstance(ipv4_info, tuple) and
-                   isinstance(ipv4_info[0], IPv4Address) and
-                   isinstance(ipv4_info[1], int)
-               ) or ipv4_info is None, "ipv4_info is invalid: {:s}".format(str(ipv4_info))
-        assert (
-                    isinstance(ipv6_info, tuple) and
-                    isinstance(ipv6_info[0], IPv6Address) and
-                    isinstance(ipv6_info[1], int)
-               ) or ipv6_info is None, "ipv6_info is invalid: {:s}".format(str(ipv6_info))
-
-        self.controller_id = controller_id
-        self.ipv4_info = ipv4_info
-        self.ipv6_info = ipv6_info
-
-    def __getstate__(self):
-        return (
-            self.controller_id.bytes,
-            (self.ipv4_info[0].packed, self.ipv4_info[1]) if self.ipv4_info != None else None,
-            (self.ipv6_info[0].packed, self.ipv6_info[1]) if self.ipv6_info != None else None
-        )
-
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state[0])
-        self.ipv4_info = (IPv4Address(state[1][0]), state[1][1]) if state[1] != None else None
-        self.ipv6_info = (IPv6Address(state[2][0]), state[2][1]) if state[2] != None else None
+        ),
+    )
 
 
 class REQQueryControllerInfo(RequestMessage):
@@ -172,16 +235,7 @@ class REQQueryControllerInfo(RequestMessage):
         Attributes:
             - Controller ID - (uuid.UUID)
     '''
-    def __init__(self, controller_id):
-        assert isinstance(controller_id, UUID), "uuid is not a uuid.UUID object instance"
-
-        self.controller_id = controller_id
-
-    def __getstate__(self):
-        return self.controller_id.bytes
-
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state)
+    _fields = (uuid_field("controller_id"),)
 
 
 class REQUnregisterController(RequestMessage):
@@ -190,17 +244,7 @@ class REQUnregisterController(RequestMessage):
         Attributes:
             - Controller ID - (uuid.UUID)
     '''
-
-    def __init__(self, controller_id):
-        assert isinstance(controller_id, UUID), "uuid is not a uuid.UUID object instance"
-
-        self.controller_id = controller_id
-
-    def __getstate__(self):
-        return self.controller_id.bytes
-
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state)
+    _fields = (uuid_field("controller_id"),)
 
 
 class REQIsControllerRegistered(RequestMessage):
@@ -209,17 +253,18 @@ class REQIsControllerRegistered(RequestMessage):
         Attributes:
             - Controller ID - (uuid.UUID)
     '''
+    _fields = (uuid_field("controller_id"),)
 
-    def __init__(self, controller_id):
-        assert isinstance(controller_id, UUID), "uuid is not a uuid.UUID object instance"
-
-        self.controller_id = controller_id
-
-    def __getstate__(self):
-        return self.controller_id.bytes
 
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state)
+class REQHeartbeat(RequestMessage):
+    '''
+        Message sent periodically by a Controller to signal it is alive. It is handled in memory, without touching the
+          database. Once a Controller sends heartbeats, it is reaped (its clients released and its registration
+          removed) if it stops sending them for longer than the central manager heartbeat timeout.
+        Attributes:
+            - Controller ID - (uuid.UUID)
+    '''
+    _fields = (uuid_field("controller_id"),)
 
 
 class REQUpdateControllerInfo(RequestMessage):
@@ -234,29 +279,7 @@ class REQUpdateControllerInfo(RequestMessage):
               - IPv6 (ipaddress.IPv6Address)
               - Port (int) [0;0xFFFF]
     '''
-
-    def __init__(self, controller_id, ipv4_info=None, ipv6_info=None):
-        assert isinstance(controller_id, UUID), "uuid is not a uuid.UUID object instance"
-        #        assert not ((ipv4_info is None) and (
-        #                    ipv6_info is None)), "ipv4_info and ipv6_info cannot be null at the same time"
-        #        assert ipv4_info(ipv4_info) or ipv4_info is None, "ipv4_info is invalid"
-        #        assert ipv6_info(ipv6_info) or ipv6_info is None, "ipv6_info is invalid"
-
-        self.controller_id = controller_id
-        self.ipv4_info = ipv4_info
-        self.ipv6_info = ipv6_info
-
-    def __getstate__(self):
-        return (
-            self.controller_id.bytes,
-            (self.ipv4_info[0].packed, self.ipv4_info[1]) if self.ipv4_info != None else None,
-            (self.ipv6_info[0].packed, self.ipv6_info[1]) if self.ipv6_info != None else None
-        )
-
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state[0])
-        self.ipv4_info = (IPv4Address(state[1][0]), state[1][1]) if state[1] != None else None
-        self.ipv6_info = (IPv6Address(state[2][0]), state[2][1]) if state[2] != None else None
+    _fields = (uuid_field("controller_id"), ipv4_info_field("ipv4_info"), ipv6_info_field("ipv6_info"))
 
 
 class REQRegisterControllerClient(RequestMessage):
@@ -266,23 +289,26 @@ class REQRegisterControllerClient(RequestMessage):
             - Controller ID - (uuid.UUID)
             - Client ID - (int) [0;0xFFFFFFFF]
     '''
-    def __init__(self, controller_id, client_id):
-        assert isinstance(controller_id, UUID), \
-            "uuid is not a uuid.UUID object instance: {:s}".format(repr(controller_id))
-        assert isinstance(client_id, int), "client_id is not a int object instance: {:s}".format(repr(client_id))
-        assert 0 < client_id < 0xFFFFFFFF, "client_id value is invalid: value {:d}".format(client_id)
-        self.controller_id = controller_id
-        self.client_id = client_id
+    _fields = (uuid_field("controller_id"), client_id_field("client_id"))
 
-    def __getstate__(self):
-        return (
-            self.controller_id.bytes,
-            self.client_id.to_bytes(4, 'big')
-        )
 
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state[0])
-        self.client_id = int.from_bytes(state[1], 'big')
+class REQRegisterControllerClients(RequestMessage):
+    '''
+        Message used to Register several network Clients at once, e.g. when a site comes online. Either all the
+          Clients are registered, or none is.
+        Attributes:
+            - Controller ID - (uuid.UUID)
+            - Client IDs - (tuple of int) [1;0xFFFFFFFF[, without repeated ids
+    '''
+    _fields = (
+        uuid_field("controller_id"),
+        value_field(
+            "client_ids",
+            lambda value: isinstance(value, tuple) and len(set(value)) == len(value) and
+            all((isinstance(client_id, int) and 0 < client_id < 0xFFFFFFFF for client_id in value)),
+            "client_ids is invalid: {:s}"
+        ),
+    )
 
 
 class REQRemoveControllerClient(RequestMessage):
@@ -292,23 +318,7 @@ class REQRemoveControllerClient(RequestMessage):
             - Controller ID - (uuid.UUID)
             - Client ID - (int) [0;0xFFFFFFFF]
     '''
-    def __init__(self, controller_id, client_id):
-        assert isinstance(controller_id, UUID), \
-            "uuid is not a uuid.UUID object instance: {:s}".format(repr(controller_id))
-        assert isinstance(client_id, int), "client_id is not a int object instance: {:s}".format(repr(client_id))
-        assert 0 < client_id < 0xFFFFFFFF, "client_id value is invalid: value {:d}".format(client_id)
-        self.controller_id = controller_id
-        self.client_id = client_id
-
-    def __getstate__(self):
-        return (
-            self.controller_id.bytes,
-            self.client_id.to_bytes(4, 'big')
-        )
-
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state[0])
-        self.client_id = int.from_bytes(state[1], 'big')
+    _fields = (uuid_field("controller_id"), client_id_field("client_id"))
 
 
 class REQIsClientAssociated(RequestMessage):
@@ -318,23 +328,7 @@ class REQIsClientAssociated(RequestMessage):
             - Controller ID - (uuid.UUID)
             - Client ID - (int) [0;0xFFFFFFFF]
     '''
-    def __init__(self, controller_id, client_id):
-        assert isinstance(controller_id, UUID), \
-            "uuid is not a uuid.UUID object instance: {:s}".format(repr(controller_id))
-        assert isinstance(client_id, int), "client_id is not a int object instance: {:s}".format(repr(client_id))
-        assert 0 < client_id < 0xFFFFFFFF, "client_id value is invalid: value {:d}".format(client_id)
-        self.controller_id = controller_id
-        self.client_id = client_id
-
-    def __getstate__(self):
-        return (
-            self.controller_id.bytes,
-            self.client_id.to_bytes(4, 'big')
-        )
-
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state[0])
-        self.client_id = int.from_bytes(state[1], 'big')
+    _fields = (uuid_field("controller_id"), client_id_field("client_id"))
 
 
 class REQClientInformation(RequestMessage):
@@ -344,23 +338,7 @@ class REQClientInformation(RequestMessage):
             - Controller ID - (uuid.UUID)
             - Client ID - (int) [0;0xFFFFFFFF]
     '''
-    def __init__(self, controller_id, client_id):
-        assert isinstance(controller_id, UUID), \
-            "uuid is not a uuid.UUID object instance: {:s}".format(repr(controller_id))
-        assert isinstance(client_id, int), "client_id is not a int object instance: {:s}".format(repr(client_id))
-        assert 0 < client_id < 0xFFFFFFFF, "client_id value is invalid: value {:d}".format(client_id)
-        self.controller_id = controller_id
-        self.client_id = client_id
-
-    def __getstate__(self):
-        return (
-            self.controller_id.bytes,
-            self.client_id.to_bytes(4, 'big')
-        )
-
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state[0])
-        self.client_id = int.from_bytes(state[1], 'big')
+    _fields = (uuid_field("controller_id"), client_id_field("client_id"))
 
 
 class REQUnregisterAllClients(RequestMessage):
@@ -369,17 +347,7 @@ class REQUnregisterAllClients(RequestMessage):
         Attributes:
             - Controller ID - (uuid.UUID)
     '''
-
-    def __init__(self, controller_id):
-        assert isinstance(controller_id, UUID), "uuid is not a uuid.UUID object instance"
-
-        self.controller_id = controller_id
-
-    def __getstate__(self):
-        return self.controller_id.bytes
-
-    def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state)
+    _fields = (uuid_field("controller_id"),)
 
 
 class REQAddressInfo(RequestMessage):
@@ -390,39 +358,107 @@ class REQAddressInfo(RequestMessage):
               - IPv6 (ipaddress.IPv6Address) - Optional
 
     '''
+    _fields = (ipv4_field("ipv4", optional=True), ipv6_field("ipv6", optional=True))
+    _checks = (
+        (lambda msg: not ((msg.ipv4 is None) and (msg.ipv6 is None)), "ipv4 and ipv6 cannot be null at the same time"),
+    )
 
-    def __init__(self, ipv4=None, ipv6=None):
-        assert not ((ipv4 is None) and (ipv6 is None)), "ipv4 and ipv6 cannot be null at the same time"
-        assert isinstance(ipv4, IPv4Address) or ipv4 is None, "ipv4 is invalid"
-        assert isinstance(ipv6, IPv6Address) or ipv6 is None, "ipv6 is invalid"
 
-        self.ipv4 = ipv4
-        self.ipv6 = ipv6
+class REQListControllers(RequestMessage):
+    '''
+        Message used to request a page of the registered controllers.
+        Attributes:
+            - Cursor - (int) The cursor returned with the previous page, or 0 for the first page.
+            - Limit - (int) Maximum number of controllers in the page. The central manager can reply with fewer.
+    '''
+    _fields = (
+        value_field("cursor", lambda value: isinstance(value, int) and value >= 0, "cursor is invalid: {:s}"),
+        value_field("limit", lambda value: isinstance(value, int) and value > 0, "limit is invalid: {:s}"),
+    )
 
-    def __getstate__(self):
-        return (
-            self.ipv4.packed if self.ipv4 else None,
-            self.ipv6.packed if self.ipv6 else None,
-        )
 
-    def __setstate__(self, state):
-        self.ipv4 = IPv4Address(state[0]) if state[0] else None
-        self.ipv6 = IPv6Address(state[1]) if state[1] else None
+class REQListClients(RequestMessage):
+    '''
+        Message used to request a page of the clients registered by a Controller.
+        Attributes:
+            - Controller ID - (uuid.UUID)
+            - Cursor - (int) The cursor returned with the previous page, or 0 for the first page.
+            - Limit - (int) Maximum number of clients in the page. The central manager can reply with fewer.
+    '''
+    _fields = (
+        uuid_field("controller_id"),
+        value_field("cursor", lambda value: isinstance(value, int) and value >= 0, "cursor is invalid: {:s}"),
+        value_field("limit", lambda value: isinstance(value, int) and value > 0, "limit is invalid: {:s}"),
+    )
+
+
+class REQRegisterLink(RequestMessage):
+    '''
+        Message used by a Controller to register (or update) the link between its sector and the sector of another
+          registered Controller. Links are undirected.
+        Attributes:
+            - Controller ID - (uuid.UUID)
+            - Peer ID - (uuid.UUID) The Controller of the other sector
+            - Capacity - (int) Capacity of the link, in Mbps
+            - Latency - (int or float) Latency of the link, in milliseconds
+    '''
+    _fields = (
+        uuid_field("controller_id"),
+        uuid_field("peer_id"),
+        value_field("capacity", lambda value: isinstance(value, int) and not isinstance(value, bool) and value > 0,
+                    "capacity is invalid: {:s}"),
+        value_field("latency", lambda value: isinstance(value, (int, float)) and not isinstance(value, bool) and
+                    value >= 0, "latency is invalid: {:s}"),
+    )
+    _checks = (
+        (lambda msg: msg.controller_id != msg.peer_id, "a link cannot connect a controller to itself"),
+    )
+
+
+class REQRemoveLink(RequestMessage):
+    '''
+        Message used to remove the link between the sectors of two Controllers.
+        Attributes:
+            - Controller ID - (uuid.UUID)
+            - Peer ID - (uuid.UUID) The Controller of the other sector
+    '''
+    _fields = (uuid_field("controller_id"), uuid_field("peer_id"))
+
+
+class REQPathQuery(RequestMessage):
+    '''
+        Message used to query the lowest latency path from the sector of a Controller to the sector of another.
+        Attributes:
+            - Controller ID - (uuid.UUID) The Controller of the source sector
+            - Destination ID - (uuid.UUID) The Controller of the destination sector
+    '''
+    _fields = (uuid_field("controller_id"), uuid_field("destination_id"))
 
 
 __register_msg(REQLocalTime)
 __register_msg(REQCentralNetworkPolicies)
+__register_msg(REQSnapshot)
 __register_msg(REQRegisterController)
 __register_msg(REQQueryControllerInfo)
 __register_msg(REQUnregisterController)
 __register_msg(REQIsControllerRegistered)
+__register_msg(REQHeartbeat)
 __register_msg(REQUpdateControllerInfo)
 __register_msg(REQRegisterControllerClient)
+__register_msg(REQRegisterControllerClients)
 __register_msg(REQRemoveControllerClient)
 __register_msg(REQIsClientAssociated)
 __register_msg(REQClientInformation)
 __register_msg(REQUnregisterAllClients)
 __register_msg(REQAddressInfo)
+__register_msg(REQListControllers)
+__register_msg(REQListClients)
+__register_msg(REQMetrics)
+__register_msg(REQProfiler)
+__register_msg(REQMemoryDiagnostics)
+__register_msg(REQRegisterLink)
+__register_msg(REQRemoveLink)
+__register_msg(REQPathQuery)
 
 
 ########################
@@ -433,11 +469,7 @@ class RPLWithoutState(ReplyMessage):
     '''
         Base Message for Replies with no state
     '''
-    def __getstate__(self):
-        return False
-
-    def __setstate__(self, s):
-        pass
+    _fields = ()
 
 
 class RPLSuccess(RPLWithoutState):
@@ -465,20 +497,20 @@ class RPLLocalTime(ReplyMessage):
     '''
         Message used to reply the local time.
     '''
-    def __init__(self):
-        self.__time = time.time()
-
-    def __getstate__(self):
-        return self.__time
+    _fields = (value_field("time"),)
 
-    def __setstate__(self, state):
-        self.__time = state
+    def __init__(self):
+        self.time = time.time()
 
 
 class RPLCentralNetworkPolicies(ReplyMessage):
     '''
         Message used to reply the network policies configurations
     '''
+    __slots__ = (
+        "ipv4_network", "ipv6_network", "ipv4_service", "ipv6_service", "mac_service", "registration_date",
+        "service_reservation_policies"
+    )
 
     def __init__(
             self,
@@ -519,6 +551,8 @@ class RPLControllerInformation(ReplyMessage):
         Message used by central manager to reply with the controller information
     '''
 
+    __slots__ = ("ipv4", "ipv4_port", "ipv6", "ipv6_port", "name", "registration_date")
+
     def __init__(self, ipv4, ipv4_port, ipv6, ipv6_port, name, registration_date):
         assert isinstance(ipv4, (IPv4Address, type(None))), "ipv4 expected to be IPv4Address or None"
         assert isinstance(ipv6, (IPv6Address, type(None))), "ipv6 expected to be IPv6Address or None"
@@ -556,57 +590,159 @@ class RPLClientInformation(ReplyMessage):
         Message used by central manager to reply with the controller information
     '''
 
-    def __init__(self, ipv4, ipv6, name, registration_date):
-        self.ipv4 = ipv4
-        self.ipv6 = ipv6
-        self.name = name
-        self.registration_date = registration_date
+    _fields = (ipv4_field("ipv4"), ipv6_field("ipv6"), ascii_field("name"), value_field("registration_date"))
+
+
+class RPLAddressInfo(ReplyMessage):
+    '''
+        Message used by the central manager to reply with the information about the queried network address
+    '''
+
+    _fields = (
+        uuid_field("controller_id"), client_id_field("client_id", minimum=0), ascii_field("name"),
+        value_field("registration_date")
+    )
+
+
+class RPLSnapshot(ReplyMessage):
+    '''
+        Message used by the central manager to reply with the name and size (bytes) of the snapshot written
+    '''
+    _fields = (value_field("name"), value_field("size"))
+
+
+class RPLMetrics(ReplyMessage):
+    '''
+        Message used by the central manager to reply with its metrics.
+        Attributes:
+            - Metrics - (dict) The metrics by group:
+                - loops - the lag histogram of every monitored event loop, by name (see loop_monitor.histograms)
+                - queues - the requests fair queue metrics (see zmq_requests.queues_metrics)
+                - database - the metrics of the database operations lanes (see database.lanes.LaneScheduler.metrics)
+                - deadlines - the number of requests of each type expired, by stage (see deadlines.metrics)
+                - deduplication - the metrics of the reply de-duplication cache (see dedup_cache)
+                - liveness - the number of controllers tracked by their heartbeats, and reaped (see liveness)
+                - dns - the number of DNS queries answered, and of names indexed (see dns_responder)
+                - topology - the number of sectors and links, and the metrics of the paths cache (see
+                    database.internals.topology.metrics)
+    '''
+    _fields = (value_field("metrics", lambda value: isinstance(value, dict), "metrics is not a dict: {:s}"),)
+
+
+class RPLProfile(ReplyMessage):
+    '''
+        Message used by the central manager to reply with the sampling profiler status.
+        Attributes:
+            - Running - (bool) True if the profiler is running
+            - Samples - (int) The number of samples of the last (or current) profile
+            - Handlers - (dict) The number of samples attributed to each request handler and database operation
+            - Location - (str) The location of the collapsed stacks file, when the profiler is stopped, or None
+    '''
+    _fields = (value_field("running"), value_field("samples"), value_field("handlers"), value_field("location"))
+
+
+class RPLMemoryReport(ReplyMessage):
+    '''
+        Message used by the central manager to reply with its memory report (see memory_diagnostics.report).
+        Attributes:
+            - Tracing - (bool) True if the memory allocations are traced. The remaining attributes are empty otherwise.
+            - Traced, Peak - (int) The memory traced, and its peak, in bytes
+            - Modules - tuple of (module, size difference, blocks difference, size, blocks) tuples, for the modules
+                whose allocations grew the most since the baseline snapshot
+            - Sites - tuple of ("file:line", size difference, blocks difference) tuples, for the allocation sites
+                which grew the most since the baseline snapshot
+            - Requests - (dict) The (requests, retained blocks, retained bytes, peak bytes) of each request type
+    '''
+    _fields = (
+        value_field("tracing"), value_field("traced"), value_field("peak"), value_field("modules"),
+        value_field("sites"), value_field("requests")
+    )
+
+
+class RPLPath(ReplyMessage):
+    '''
+        Message used by the central manager to reply with the lowest latency path between two sectors.
+        Attributes:
+            - Path - tuple of the Controller IDs (uuid.UUID) of the sectors crossed, from the source to the destination
+            - Latency - (int or float) Latency of the path, in milliseconds
+            - Capacity - (int) Capacity of the narrowest link of the path, in Mbps, or None for the path from a sector
+                to itself
+    '''
+    _fields = (uuid_tuple_field("path"), value_field("latency"), value_field("capacity", optional=True))
+
+
+class RPLControllersPage(ReplyMessage):
+    '''
+        Message used by the central manager to reply with a page of the registered controllers.
+        Attributes:
+            - Controllers - tuple of (controller_id, ipv4_info, ipv6_info, name, registration_date) tuples
+            - Cursor - (int) The cursor of the next page, or None if this is the last page.
+    '''
+    __slots__ = ("controllers", "cursor")
+
+    def __init__(self, controllers, cursor):
+        assert isinstance(controllers, tuple), "controllers expected to be a tuple"
+        assert isinstance(cursor, (int, type(None))), "cursor expected to be int or None"
+        self.controllers = controllers
+        self.cursor = cursor
 
     def __getstate__(self):
         return (
-            self.ipv4.packed,
-            self.ipv6.packed,
-            self.name.encode('ascii'),
-            self.registration_date
+            tuple((
+                (
+                    controller_id.bytes,
+                    (ipv4_info[0].packed, ipv4_info[1]) if ipv4_info else None,
+                    (ipv6_info[0].packed, ipv6_info[1]) if ipv6_info else None,
+                    name.encode('ascii'),
+                    registration_date
+                ) for (controller_id, ipv4_info, ipv6_info, name, registration_date) in self.controllers
+            )),
+            self.cursor
         )
 
     def __setstate__(self, state):
-        self.ipv4 = IPv4Address(state[0])
-        self.ipv6 = IPv6Address(state[1])
-        self.name = state[2].decode('ascii')
-        self.registration_date = state[3]
+        self.controllers = tuple((
+            (
+                UUID(bytes=controller_id),
+                (IPv4Address(ipv4_info[0]), ipv4_info[1]) if ipv4_info else None,
+                (IPv6Address(ipv6_info[0]), ipv6_info[1]) if ipv6_info else None,
+                name.decode('ascii'),
+                registration_date
+            ) for (controller_id, ipv4_info, ipv6_info, name, registration_date) in state[0]
+        ))
+        self.cursor = state[1]
 
 
-class RPLAddressInfo(ReplyMessage):
+class RPLClientsPage(ReplyMessage):
     '''
-        Message used by the central manager to reply with the information about the queried network address
+        Message used by the central manager to reply with a page of the clients registered by a controller.
+        Attributes:
+            - Clients - tuple of (client_id, ipv4, ipv6, name, registration_date) tuples
+            - Cursor - (int) The cursor of the next page, or None if this is the last page.
     '''
+    __slots__ = ("clients", "cursor")
 
-    def __init__(self, controller_id, client_id, name, registration_date):
-        assert isinstance(controller_id, UUID), \
-            "uuid is not a uuid.UUID object instance: {:s}".format(repr(controller_id))
-        assert isinstance(client_id, int), "client_id is not a int object instance: {:s}".format(repr(client_id))
-        assert 0 <= client_id < 0xFFFFFFFF, "client_id value is invalid: value {:d}".format(client_id)
-
-        self.controller_id = controller_id
-        self.client_id = client_id
-        self.name = name
-        self.registration_date = registration_date
+    def __init__(self, clients, cursor):
+        assert isinstance(clients, tuple), "clients expected to be a tuple"
+        assert isinstance(cursor, (int, type(None))), "cursor expected to be int or None"
+        self.clients = clients
+        self.cursor = cursor
 
     def __getstate__(self):
         return (
-            self.controller_id.bytes,
-            self.client_id.to_bytes(4, 'big'),
-            self.name.encode('ascii'),
-            self.registration_date
-
+            tuple((
+                (client_id, ipv4.packed, ipv6.packed, name.encode('ascii'), registration_date)
+                for (client_id, ipv4, ipv6, name, registration_date) in self.clients
+            )),
+            self.cursor
         )
 
     def __setstate__(self, state):
-        self.controller_id = UUID(bytes=state[0])
-        self.client_id = int.from_bytes(state[1], 'big')
-        self.name = state[2].decode('ascii')
-        self.registration_date = state[3]
+        self.clients = tuple((
+            (client_id, IPv4Address(ipv4), IPv6Address(ipv6), name.decode('ascii'), registration_date)
+            for (client_id, ipv4, ipv6, name, registration_date) in state[0]
+        ))
+        self.cursor = state[1]
 
 
 __register_msg(RPLSuccess)
@@ -617,6 +753,13 @@ __register_msg(RPLCentralNetworkPolicies)
 __register_msg(RPLControllerInformation)
 __register_msg(RPLClientInformation)
 __register_msg(RPLAddressInfo)
+__register_msg(RPLSnapshot)
+__register_msg(RPLControllersPage)
+__register_msg(RPLClientsPage)
+__register_msg(RPLPath)
+__register_msg(RPLMetrics)
+__register_msg(RPLProfile)
+__register_msg(RPLMemoryReport)
 
 ###########################
 ## Subscription Messages ##
@@ -632,15 +775,7 @@ class RPLGenericError(BaseError):
     '''
         Message used to reply a generic error
     '''
-    def __init__(self, reason):
-        assert isinstance(reason, str), "reason argument is not a string"
-        self.reason = reason
-
-    def __getstate__(self):
-        return self.reason
-
-    def __setstate__(self, state):
-        self.reason = state
+    _fields = (value_field("reason", lambda value: isinstance(value, str), "reason argument is not a string: {:s}"),)
 
     def __str__(self):
         return "{}: {}".format(self.__class__, self.reason)
@@ -650,15 +785,7 @@ class RPLErrorNoState(BaseError):
     '''
         Error message with no state
     '''
-
-    def __init__(self):
-        pass
-
-    def __getstate__(self):
-        return False
-
-    def __setstate__(self, state):
-        pass
+    _fields = ()
 
 
 class RPLNoResultsAvailable(RPLErrorNoState):
@@ -710,6 +837,53 @@ class RPLIPv6InfoAlreadyRegistered(RPLErrorNoState):
     pass
 
 
+class RPLLinkNotRegistered(RPLErrorNoState):
+    '''
+       Error message to reply the absence of a link between two sectors
+    '''
+    pass
+
+
+class RPLThrottled(BaseError):
+    '''
+        Error message to reply that a request was not processed, because its origin (controller) exceeded its request
+          rate, or has too many requests queued. It can be sent again after retry_after_ms milliseconds.
+    '''
+    _fields = (value_field("retry_after_ms", lambda value: isinstance(value, int) and value >= 0,
+                           "retry_after_ms is invalid: {:s}"),)
+
+    def __str__(self):
+        return "Request throttled. Retry after {:d} ms".format(self.retry_after_ms)
+
+
+class RPLBusy(BaseError):
+    '''
+        Error message to reply that a request was not processed, because the central manager is overloaded and is
+          shedding the requests which do not change registrations. It can be sent again after retry_after_ms
+          milliseconds.
+    '''
+    _fields = (value_field("retry_after_ms", lambda value: isinstance(value, int) and value >= 0,
+                           "retry_after_ms is invalid: {:s}"),)
+
+    def __str__(self):
+        return "Central manager busy. Retry after {:d} ms".format(self.retry_after_ms)
+
+
+class RPLDeadlineExpired(RPLErrorNoState):
+    '''
+        Error message to reply that a request was not processed, because its deadline (the time its sender waits for
+          the reply) expired before.
+    '''
+    pass
+
+
+class RPLSnapshotsNotConfigured(RPLErrorNoState):
+    '''
+        Error message to reply that the central manager has no snapshots directory configured
+    '''
+    pass
+
+
 __register_msg(RPLGenericError)
 __register_msg(RPLNoResultsAvailable)
 __register_msg(RPLControllerNotRegistered)
@@ -718,3 +892,8 @@ __register_msg(RPLClientNotRegistered)
 __register_msg(RPLClientAlreadyRegistered)
 __register_msg(RPLIPv4InfoAlreadyRegistered)
 __register_msg(RPLIPv6InfoAlreadyRegistered)
+__register_msg(RPLSnapshotsNotConfigured)
+__register_msg(RPLLinkNotRegistered)
+__register_msg(RPLThrottled)
+__register_msg(RPLDeadlineExpired)
+__register_msg(RPLBusy)
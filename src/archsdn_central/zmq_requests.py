@@ -3,37 +3,101 @@
 import sys
 import logging
 import asyncio
+from collections import OrderedDict
 import zmq
 from zmq.asyncio import Context
 import blosc
 from ipaddress import IPv4Address, IPv6Address
 
 from archsdn_central import database
+from archsdn_central import loop_monitor
+from archsdn_central import profiler
+from archsdn_central import memory_diagnostics
+from archsdn_central import deadlines
+from archsdn_central import liveness
+from archsdn_central import dns_responder
+from archsdn_central.fair_queue import FairQueue, Throttled
+from archsdn_central.load_shedder import LoadShedder
+from archsdn_central.dedup_cache import DeduplicationCache
 
 from archsdn_central.helpers import logger_module_name, custom_logging_callback
 
-from archsdn_central.zmq_messages import BaseMessage, \
-    loads, dumps, \
+from archsdn_central.zmq_messages import BaseMessage, BaseError, \
+    loads, dumps, stateless_messages, split_envelope, \
     RPLGenericError, RPLSuccess, \
     REQLocalTime, RPLLocalTime, \
     REQCentralNetworkPolicies, RPLCentralNetworkPolicies, \
     REQRegisterController, REQQueryControllerInfo, RPLControllerInformation, REQUnregisterController, \
-    REQUpdateControllerInfo, REQUnregisterAllClients, \
+    REQUpdateControllerInfo, REQUnregisterAllClients, REQHeartbeat, \
     RPLControllerNotRegistered, RPLControllerAlreadyRegistered, REQIsControllerRegistered, \
-    REQRegisterControllerClient, REQRemoveControllerClient, REQIsClientAssociated, REQClientInformation, \
+    REQRegisterControllerClient, REQRegisterControllerClients, REQRemoveControllerClient, REQIsClientAssociated, REQClientInformation, \
     RPLClientNotRegistered, RPLClientAlreadyRegistered, RPLClientInformation, \
     RPLIPv4InfoAlreadyRegistered, RPLIPv6InfoAlreadyRegistered, \
     REQAddressInfo, RPLAddressInfo, \
-    RPLAfirmative, RPLNegative, RPLNoResultsAvailable
+    REQListControllers, RPLControllersPage, REQListClients, RPLClientsPage, \
+    REQSnapshot, RPLSnapshot, RPLSnapshotsNotConfigured, \
+    REQMetrics, RPLMetrics, REQProfiler, RPLProfile, REQMemoryDiagnostics, RPLMemoryReport, \
+    REQRegisterLink, REQRemoveLink, REQPathQuery, RPLPath, RPLLinkNotRegistered, \
+    RPLAfirmative, RPLNegative, RPLNoResultsAvailable, RPLThrottled, RPLDeadlineExpired, RPLBusy
 
 
 __context = None
 __log = logging.getLogger(logger_module_name(__file__))
 __loop = asyncio.get_event_loop()
 
-
-def zmq_context_initialize(ip, port):
-    global __context
+# Requests received and not yet processed, served in a fair order between their origins (see __request_key).
+__fair_queue = None
+__in_flight = 0
+
+# Requests shed by the load shedder (see zmq_context_initialize) while overloaded. The requests changing registrations,
+#   the heartbeats (so live controllers are not reaped), and the requests diagnosing the overload, are never shed.
+__load_shedder = None
+__protected_requests = (
+    REQRegisterController, REQUnregisterController, REQUpdateControllerInfo, REQUnregisterAllClients,
+    REQRegisterControllerClient, REQRegisterControllerClients, REQRemoveControllerClient, REQHeartbeat,
+    REQRegisterLink, REQRemoveLink, REQMetrics, REQProfiler, REQMemoryDiagnostics,
+)
+
+# Replies to the requests with an idempotency key (see dedup_cache), by (peer, request id). Disabled while None.
+__dedup_cache = None
+
+# Reply cache: encoded request -> (encoded reply, tags). Disabled while None.
+__reply_cache = None
+__reply_cache_size = 0
+__reply_cache_tags = {}
+__reply_cache_generation = 0
+
+# Maximum number of entries in a listing page. Requests for larger pages are replied with pages of this size.
+__max_page_size = 1000
+
+# Messages without state are always encoded into the same frame. Their frames are encoded once, and decoded into shared
+#   instances of the messages.
+__static_frames = dict(((cls, blosc.compress(dumps(cls()))) for cls in stateless_messages()))
+__static_messages = dict(((frame, cls()) for (cls, frame) in __static_frames.items()))
+
+
+def zmq_context_initialize(ip, port, reply_cache_size=0, rate=0, burst=0, max_depth=0, max_in_flight=8,
+                           shed_pending=0, shed_latency=0, dedup_size=0, dedup_window=60.0, heartbeat_timeout=0,
+                           weights=None):
+    '''
+        Binds the ROUTER socket receiving the requests, and starts processing them.
+        The received requests are queued in a fair queue, by origin (the controller id of the request or, otherwise,
+          the identity of the peer socket), from which up to max_in_flight requests are processed at the same time.
+        The weights map controller ids to the number of their requests served in each round (by default, 1).
+        With a rate, each origin is limited to rate requests per second, with bursts of burst requests, and with a
+          max_depth, to max_depth queued requests. The requests over these limits are replied with RPLThrottled.
+        Requests whose deadline (see deadlines) expires while queued are replied with RPLDeadlineExpired, without being
+          processed.
+        While more than shed_pending requests are pending (queued or in-flight), or the database latency is larger
+          than shed_latency seconds, the received requests are shed (see load_shedder): they are replied with RPLBusy,
+          except the requests changing registrations. Zero disables each threshold.
+        With a dedup_size, the replies to the requests with an idempotency key (a request_id, and optionally a peer, in
+          their envelope header) are kept for dedup_window seconds, and their retries are replied with the original
+          reply (see dedup_cache).
+        With a heartbeat_timeout, the controllers sending heartbeats are reaped once they send none for
+          heartbeat_timeout seconds (see liveness).
+    '''
+    global __context, __fair_queue, __load_shedder, __dedup_cache
     assert isinstance(ip, (IPv4Address, IPv6Address)), \
         "ip is not a valid IPv4Address or IPv6Address object. Got instead {:s}".format(repr(ip))
     assert isinstance(port, int), \
@@ -41,40 +105,277 @@ def zmq_context_initialize(ip, port):
     assert 0 < port < 0xFFFF, \
         "port range invalid. Should be between 0 and 0xFFFF. Got {:d}".format(port)
 
+    assert isinstance(max_in_flight, int) and max_in_flight > 0, "max_in_flight expected to be a positive int"
+
     loop = asyncio.get_event_loop()
     __context = Context()
-
-    async def recv_and_process():
-        socket = __context.socket(zmq.REP)
-        socket.bind("tcp://{:s}:{:d}".format(str(ip), port))
-
+    __fair_queue = FairQueue(rate, burst, max_depth)
+    for (controller_id, weight) in (weights or {}).items():
+        __fair_queue.set_weight(__controller_key(controller_id), weight)
+    __load_shedder = LoadShedder(shed_pending, shed_latency, __protected_requests)
+    if dedup_size and dedup_window:
+        __dedup_cache = DeduplicationCache(dedup_size, dedup_window)
+    if heartbeat_timeout:
+        liveness.start(
+            heartbeat_timeout,
+            on_released=(lambda controller_id: __reply_cache_invalidate(("controller", controller_id)))
+        )
+    queued_event = asyncio.Event()
+    slot_event = asyncio.Event()
+    if reply_cache_size:
+        reply_cache_enable(reply_cache_size)
+
+    socket = __context.socket(zmq.ROUTER)
+    socket.bind("tcp://{:s}:{:d}".format(str(ip), port))
+
+    async def process(envelope, frame, msg, deadline, key):
+        global __in_flight
+        try:
+            if deadlines.expired(deadline, type(msg).__name__, "queue"):
+                reply = __encode(RPLDeadlineExpired())
+            else:
+                deadlines.set_current(deadline, type(msg).__name__)
+                if (key is not None) and (__dedup_cache is not None):
+                    reply = await __process_deduplicated(key, frame, msg)
+                else:
+                    reply = await process_frame(frame, msg)
+            # The routing envelope is returned with the reply.
+            await socket.send_multipart(envelope + [reply], copy=False)
+        finally:
+            __in_flight -= 1
+            slot_event.set()
+
+    async def recv_and_queue():
         while True:
+            frames = await socket.recv_multipart()
             try:
-                msg = loads(blosc.decompress(await socket.recv(), as_bytearray=True))
-                __log.info("Request received: {:s}".format(str(msg)))
-                if isinstance(msg, BaseMessage):
-                    reply = await __process_request(msg)
-                    __log.info("Replying request with: {:s}".format(str(reply)))
-                    await socket.send(blosc.compress(dumps(reply)))
-                else:
-                    error_str = "Invalid message received: {:s}. Closing socket...".format(repr(msg))
-                    __log.error(error_str)
-                    await socket.send(blosc.compress(dumps(RPLGenericError(error_str))))
-                    break
-
-            except Exception as ex:
-                custom_logging_callback(__log, logging.CRITICAL, *sys.exc_info())
-                await socket.send(blosc.compress(dumps(RPLGenericError(str(ex)))))
+                (envelope, header, frame) = split_envelope(frames)
+                msg = decode_frame(frame)
+            except Exception:
+                # The request is processed anyway, to be replied with the decoding error.
+                (envelope, header, frame, msg) = (frames[:-1], {}, frames[-1], None)
+            if __load_shedder and (msg is not None):
+                retry_after = __load_shedder.check(type(msg), len(__fair_queue) + __in_flight, database.latency())
+                if retry_after:
+                    await socket.send_multipart(envelope + [__encode(RPLBusy(int(retry_after * 1000)))], copy=False)
+                    continue
+            try:
+                __fair_queue.put(
+                    __request_key(frames[0], msg),
+                    (envelope, frame, msg, deadlines.deadline_from(header), __idempotency_key(frames[0], header))
+                )
+                queued_event.set()
+            except Throttled as ex:
+                await socket.send_multipart(
+                    envelope + [__encode(RPLThrottled(int(ex.retry_after * 1000)))], copy=False
+                )
+
+    async def dispatch():
+        global __in_flight
+        while True:
+            while not __fair_queue:
+                queued_event.clear()
+                await queued_event.wait()
+            while __in_flight >= max_in_flight:
+                slot_event.clear()
+                await slot_event.wait()
+            __in_flight += 1
+            loop.create_task(process(*__fair_queue.get()))
 
-        __log.warning("ZMQ context is shutting down...")
-    loop.create_task(recv_and_process())
+    loop.create_task(recv_and_queue())
+    loop.create_task(dispatch())
 
 
 def zmq_context_close():
+    liveness.stop()
     __context.destroy()
 
 
-async def __process_request(request):
+def __request_key(identity, msg):
+    '''
+        Returns the origin of a request, by which it is fairly queued: the controller id of the request, if any, or the
+          identity of the peer socket otherwise.
+    '''
+    controller_id = getattr(msg, "controller_id", None)
+    if controller_id is not None:
+        return __controller_key(controller_id)
+    return "peer {:s}".format(identity.hex())
+
+
+def __controller_key(controller_id):
+    return "controller {:s}".format(str(controller_id))
+
+
+def __idempotency_key(identity, header):
+    '''
+        Returns the idempotency key of a request: its peer (by default, the identity of the peer socket, which changes
+          when the client reconnects) and its request id, or None if its header has no request id.
+    '''
+    request_id = header.get("request_id")
+    if request_id is None:
+        return None
+    return (header.get("peer", identity), request_id)
+
+
+async def __process_deduplicated(key, frame, msg):
+    '''
+        Processes a request with an idempotency key, unless its reply is in the de-duplication cache. Requests dropped
+          for having expired their deadline were not processed, so their replies are not kept.
+    '''
+    future = __dedup_cache.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = __dedup_cache.put(key)
+    try:
+        reply = await process_frame(frame, msg)
+        future.set_result(reply)
+        if reply == __static_frames[RPLDeadlineExpired]:
+            __dedup_cache.discard(key)
+        return reply
+    finally:
+        if not future.done():
+            future.cancel()
+            __dedup_cache.discard(key)
+
+
+def queues_metrics():
+    '''
+        Returns the metrics of the requests fair queue: the number of requests queued, in-flight, and replied with
+          RPLThrottled (in total), the depth of each origin queue, and the load shedder metrics (see
+          load_shedder.LoadShedder.metrics).
+    '''
+    if __fair_queue is None:
+        return {}
+    return {
+        "queued": len(__fair_queue),
+        "in_flight": __in_flight,
+        "throttled": __fair_queue.throttled,
+        "depths": __fair_queue.depths(),
+        "shedding": __load_shedder.metrics(),
+    }
+
+
+def use_database_backend(backend):
+    '''
+        Replaces the database backend used by the request handlers.
+        Worker processes use it to forward the database operations to the process owning the database.
+    '''
+    global database
+    database = backend
+
+
+def reply_cache_enable(size):
+    '''
+        Enables the reply cache for the idempotent read requests, bounded to size entries.
+        The cache is local to the process, so it must only be enabled in the process which performs every mutation.
+    '''
+    global __reply_cache, __reply_cache_size
+    assert isinstance(size, int) and size > 0, "size expected to be a positive int"
+    __reply_cache = OrderedDict()
+    __reply_cache_size = size
+    __reply_cache_tags.clear()
+
+
+def __encode(message):
+    frame = __static_frames.get(type(message))
+    if frame is None:
+        frame = blosc.compress(dumps(message))
+    return frame
+
+
+def decode_frame(frame):
+    '''
+        Decodes a request frame.
+        The frame is decompressed into bytes, which are smaller than a bytearray.
+    '''
+    msg = __static_messages.get(frame)
+    if msg is None:
+        msg = loads(blosc.decompress(frame))
+    return msg
+
+
+def __reply_cache_store(key, reply, tags):
+    __reply_cache[key] = (reply, tags)
+    for tag in tags:
+        __reply_cache_tags.setdefault(tag, set()).add(key)
+
+    while len(__reply_cache) > __reply_cache_size:
+        __reply_cache_discard(*__reply_cache.popitem(last=False))
+
+
+def __reply_cache_discard(key, entry):
+    for tag in entry[1]:
+        keys = __reply_cache_tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del __reply_cache_tags[tag]
+
+
+def __reply_cache_invalidate(*tags):
+    '''
+        Invalidates the cached replies marked with any of the tags.
+    '''
+    global __reply_cache_generation
+    if __reply_cache is None:
+        return
+    __reply_cache_generation += 1
+    for tag in tags:
+        for key in __reply_cache_tags.pop(tag, ()):
+            if key in __reply_cache:
+                __reply_cache_discard(key, __reply_cache.pop(key))
+
+
+async def process_frame(frame, msg=None):
+    '''
+        Decodes a request frame (unless already decoded into msg), processes the request and returns the encoded reply
+          frame.
+        Replies to cacheable requests are served from the reply cache, when enabled, skipping the decoding, the database
+          and the encoding.
+    '''
+    try:
+        # With the memory diagnostics started, the memory retained by the request is accounted to its type (the
+        #   cached replies are not decoded, so they are accounted together).
+        marker = memory_diagnostics.mark() if memory_diagnostics.is_started() else None
+        if __reply_cache is not None:
+            entry = __reply_cache.get(frame)
+            if entry is not None:
+                __reply_cache.move_to_end(frame)
+                if marker is not None:
+                    memory_diagnostics.account("(cached replies)", marker)
+                return entry[0]
+
+        if msg is None:
+            msg = decode_frame(frame)
+        __log.info("Request received: {:s}".format(str(msg)))
+        if isinstance(msg, BaseMessage):
+            generation = __reply_cache_generation
+            reply = await process_request(msg)
+            __log.info("Replying request with: {:s}".format(str(reply)))
+            encoded_reply = __encode(reply)
+            if (marker is not None) and memory_diagnostics.is_started():
+                memory_diagnostics.account(type(msg).__name__, marker)
+
+            # Replies are only cached if no invalidation happened while the request was being processed. Errors are
+            #   not cached, except the negative answers (see _cached_errors): transient errors (e.g. an expired
+            #   deadline) would otherwise be replied to every following identical request.
+            if (__reply_cache is not None) and (type(msg) in _cached_requests) and \
+                    ((not isinstance(reply, BaseError)) or isinstance(reply, _cached_errors)) and \
+                    (generation == __reply_cache_generation):
+                __reply_cache_store(frame, encoded_reply, _cached_requests[type(msg)](msg, reply))
+            return encoded_reply
+
+        error_str = "Invalid message received: {:s}.".format(repr(msg))
+        __log.error(error_str)
+        return __encode(RPLGenericError(error_str))
+
+    except Exception as ex:
+        custom_logging_callback(__log, logging.CRITICAL, *sys.exc_info())
+        return __encode(RPLGenericError(str(ex)))
+
+
+async def process_request(request):
     try:
         return await _requests[type(request)](request)
 
@@ -102,6 +403,15 @@ async def __process_request(request):
     except database.NoResultsAvailable:
         return RPLNoResultsAvailable()
 
+    except database.SnapshotsNotConfigured:
+        return RPLSnapshotsNotConfigured()
+
+    except database.LinkNotRegistered:
+        return RPLLinkNotRegistered()
+
+    except database.DeadlineExpired:
+        return RPLDeadlineExpired()
+
     except Exception as ex:
         custom_logging_callback(__log, logging.ERROR, *sys.exc_info())
         if sys.flags.debug:
@@ -115,7 +425,7 @@ async def __req_local_time(request):
 
 async def __req_central_network_policies(request):
     database_info = await database.info()
-    return RPLCentralNetworkPolicies(**database_info)
+    return RPLCentralNetworkPolicies.trusted(**database_info)
 
 
 async def __req_register_controller(request):
@@ -124,21 +434,30 @@ async def __req_register_controller(request):
         ipv4_info=request.ipv4_info,
         ipv6_info=request.ipv6_info
     )
+    __reply_cache_invalidate(("controller", request.controller_id), "address-miss")
     return RPLSuccess()
 
 
 async def __req_query_controller_info(request):
     controller_info = await database.query_controller_info(request.controller_id)
-    return RPLControllerInformation(**controller_info)
+    return RPLControllerInformation.trusted(**controller_info)
 
 
 async def __req_update_controller_info(request):
     await database.update_controller_addresses(request.controller_id, request.ipv4_info, request.ipv6_info)
+    __reply_cache_invalidate(("controller", request.controller_id), "address-miss")
     return RPLSuccess()
 
 
 async def __req_unregister_controller(request):
     await database.remove_controller(request.controller_id)
+    liveness.forget(request.controller_id)
+    __reply_cache_invalidate(("controller", request.controller_id))
+    return RPLSuccess()
+
+
+async def __req_heartbeat(request):
+    liveness.heartbeat(request.controller_id)
     return RPLSuccess()
 
 
@@ -150,11 +469,19 @@ async def __req_is_controller_registered(request):
 
 async def __req_register_controller_client(request):
     await database.register_client(request.client_id, request.controller_id)
+    __reply_cache_invalidate(("controller", request.controller_id), "address-miss")
+    return RPLSuccess()
+
+
+async def __req_register_controller_clients(request):
+    await database.register_clients(request.client_ids, request.controller_id)
+    __reply_cache_invalidate(("controller", request.controller_id), "address-miss")
     return RPLSuccess()
 
 
 async def __req_remove_controller_client(request):
     await database.remove_client(request.client_id, request.controller_id)
+    __reply_cache_invalidate(("controller", request.controller_id))
     return RPLSuccess()
 
 
@@ -166,17 +493,76 @@ async def __req_is_client_associated(request):
 
 async def __req_client_information(request):
     client_info = await database.query_client_info(request.client_id, request.controller_id)
-    return RPLClientInformation(**client_info)
+    return RPLClientInformation.trusted(**client_info)
 
 
 async def __req_unregister_all_clients(request):
     await database.remove_all_clients(request.controller_id)
+    __reply_cache_invalidate(("controller", request.controller_id))
     return RPLSuccess()
 
 
 async def __req_address_information(request):
     address_info = await database.query_address_info(request.ipv4, request.ipv6)
-    return RPLAddressInfo(**address_info)
+    return RPLAddressInfo.trusted(**address_info)
+
+
+async def __req_snapshot(request):
+    snapshot_info = await database.snapshot()
+    return RPLSnapshot.trusted(**snapshot_info)
+
+
+async def __req_metrics(request):
+    return RPLMetrics.trusted({
+        "loops": loop_monitor.histograms(),
+        "queues": queues_metrics(),
+        "database": await database.lanes_metrics(),
+        "deadlines": deadlines.metrics(),
+        "deduplication": __dedup_cache.metrics() if __dedup_cache is not None else {},
+        "liveness": liveness.metrics(),
+        "dns": dns_responder.metrics(),
+        "topology": await database.topology_metrics(),
+    })
+
+
+async def __req_profiler(request):
+    if request.enable:
+        profiler.start()
+        return RPLProfile.trusted(**profiler.status())
+    return RPLProfile.trusted(**profiler.stop())
+
+
+async def __req_memory_diagnostics(request):
+    if request.action == "start":
+        memory_diagnostics.start()
+    elif request.action == "stop":
+        memory_diagnostics.stop()
+    return RPLMemoryReport.trusted(**memory_diagnostics.report())
+
+
+async def __req_register_link(request):
+    await database.register_link(request.controller_id, request.peer_id, request.capacity, request.latency)
+    return RPLSuccess()
+
+
+async def __req_remove_link(request):
+    await database.remove_link(request.controller_id, request.peer_id)
+    return RPLSuccess()
+
+
+async def __req_path_query(request):
+    path_info = await database.query_path(request.controller_id, request.destination_id)
+    return RPLPath.trusted(**path_info)
+
+
+async def __req_list_controllers(request):
+    page = await database.list_controllers(request.cursor, min(request.limit, __max_page_size))
+    return RPLControllersPage.trusted(**page)
+
+
+async def __req_list_clients(request):
+    page = await database.list_clients(request.controller_id, request.cursor, min(request.limit, __max_page_size))
+    return RPLClientsPage.trusted(**page)
 
 
 _requests = {
@@ -186,11 +572,42 @@ _requests = {
     REQQueryControllerInfo: __req_query_controller_info,
     REQUnregisterController: __req_unregister_controller,
     REQIsControllerRegistered: __req_is_controller_registered,
+    REQHeartbeat: __req_heartbeat,
     REQRegisterControllerClient: __req_register_controller_client,
+    REQRegisterControllerClients: __req_register_controller_clients,
     REQRemoveControllerClient: __req_remove_controller_client,
     REQIsClientAssociated: __req_is_client_associated,
     REQClientInformation: __req_client_information,
     REQUpdateControllerInfo: __req_update_controller_info,
     REQUnregisterAllClients: __req_unregister_all_clients,
-    REQAddressInfo: __req_address_information
+    REQAddressInfo: __req_address_information,
+    REQListControllers: __req_list_controllers,
+    REQListClients: __req_list_clients,
+    REQSnapshot: __req_snapshot,
+    REQMetrics: __req_metrics,
+    REQProfiler: __req_profiler,
+    REQMemoryDiagnostics: __req_memory_diagnostics,
+    REQRegisterLink: __req_register_link,
+    REQRemoveLink: __req_remove_link,
+    REQPathQuery: __req_path_query,
 }
+
+profiler.label_functions(dict(((handler, cls.__name__) for (cls, handler) in _requests.items())))
+
+
+# Idempotent read requests whose replies can be cached, and the tags invalidating them.
+# Every reply depending on a controller registration, or on the clients registered by it, is tagged with the controller
+#   id. Address lookups without results are tagged as address-miss, since any new registration can turn them stale.
+_cached_requests = {
+    REQCentralNetworkPolicies: lambda request, reply: (),
+    REQQueryControllerInfo: lambda request, reply: (("controller", request.controller_id),),
+    REQIsControllerRegistered: lambda request, reply: (("controller", request.controller_id),),
+    REQIsClientAssociated: lambda request, reply: (("controller", request.controller_id),),
+    REQClientInformation: lambda request, reply: (("controller", request.controller_id),),
+    REQAddressInfo: lambda request, reply:
+        (("controller", reply.controller_id),) if isinstance(reply, RPLAddressInfo) else ("address-miss",),
+}
+
+# Error replies which are answers of the cacheable requests (e.g. an unregistered controller), cached like their
+#   successful replies.
+_cached_errors = (RPLControllerNotRegistered, RPLClientNotRegistered, RPLNoResultsAvailable)
@@ -0,0 +1,198 @@
+# coding=utf-8
+
+import sys
+import os
+import signal
+import logging
+import asyncio
+import pickle
+import itertools
+import tempfile
+import multiprocessing
+import zmq
+from zmq.asyncio import Context
+from zmq.devices import ThreadDevice
+from ipaddress import IPv4Address, IPv6Address
+
+from archsdn_central import database
+from archsdn_central import zmq_requests
+from archsdn_central import loop_monitor
+from archsdn_central import deadlines
+from archsdn_central.zmq_messages import split_envelope
+
+from archsdn_central.helpers import logger_module_name, custom_logging_callback
+
+
+__context = None
+__frontend = None
+__workers = []
+__ipc_paths = []
+__log = logging.getLogger(logger_module_name(__file__))
+
+# Database operations which cannot be requested by the worker processes.
+__forbidden_operations = {"initialise", "close", "shutdown", "monitor"}
+
+
+def zmq_workers_initialize(ip, port, workers, lag_interval=0, lag_threshold=0):
+    '''
+        Starts the multi-process front end.
+        The requests arriving at the front end are distributed by a queue device to the worker processes, which decode,
+          process and encode them. The database operations are forwarded by the workers to this process, which is the
+          single owner of the database.
+        With a lag_interval, every worker monitors the lag of its event loop (see loop_monitor), which it reports in the
+          metrics replies. The stack samples of the workers are written to their log.
+    '''
+    global __context, __frontend
+    assert isinstance(ip, (IPv4Address, IPv6Address)), \
+        "ip is not a valid IPv4Address or IPv6Address object. Got instead {:s}".format(repr(ip))
+    assert isinstance(port, int), \
+        "port is not a valid int object. Got instead {:s}".format(repr(port))
+    assert 0 < port < 0xFFFF, \
+        "port range invalid. Should be between 0 and 0xFFFF. Got {:d}".format(port)
+    assert isinstance(workers, int) and workers > 0, \
+        "workers is expected to be a positive int. Got {:s}".format(repr(workers))
+
+    loop = asyncio.get_event_loop()
+    __context = Context()
+
+    ipc_prefix = "ipc://{:s}/archsdn-central-{:d}".format(tempfile.gettempdir(), os.getpid())
+    backend_location = "{:s}-backend".format(ipc_prefix)
+    database_location = "{:s}-database".format(ipc_prefix)
+    __ipc_paths.extend((location[len("ipc://"):] for location in (backend_location, database_location)))
+
+    __frontend = ThreadDevice(zmq.QUEUE, zmq.ROUTER, zmq.DEALER)
+    __frontend.bind_in("tcp://{:s}:{:d}".format(str(ip), port))
+    __frontend.bind_out(backend_location)
+    __frontend.start()
+
+    database_socket = __context.socket(zmq.ROUTER)
+    database_socket.bind(database_location)
+
+    async def execute_operation(identity, operation):
+        (operation_id, name, args, kwargs) = pickle.loads(operation)
+        try:
+            if name.startswith("_") or name in __forbidden_operations:
+                raise AttributeError("Database operation {:s} cannot be requested by workers.".format(name))
+            result = (operation_id, True, await getattr(database, name)(*args, **kwargs))
+        except Exception as ex:
+            result = (operation_id, False, ex)
+
+        try:
+            reply = pickle.dumps(result)
+        except Exception as ex:
+            reply = pickle.dumps((operation_id, False, Exception(str(ex))))
+        await database_socket.send_multipart((identity, reply))
+
+    async def recv_and_execute():
+        while True:
+            try:
+                (identity, operation) = await database_socket.recv_multipart()
+                loop.create_task(execute_operation(identity, operation))
+            except Exception:
+                custom_logging_callback(__log, logging.CRITICAL, *sys.exc_info())
+
+    loop.create_task(recv_and_execute())
+
+    spawn_context = multiprocessing.get_context("spawn")
+    for worker_id in range(workers):
+        worker = spawn_context.Process(
+            target=worker_main,
+            args=(
+                worker_id, backend_location, database_location, logging.getLogger().getEffectiveLevel(),
+                lag_interval, lag_threshold
+            ),
+            daemon=True
+        )
+        worker.start()
+        __workers.append(worker)
+    __log.info("Started {:d} worker processes.".format(workers))
+
+
+def zmq_workers_close():
+    for worker in __workers:
+        worker.terminate()
+    for worker in __workers:
+        worker.join()
+    __workers.clear()
+    __context.destroy()
+    for path in __ipc_paths:
+        if os.path.exists(path):
+            os.remove(path)
+    __ipc_paths.clear()
+
+
+class _RemoteDatabase:
+    '''
+        Database backend used by the worker processes.
+        Database operations are forwarded to the process owning the database, which replies with their results.
+        Any attribute which is not a database operation (the database exceptions) is served by the local database
+          module.
+    '''
+    def __init__(self, context, location):
+        self.__socket = context.socket(zmq.DEALER)
+        self.__socket.connect(location)
+        self.__operation_ids = itertools.count()
+        self.__pending = {}
+        asyncio.get_event_loop().create_task(self.__recv_results())
+
+    async def __recv_results(self):
+        while True:
+            (operation_id, success, result) = pickle.loads(await self.__socket.recv())
+            future = self.__pending.pop(operation_id)
+            if success:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def __getattr__(self, name):
+        attr = getattr(database, name)
+        if isinstance(attr, type):
+            return attr
+
+        async def remote_attr(*args, **kwargs):
+            deadlines.check("submit")
+            operation_id = next(self.__operation_ids)
+            future = asyncio.get_event_loop().create_future()
+            self.__pending[operation_id] = future
+            await self.__socket.send(pickle.dumps((operation_id, name, args, kwargs)))
+            return await future
+
+        return remote_attr
+
+
+def worker_main(worker_id, backend_location, database_location, log_level, lag_interval=0, lag_threshold=0):
+    '''
+        Entry point of the worker processes.
+        The interrupt signal is ignored, since the workers are terminated by the main process.
+    '''
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        format='[{{asctime:^s}}][{{levelname:^8s}}][worker {:d}]: {{message:s}}'.format(worker_id),
+        style='{', level=log_level
+    )
+    sys.excepthook = (lambda tp, val, tb: custom_logging_callback(logging.getLogger(), logging.ERROR, tp, val, tb))
+
+    loop = asyncio.get_event_loop()
+    context = Context()
+    zmq_requests.use_database_backend(_RemoteDatabase(context, database_location))
+    if lag_interval:
+        loop_monitor.monitor(loop, "worker {:d}".format(worker_id), lag_interval, lag_threshold)
+
+    socket = context.socket(zmq.DEALER)
+    socket.connect(backend_location)
+
+    async def process(frames):
+        (envelope, header, frame) = split_envelope(frames)
+        deadlines.set_current(deadlines.deadline_from(header), None)
+        reply = await zmq_requests.process_frame(frame)
+        # The routing envelope is returned with the reply.
+        await socket.send_multipart(envelope + [reply], copy=False)
+
+    async def recv_and_process():
+        while True:
+            loop.create_task(process(await socket.recv_multipart()))
+
+    try:
+        loop.run_until_complete(recv_and_process())
+    finally:
+        context.destroy()
@@ -11,8 +11,8 @@ import zmq
 import blosc
 
 from archsdn_central.zmq_messages import \
-    loads, dumps, \
-    RPLSuccess, \
+    loads, dumps, dumps_header, \
+    RPLSuccess, RPLDeadlineExpired, \
     REQLocalTime, RPLLocalTime, \
     REQCentralNetworkPolicies, RPLCentralNetworkPolicies, \
     REQRegisterController, REQQueryControllerInfo, RPLControllerInformation, REQUnregisterController, \
@@ -30,14 +30,14 @@ mac_eui48.word_sep = ":"
 database_location = Path("/tmp/test_central.sqlite3")
 
 
-def openPuppetProcess():
+def openPuppetProcess(*args):
     if Path("../archsdn_central/main.py").exists():
         return subprocess.Popen(
-            ("python", "../archsdn_central/main.py", "-l", "CRITICAL", "-s", str(database_location))
+            ("python", "../archsdn_central/main.py", "-l", "CRITICAL", "-s", str(database_location)) + args
         )
     if Path("./src/archsdn_central/main.py").exists():
         return subprocess.Popen(
-            ("python", "./src/archsdn_central/main.py", "-l", "CRITICAL", "-s", str(database_location))
+            ("python", "./src/archsdn_central/main.py", "-l", "CRITICAL", "-s", str(database_location)) + args
         )
     raise SystemExit("archsdn_central.main.py not found.")
 
@@ -51,6 +51,9 @@ class ZMQ_Puppet_Socket():
     def send(self, obj):
         return self.socket.send(blosc.compress(dumps(obj)))
 
+    def send_with_header(self, header, obj):
+        return self.socket.send_multipart((dumps_header(header), blosc.compress(dumps(obj))))
+
     def recv(self):
         return loads(blosc.decompress(self.socket.recv(), as_bytearray=True))
 
@@ -92,6 +95,12 @@ class DefaultInitAndClose(unittest.TestCase):
         )
         self.assertLessEqual(msg.registration_date, localtime())
 
+    def test_request_deadlines(self):
+        self.socket.send_with_header({"timeout_ms": 5000}, REQLocalTime())
+        self.assertIsInstance(self.socket.recv(), RPLLocalTime)
+        self.socket.send_with_header({"timeout_ms": 0}, REQLocalTime())
+        self.assertIsInstance(self.socket.recv(), RPLDeadlineExpired)
+
 
 class MultipleClientsOperations(unittest.TestCase):
     def setUp(self):
@@ -113,6 +122,68 @@ class MultipleClientsOperations(unittest.TestCase):
         self.assertIsInstance(msg_2, RPLLocalTime)
 
 
+class WorkerProcessesOperations(unittest.TestCase):
+    def setUp(self):
+        self.central = openPuppetProcess("-w", "2")
+        self.socket_1 = ZMQ_Puppet_Socket()
+        self.socket_2 = ZMQ_Puppet_Socket()
+
+        self.uuid = UUID(int=1)
+        self.ipv4_info = (IPv4Address("192.168.1.1"), 12345)
+        self.ipv6_info = (IPv6Address(1), 12345)
+
+    def tearDown(self):
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+
+    def test_register_and_query_controller(self):
+        self.socket_1.send(REQRegisterController(self.uuid, self.ipv4_info, self.ipv6_info))
+        self.assertIsInstance(self.socket_1.recv(), RPLSuccess)
+        self.socket_2.send(REQQueryControllerInfo(self.uuid))
+        msg = self.socket_2.recv()
+        self.assertIsInstance(msg, RPLControllerInformation)
+        self.assertEqual(msg.ipv4, self.ipv4_info[0])
+        self.assertEqual(msg.ipv6, self.ipv6_info[0])
+
+    def test_database_errors_are_replied(self):
+        self.socket_1.send(REQRegisterController(self.uuid, self.ipv4_info, self.ipv6_info))
+        self.assertIsInstance(self.socket_1.recv(), RPLSuccess)
+        self.socket_2.send(REQRegisterController(self.uuid, self.ipv4_info, self.ipv6_info))
+        self.assertIsInstance(self.socket_2.recv(), RPLControllerAlreadyRegistered)
+        self.socket_1.send(REQQueryControllerInfo(UUID(int=2)))
+        self.assertIsInstance(self.socket_1.recv(), RPLControllerNotRegistered)
+
+
+class WeightedControllers(unittest.TestCase):
+    def setUp(self):
+        self.uuid = UUID(int=1)
+        self.central = openPuppetProcess("-cw", "{:s}=3".format(str(self.uuid)))
+        self.socket = ZMQ_Puppet_Socket()
+
+    def tearDown(self):
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+
+    def test_weighted_controller_requests(self):
+        self.socket.send(REQRegisterController(self.uuid, (IPv4Address("192.168.1.1"), 12345)))
+        self.assertIsInstance(self.socket.recv(), RPLSuccess)
+        self.socket.send(REQQueryControllerInfo(self.uuid))
+        self.assertIsInstance(self.socket.recv(), RPLControllerInformation)
+
+
+class WorkerProcessesOptions(unittest.TestCase):
+    def test_single_process_options_are_rejected(self):
+        # The request protections are not implemented by the worker processes.
+        for option in (
+            ("-rl", "100"), ("-sp", "500"), ("-sl", "200"), ("-ht", "30"), ("-cw", "{:s}=2".format(str(UUID(int=1))))
+        ):
+            central = openPuppetProcess("-w", "2", *option)
+            self.assertEqual(central.wait(timeout=30), 2)
+        self.assertFalse(database_location.exists())
+
+
 class ControllerRegistration(unittest.TestCase):
     def setUp(self):
         self.central = openPuppetProcess()
@@ -131,6 +202,14 @@ class ControllerRegistration(unittest.TestCase):
         self.socket.send(REQRegisterController(self.uuid, self.ipv4_info, self.ipv6_info))
         self.assertIsInstance(self.socket.recv(), RPLSuccess)
 
+    def test_retried_registration_is_deduplicated(self):
+        request = REQRegisterController(self.uuid, self.ipv4_info, self.ipv6_info)
+        for _ in range(2):
+            self.socket.send_with_header({"peer": b"controller 1", "request_id": b"1"}, request)
+            self.assertIsInstance(self.socket.recv(), RPLSuccess)
+        self.socket.send_with_header({"peer": b"controller 1", "request_id": b"2"}, request)
+        self.assertIsInstance(self.socket.recv(), RPLControllerAlreadyRegistered)
+
     def test_query_controller_information(self):
         self.socket.send(REQRegisterController(self.uuid, self.ipv4_info, self.ipv6_info))
         self.assertIsInstance(self.socket.recv(), RPLSuccess)
@@ -285,6 +364,33 @@ class ControllerRegistration(unittest.TestCase):
         self.assertEqual(msg.name, ".".join((str(self.uuid), 'controller', 'archsdn')))
         self.assertLessEqual(msg.registration_date, localtime())
 
+    def test_cached_replies_invalidation(self):
+        self.socket.send(REQIsControllerRegistered(self.uuid))
+        self.assertIsInstance(self.socket.recv(), RPLNegative)
+        self.socket.send(REQAddressInfo(ipv4=IPv4Address("192.168.1.1")))
+        self.assertIsInstance(self.socket.recv(), RPLNoResultsAvailable)
+
+        self.socket.send(REQRegisterController(self.uuid, self.ipv4_info, self.ipv6_info))
+        self.assertIsInstance(self.socket.recv(), RPLSuccess)
+        self.socket.send(REQIsControllerRegistered(self.uuid))
+        self.assertIsInstance(self.socket.recv(), RPLAfirmative)
+        self.socket.send(REQAddressInfo(ipv4=IPv4Address("192.168.1.1")))
+        self.assertIsInstance(self.socket.recv(), RPLAddressInfo)
+
+        self.socket.send(REQUpdateControllerInfo(self.uuid, ipv4_info=(IPv4Address("192.168.1.10"), 12345)))
+        self.assertIsInstance(self.socket.recv(), RPLSuccess)
+        self.socket.send(REQQueryControllerInfo(self.uuid))
+        self.assertEqual(self.socket.recv().ipv4, IPv4Address("192.168.1.10"))
+        self.socket.send(REQAddressInfo(ipv4=IPv4Address("192.168.1.1")))
+        self.assertIsInstance(self.socket.recv(), RPLNoResultsAvailable)
+
+        self.socket.send(REQUnregisterController(self.uuid))
+        self.assertIsInstance(self.socket.recv(), RPLSuccess)
+        self.socket.send(REQQueryControllerInfo(self.uuid))
+        self.assertIsInstance(self.socket.recv(), RPLControllerNotRegistered)
+        self.socket.send(REQIsControllerRegistered(self.uuid))
+        self.assertIsInstance(self.socket.recv(), RPLNegative)
+
     def test_query_address_info_no_results(self):
         self.socket.send(REQAddressInfo(ipv4=IPv4Address("192.168.1.1")))
         self.assertIsInstance(self.socket.recv(), RPLNoResultsAvailable)
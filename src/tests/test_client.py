@@ -0,0 +1,406 @@
+import unittest
+import time
+import signal
+import logging
+import asyncio
+import tempfile
+from pathlib import Path
+from ipaddress import IPv4Address, IPv6Address
+from time import localtime
+from uuid import UUID
+
+from archsdn_central.client import AsyncClient, Client, RequestTimeout, LookupCache
+from archsdn_central.zmq_messages import \
+    RPLLocalTime, RPLControllerInformation, RPLClientInformation, RPLAddressInfo, \
+    RPLControllerAlreadyRegistered, RPLControllerNotRegistered, RPLNoResultsAvailable, RPLSnapshotsNotConfigured, \
+    RPLClientAlreadyRegistered, RPLThrottled, RPLBusy, RPLLinkNotRegistered, REQLocalTime
+
+from tests.test_central import openPuppetProcess, database_location
+
+
+class SyncClientOperations(unittest.TestCase):
+    def setUp(self):
+        self.central = openPuppetProcess()
+        self.client = Client()
+
+        self.uuid = UUID(int=1)
+        self.ipv4_info = (IPv4Address("192.168.1.1"), 12345)
+        self.ipv6_info = (IPv6Address(1), 12345)
+
+    def tearDown(self):
+        self.client.close()
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+
+    def test_local_time(self):
+        self.assertIsInstance(self.client.local_time(), RPLLocalTime)
+
+    def test_controller_operations(self):
+        self.assertFalse(self.client.is_controller_registered(self.uuid))
+        self.client.register_controller(self.uuid, self.ipv4_info, self.ipv6_info)
+        self.assertTrue(self.client.is_controller_registered(self.uuid))
+
+        info = self.client.query_controller_info(self.uuid)
+        self.assertIsInstance(info, RPLControllerInformation)
+        self.assertEqual(info.ipv4, self.ipv4_info[0])
+        self.assertEqual(info.ipv6_port, self.ipv6_info[1])
+        self.assertLessEqual(info.registration_date, localtime())
+
+        with self.assertRaises(RPLControllerAlreadyRegistered):
+            self.client.register_controller(self.uuid, self.ipv4_info, self.ipv6_info)
+
+        self.client.remove_controller(self.uuid)
+        with self.assertRaises(RPLControllerNotRegistered):
+            self.client.query_controller_info(self.uuid)
+
+    def test_client_operations(self):
+        self.client.register_controller(self.uuid, self.ipv4_info, self.ipv6_info)
+        self.client.register_client(self.uuid, 2)
+        self.assertTrue(self.client.is_client_registered(self.uuid, 2))
+        self.assertFalse(self.client.is_client_registered(self.uuid, 3))
+
+        info = self.client.query_client_info(self.uuid, 2)
+        self.assertIsInstance(info, RPLClientInformation)
+        self.assertEqual(info.ipv4, IPv4Address("10.0.0.2"))
+
+        info = self.client.query_address_info(ipv4=IPv4Address("10.0.0.2"))
+        self.assertIsInstance(info, RPLAddressInfo)
+        self.assertEqual(info.controller_id, self.uuid)
+        self.assertEqual(info.client_id, 2)
+
+        self.client.remove_all_clients(self.uuid)
+        with self.assertRaises(RPLNoResultsAvailable):
+            self.client.query_address_info(ipv4=IPv4Address("10.0.0.2"))
+
+    def test_metrics(self):
+        metrics = self.client.metrics()
+        self.assertEqual(set(metrics["loops"]), {"main", "database"})
+        self.assertEqual(metrics["queues"]["queued"], 0)
+        self.assertEqual(metrics["queues"]["in_flight"], 1)
+        self.assertEqual(metrics["queues"]["throttled"], 0)
+        self.assertEqual(set(metrics["database"]), {"read", "write", "bulk"})
+        self.assertGreater(metrics["database"]["bulk"]["operations"], 0)
+        histogram = metrics["loops"]["main"]
+        self.assertEqual(len(histogram["counts"]), len(histogram["bounds"]) + 1)
+        self.assertEqual(sum(histogram["counts"]), histogram["count"])
+
+    def test_profiler(self):
+        self.assertTrue(self.client.profiler(True).running)
+        self.client.register_controller(self.uuid, self.ipv4_info, self.ipv6_info)
+        for _ in range(100):
+            self.client.query_controller_info(self.uuid)
+        profile = self.client.profiler(False)
+        self.assertFalse(profile.running)
+        self.assertGreater(profile.samples, 0)
+
+        location = Path(profile.location)
+        self.assertTrue(location.exists())
+        threads = set((line.split(";", 1)[0] for line in location.read_text().splitlines()))
+        self.assertTrue({"MainThread", "database"} <= threads)
+        location.unlink()
+        location.with_suffix(".handlers").unlink()
+
+    def test_memory_diagnostics(self):
+        self.assertFalse(self.client.memory_diagnostics().tracing)
+        self.assertTrue(self.client.memory_diagnostics("start").tracing)
+        for _ in range(10):
+            self.client.is_controller_registered(self.uuid)
+        report = self.client.memory_diagnostics()
+        self.assertGreater(report.traced, 0)
+        self.assertTrue(report.modules)
+        self.assertEqual(report.requests["REQIsControllerRegistered"][0], 1)
+        self.assertEqual(report.requests["(cached replies)"][0], 9)
+        self.assertFalse(self.client.memory_diagnostics("stop").tracing)
+
+    def test_snapshot_not_configured(self):
+        with self.assertRaises(RPLSnapshotsNotConfigured):
+            self.client.snapshot()
+
+    def test_listing(self):
+        for i in range(1, 6):
+            self.client.register_controller(UUID(int=i), (IPv4Address("192.168.1.1"), 10000 + i))
+        for client_id in range(1, 6):
+            self.client.register_client(UUID(int=3), client_id)
+
+        controllers = list(self.client.list_controllers(page_size=2))
+        self.assertEqual(list((controller[0] for controller in controllers)), list((UUID(int=i) for i in range(1, 6))))
+        self.assertEqual(controllers[0][1], (IPv4Address("192.168.1.1"), 10001))
+        self.assertIsNone(controllers[0][2])
+
+        page = self.client.list_clients_page(UUID(int=3), limit=3)
+        self.assertEqual(list((client[0] for client in page.clients)), [1, 2, 3])
+        clients = list(self.client.list_clients(UUID(int=3), page_size=3))
+        self.assertEqual(list((client[0] for client in clients)), [1, 2, 3, 4, 5])
+        self.assertEqual(clients[0][1], IPv4Address("10.0.0.2"))
+        self.assertEqual(list(self.client.list_clients(UUID(int=1))), [])
+
+        with self.assertRaises(RPLControllerNotRegistered):
+            list(self.client.list_clients(UUID(int=6)))
+
+    def test_register_clients(self):
+        self.client.register_controller(UUID(int=1), (IPv4Address("192.168.1.1"), 10001))
+        self.client.register_client(UUID(int=1), 1)
+        self.client.register_clients(UUID(int=1), (2, 3, 4))
+        clients = list(self.client.list_clients(UUID(int=1)))
+        self.assertEqual(list((client[0] for client in clients)), [1, 2, 3, 4])
+        self.assertEqual(
+            list((client[1] for client in clients)), list((IPv4Address("10.0.0.{:d}".format(i)) for i in range(2, 6)))
+        )
+
+        with self.assertRaises(RPLClientAlreadyRegistered):
+            self.client.register_clients(UUID(int=1), (5, 4))
+        self.assertFalse(self.client.is_client_registered(UUID(int=1), 5))
+
+    def test_links(self):
+        sectors = (UUID(int=1), UUID(int=2), UUID(int=3))
+        for (port, controller_id) in enumerate(sectors, 10001):
+            self.client.register_controller(controller_id, (IPv4Address("192.168.1.1"), port))
+        self.client.register_link(sectors[0], sectors[1], 1000, 2.5)
+        self.client.register_link(sectors[1], sectors[2], 100, 2.5)
+        path = self.client.query_path(sectors[0], sectors[2])
+        self.assertEqual((path.path, path.latency, path.capacity), (sectors, 5.0, 100))
+
+        self.client.remove_link(sectors[1], sectors[2])
+        with self.assertRaises(RPLNoResultsAvailable):
+            self.client.query_path(sectors[0], sectors[2])
+        with self.assertRaises(RPLLinkNotRegistered):
+            self.client.remove_link(sectors[1], sectors[2])
+        with self.assertRaises(RPLControllerNotRegistered):
+            self.client.register_link(sectors[0], UUID(int=4), 10, 1)
+        self.assertEqual(self.client.metrics()["topology"]["links"], 1)
+
+
+class SnapshotOperations(unittest.TestCase):
+    def setUp(self):
+        self.snapshots = tempfile.TemporaryDirectory()
+        self.central = openPuppetProcess("-sd", self.snapshots.name, "-sk", "1")
+        self.client = Client()
+
+    def tearDown(self):
+        self.client.close()
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+        self.snapshots.cleanup()
+
+    def test_snapshot(self):
+        self.client.register_controller(UUID(int=1), (IPv4Address("192.168.1.1"), 12345))
+        first = self.client.snapshot()
+        second = self.client.snapshot()
+        self.assertGreater(second.size, 0)
+        self.assertEqual(list((path.name for path in Path(self.snapshots.name).iterdir())), [second.name])
+        self.assertNotEqual(first.name, second.name)
+
+
+class CachedClientOperations(unittest.TestCase):
+    def setUp(self):
+        self.central = openPuppetProcess()
+        self.cache = LookupCache(max_entries=2)
+        self.client = Client(cache=self.cache)
+
+        self.uuid = UUID(int=1)
+        self.ipv4_info = (IPv4Address("192.168.1.1"), 12345)
+
+    def tearDown(self):
+        self.client.close()
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+
+    def test_cached_lookups(self):
+        self.client.register_controller(self.uuid, self.ipv4_info)
+        self.client.query_controller_info(self.uuid)
+        self.client.query_controller_info(self.uuid)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 1)
+
+        self.client.query_address_info(ipv4=self.ipv4_info[0])
+        with self.assertRaises(RPLNoResultsAvailable):
+            self.client.query_address_info(ipv4=IPv4Address("192.168.1.2"))
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_negative_lookups(self):
+        invalidated = []
+        self.cache.add_invalidation_hook(invalidated.append)
+
+        with self.assertRaises(RPLNoResultsAvailable):
+            self.client.query_address_info(ipv4=IPv4Address("10.0.0.2"))
+        with self.assertRaises(RPLNoResultsAvailable):
+            self.client.query_address_info(ipv4=IPv4Address("10.0.0.2"))
+        self.assertEqual(self.cache.negative_hits, 1)
+
+        self.client.register_controller(self.uuid, self.ipv4_info)
+        self.client.register_client(self.uuid, 2)
+        self.assertEqual(invalidated, [("address", IPv4Address("10.0.0.2"), None)])
+        self.assertEqual(self.client.query_address_info(ipv4=IPv4Address("10.0.0.2")).client_id, 2)
+
+        self.client.remove_client(self.uuid, 2)
+        with self.assertRaises(RPLNoResultsAvailable):
+            self.client.query_address_info(ipv4=IPv4Address("10.0.0.2"))
+
+    def test_coalesced_lookups(self):
+        async def concurrent_lookups():
+            cache = LookupCache()
+            client = AsyncClient(cache=cache)
+            try:
+                await client.register_controller(self.uuid, self.ipv4_info)
+                await asyncio.gather(*(client.query_controller_info(self.uuid) for _ in range(10)))
+                return cache.stats()
+            finally:
+                client.close()
+
+        stats = asyncio.new_event_loop().run_until_complete(concurrent_lookups())
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["coalesced"], 9)
+
+
+class ThrottledClientOperations(unittest.TestCase):
+    def setUp(self):
+        self.central = openPuppetProcess("-rl", "5", "-rb", "2")
+        self.client = Client()
+
+    def tearDown(self):
+        self.client.close()
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+
+    def test_rate_limit(self):
+        self.client.local_time()
+        self.client.local_time()
+        with self.assertRaises(RPLThrottled) as context:
+            self.client.local_time()
+        self.assertGreater(context.exception.retry_after_ms, 0)
+        self.assertLessEqual(context.exception.retry_after_ms, 200)
+
+        time.sleep(context.exception.retry_after_ms / 1000)
+        self.assertEqual(self.client.metrics()["queues"]["throttled"], 1)
+
+
+class SheddingClientOperations(unittest.TestCase):
+    def setUp(self):
+        self.central = openPuppetProcess("-sp", "1")
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+
+    def test_reads_are_shed(self):
+        async def flood():
+            client = AsyncClient(connections=2)
+            try:
+                await client.local_time()
+                replies = await asyncio.gather(
+                    *(client.request(REQLocalTime()) for _ in range(50)),
+                    client.register_controller(UUID(int=1), (IPv4Address("192.168.1.1"), 10001)),
+                )
+                return (replies, await client.metrics())
+            finally:
+                client.close()
+
+        (replies, metrics) = self.loop.run_until_complete(flood())
+        busy = list((reply for reply in replies[:-1] if isinstance(reply, RPLBusy)))
+        self.assertGreater(len(busy), 0)
+        self.assertTrue(all((reply.retry_after_ms > 0 for reply in busy)))
+        self.assertEqual(metrics["queues"]["shedding"]["shed"]["REQLocalTime"], len(busy))
+
+
+class HeartbeatClientOperations(unittest.TestCase):
+    def setUp(self):
+        self.central = openPuppetProcess("-ht", "0.5")
+        self.client = Client()
+
+    def tearDown(self):
+        self.client.close()
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+
+    def test_dead_controllers_are_reaped(self):
+        (alive, dead, silent) = (UUID(int=1), UUID(int=2), UUID(int=3))
+        for (port, controller_id) in enumerate((alive, dead, silent), 10001):
+            self.client.register_controller(controller_id, (IPv4Address("192.168.1.1"), port))
+        self.client.register_clients(dead, tuple(range(1, 101)))
+        self.client.heartbeat(alive)
+        self.client.heartbeat(dead)
+        self.assertEqual(self.client.metrics()["liveness"]["tracked"], 2)
+
+        for _ in range(8):
+            time.sleep(0.2)
+            self.client.heartbeat(alive)
+
+        self.assertTrue(self.client.is_controller_registered(alive))
+        self.assertFalse(self.client.is_controller_registered(dead))
+        # Controllers which never sent heartbeats are not reaped.
+        self.assertTrue(self.client.is_controller_registered(silent))
+        liveness = self.client.metrics()["liveness"]
+        self.assertEqual((liveness["tracked"], liveness["reaped"], liveness["released"]), (1, 1, 100))
+
+
+class AsyncClientOperations(unittest.TestCase):
+    def setUp(self):
+        self.central = openPuppetProcess()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.central.send_signal(signal.SIGINT)
+        self.central.wait()
+        database_location.unlink()
+
+    def test_pipelined_requests(self):
+        async def pipelined():
+            client = AsyncClient(connections=2)
+            try:
+                await asyncio.gather(*(
+                    client.register_controller(UUID(int=i), (IPv4Address("192.168.1.1"), 10000 + i))
+                    for i in range(1, 21)
+                ))
+                return await asyncio.gather(*(
+                    client.query_controller_info(UUID(int=i)) for i in range(1, 21)
+                ))
+            finally:
+                client.close()
+
+        infos = self.loop.run_until_complete(pipelined())
+        self.assertEqual(list((info.ipv4_port for info in infos)), list(range(10001, 10021)))
+
+
+class UnansweredClientOperations(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_request_deadline(self):
+        async def unanswered():
+            client = AsyncClient(location="tcp://127.0.0.1:12346", timeout=0.1, retries=1)
+            try:
+                await client.local_time()
+            finally:
+                client.close()
+
+        with self.assertRaises(RequestTimeout):
+            self.loop.run_until_complete(unanswered())
+
+    def test_mutations_are_not_retried_by_default(self):
+        async def unanswered(retry_mutations):
+            client = AsyncClient(
+                location="tcp://127.0.0.1:12346", timeout=0.1, retries=2, retry_mutations=retry_mutations
+            )
+            try:
+                await client.register_controller(UUID(int=1), (IPv4Address("192.168.1.1"), 10000))
+            finally:
+                client.close()
+
+        for (retry_mutations, attempts) in ((False, 1), (True, 3)):
+            with self.assertLogs(level=logging.WARNING) as logs:
+                with self.assertRaises(RequestTimeout):
+                    self.loop.run_until_complete(unanswered(retry_mutations))
+            self.assertEqual(len(logs.records), attempts)
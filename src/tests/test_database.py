@@ -4,12 +4,19 @@ import sys
 import asyncio
 import time
 import uuid
+import sqlite3
+import tempfile
+import random
 from pathlib import Path
+from unittest import mock
 from ipaddress import IPv4Network, IPv6Network, IPv4Address, IPv6Address
 from netaddr import EUI, mac_eui48
+import networkx
 
 from archsdn_central.helpers import custom_logging_callback
 from archsdn_central import database
+from archsdn_central.database.internals import addresses
+from archsdn_central.database.lanes import LaneScheduler
 
 mac_eui48.word_sep = ":"
 database_location = Path("/tmp/test_database.sqlite3")
@@ -240,7 +247,7 @@ class ClientsTests(unittest.TestCase):
     def setUp(self):
         self.controller_uuid = uuid.UUID(int=1)
         self.client_id = 100
-        fut = database.initialise(location=database_location, ipv4_network=IPv4Network("10.0.0.0"))
+        fut = database.initialise(location=database_location, ipv4_network=IPv4Network("10.0.0.0/8"))
         loop.run_until_complete(fut)
         fut = database.register_controller(
             uuid.UUID(int=1),
@@ -293,6 +300,18 @@ class ClientsTests(unittest.TestCase):
             loop.run_until_complete(fut)
             fut.result()
 
+    def test_release_clients_in_chunks(self):
+        loop.run_until_complete(database.register_clients(tuple(range(1, 26)), self.controller_uuid))
+        released = list((loop.run_until_complete(database.release_clients(self.controller_uuid, 10)) for _ in range(4)))
+        self.assertEqual(released, [10, 10, 5, 0])
+        self.assertFalse(loop.run_until_complete(database.is_client_registered(1, self.controller_uuid)))
+        # The released addresses are allocated again.
+        loop.run_until_complete(database.register_client(self.client_id, self.controller_uuid))
+        info = loop.run_until_complete(database.query_client_info(self.client_id, self.controller_uuid))
+        self.assertEqual(info['ipv4'], IPv4Address("10.0.0.2"))
+        with self.assertRaises(database.ControllerNotRegistered):
+            loop.run_until_complete(database.release_clients(uuid.UUID(int=2), 10))
+
     def test_remove_controller_and_associated_clients(self):
         fut = database.remove_controller(self.controller_uuid)
         loop.run_until_complete(fut)
@@ -335,12 +354,360 @@ class ClientsTests(unittest.TestCase):
             fut.result()
 
 
+class ListingTests(unittest.TestCase):
+    def setUp(self):
+        fut = database.initialise(location=database_location)
+        loop.run_until_complete(fut)
+        for i in range(1, 6):
+            fut = database.register_controller(uuid.UUID(int=i), ipv6_info=(IPv6Address(i), 12345))
+            loop.run_until_complete(fut)
+        for client_id in range(1, 4):
+            fut = database.register_client(client_id, uuid.UUID(int=2))
+            loop.run_until_complete(fut)
+
+    def tearDown(self):
+        fut = database.close()
+        loop.run_until_complete(fut)
+        database_location.unlink()
+
+    def test_list_controllers(self):
+        controllers = []
+        cursor = 0
+        while cursor is not None:
+            page = loop.run_until_complete(database.list_controllers(cursor, 2))
+            self.assertLessEqual(len(page["controllers"]), 2)
+            controllers.extend(page["controllers"])
+            cursor = page["cursor"]
+        self.assertEqual(
+            list((controller[0] for controller in controllers)), list((uuid.UUID(int=i) for i in range(1, 6)))
+        )
+        self.assertIsNone(controllers[0][1])
+        self.assertEqual(controllers[0][2], (IPv6Address(1), 12345))
+        self.assertIsInstance(controllers[0][4], time.struct_time)
+
+    def test_list_clients(self):
+        page = loop.run_until_complete(database.list_clients(uuid.UUID(int=2), 0, 2))
+        self.assertEqual(list((client[0] for client in page["clients"])), [1, 2])
+        page = loop.run_until_complete(database.list_clients(uuid.UUID(int=2), page["cursor"], 2))
+        self.assertEqual(list((client[0] for client in page["clients"])), [3])
+        self.assertIsNone(page["cursor"])
+
+        with self.assertRaises(database.ControllerNotRegistered):
+            loop.run_until_complete(database.list_clients(uuid.UUID(int=6)))
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.snapshots = tempfile.TemporaryDirectory()
+        fut = database.initialise(location=database_location)
+        loop.run_until_complete(fut)
+        fut = database.register_controller(uuid.UUID(int=1), ipv6_info=(IPv6Address(1), 12345))
+        loop.run_until_complete(fut)
+
+    def tearDown(self):
+        fut = database.close()
+        loop.run_until_complete(fut)
+        database_location.unlink()
+        self.snapshots.cleanup()
+
+    def test_not_configured(self):
+        with self.assertRaises(database.SnapshotsNotConfigured):
+            loop.run_until_complete(database.snapshot())
+
+    def test_cancelled_snapshot(self):
+        # A coroutine operation cancelled in the database thread (e.g. when its loop stops) is not left pending.
+        async def cancelled_snapshot():
+            raise asyncio.CancelledError()
+
+        callbacks = type(database).__getattr__.__globals__["_callbacks"]
+        with mock.patch.dict(callbacks, {"snapshot": cancelled_snapshot}):
+            with self.assertRaises(asyncio.CancelledError):
+                loop.run_until_complete(asyncio.wait_for(database.snapshot(), 5))
+
+    def test_snapshot_rotation(self):
+        directory = Path(self.snapshots.name)
+        loop.run_until_complete(database.configure_snapshots(directory, 2))
+        names = list((loop.run_until_complete(database.snapshot())["name"] for _ in range(3)))
+
+        self.assertEqual(sorted((path.name for path in directory.iterdir())), names[1:])
+        with sqlite3.connect(str(directory / names[-1])) as snapshot_connector:
+            self.assertEqual(snapshot_connector.execute("SELECT count(*) FROM controllers").fetchone()[0], 1)
+
+
+class WarmUpTests(unittest.TestCase):
+    def setUp(self):
+        fut = database.initialise(location=database_location)
+        loop.run_until_complete(fut)
+        fut = database.register_controller(uuid.UUID(int=1), ipv6_info=(IPv6Address(1), 12345))
+        loop.run_until_complete(fut)
+        loop.run_until_complete(database.close())
+
+    def tearDown(self):
+        fut = database.close()
+        loop.run_until_complete(fut)
+        database_location.unlink()
+
+    def test_warm_up_existing_database(self):
+        loop.run_until_complete(database.initialise(location=database_location))
+        loop.run_until_complete(database.warm_up(quick_check=True))
+
+        self.assertTrue(loop.run_until_complete(database.is_controller_registered(uuid.UUID(int=1))))
+        self.assertFalse(loop.run_until_complete(database.is_controller_registered(uuid.UUID(int=2))))
+        with self.assertRaises(database.ControllerAlreadyRegistered):
+            loop.run_until_complete(database.register_controller(uuid.UUID(int=1), ipv6_info=(IPv6Address(2), 1)))
+        loop.run_until_complete(database.register_client(2, uuid.UUID(int=1)))
+        self.assertTrue(loop.run_until_complete(database.is_client_registered(2, uuid.UUID(int=1))))
+
+        loop.run_until_complete(database.remove_controller(uuid.UUID(int=1)))
+        self.assertFalse(loop.run_until_complete(database.is_controller_registered(uuid.UUID(int=1))))
+        with self.assertRaises(database.ControllerNotRegistered):
+            loop.run_until_complete(database.register_client(3, uuid.UUID(int=1)))
+
+
+class MigrationTests(unittest.TestCase):
+    def setUp(self):
+        self.migrations = tempfile.TemporaryDirectory()
+        fut = database.initialise(location=database_location)
+        loop.run_until_complete(fut)
+
+    def tearDown(self):
+        fut = database.close()
+        loop.run_until_complete(fut)
+        database_location.unlink()
+        self.migrations.cleanup()
+
+    def write_migration(self, name, script):
+        with open(str(Path(self.migrations.name) / name), "w") as fp:
+            fp.write(script)
+
+    def schema(self):
+        with sqlite3.connect(str(database_location)) as connector:
+            return (
+                connector.execute("SELECT max(version) FROM schema_version").fetchone()[0],
+                set((row[0] for row in connector.execute("SELECT name FROM sqlite_master WHERE type == 'index'"))),
+            )
+
+    def test_bundled_migrations(self):
+        (version, indexes) = self.schema()
+        self.assertGreaterEqual(version, 2)
+        self.assertIn("clients_controller", indexes)
+
+        report = loop.run_until_complete(database.migrate())
+        self.assertEqual(report["migrations"], [])
+
+    def test_dry_run_and_chunks(self):
+        directory = Path(self.migrations.name)
+        version = self.schema()[0]
+        loop.run_until_complete(database.register_controller(uuid.UUID(int=1), ipv6_info=(IPv6Address(1), 12345)))
+        for client_id in range(1, 6):
+            loop.run_until_complete(database.register_client(client_id, uuid.UUID(int=1)))
+        self.write_migration(
+            "{:04d}_client_names.sql".format(version + 1),
+            "ALTER TABLE clients ADD COLUMN hostname TEXT;\n"
+            "-- chunk: clients 2\n"
+            "UPDATE clients SET hostname = 'client-' || id\n"
+            "  WHERE rowid BETWEEN :first AND :last;\n"
+        )
+
+        report = loop.run_until_complete(database.migrate(dry_run=True, directory=directory))
+        self.assertEqual(report["version"], version)
+        self.assertEqual(report["target"], version + 1)
+        self.assertEqual(report["migrations"][0]["statements"], 2)
+        self.assertEqual(report["migrations"][0]["rows"], 10)
+        self.assertEqual(self.schema()[0], version)
+
+        loop.run_until_complete(database.migrate(directory=directory))
+        self.assertEqual(self.schema()[0], version + 1)
+        with sqlite3.connect(str(database_location)) as connector:
+            self.assertEqual(
+                connector.execute("SELECT count(*) FROM clients WHERE hostname IS NOT NULL").fetchone()[0], 5
+            )
+
+    def test_compact_clients_migration(self):
+        loop.run_until_complete(database.close())
+        database_location.unlink()
+        loop.run_until_complete(database.initialise(location=database_location, migrate=False))
+        controller = uuid.UUID(int=1)
+        loop.run_until_complete(database.register_controller(controller, ipv6_info=(IPv6Address(1), 12345)))
+        loop.run_until_complete(database.close())
+
+        with sqlite3.connect(str(database_location)) as connector:
+            for client_id in (2, 3):
+                connector.execute("INSERT INTO clients_ipv4s(id, address) VALUES (?,?)",
+                                  (client_id, int(IPv4Address("10.0.0.0")) + client_id))
+                connector.execute("INSERT INTO clients_ipv6s(id, address) VALUES (?,?)",
+                                  (client_id, (IPv6Network("fd61:7263:6873:646e::0/64")[client_id]).packed))
+                name_id = connector.execute("INSERT INTO names(name) VALUES (?)", (
+                    "{:d}.{:s}.archsdn".format(client_id, str(controller)),
+                )).lastrowid
+                connector.execute("INSERT INTO clients(id, controller, ipv4, ipv6, name) VALUES (?,1,?,?,?)",
+                                  (client_id, client_id, client_id, name_id))
+
+        loop.run_until_complete(database.initialise(location=database_location))
+        info = loop.run_until_complete(database.query_client_info(3, controller))
+        self.assertEqual(info["ipv4"], IPv4Address("10.0.0.3"))
+        self.assertEqual(info["name"], "3.{:s}.archsdn".format(str(controller)))
+        info = loop.run_until_complete(database.query_address_info(ipv4=IPv4Address("10.0.0.2")))
+        self.assertEqual((info["client_id"], info["controller_id"]), (2, controller))
+        with sqlite3.connect(str(database_location)) as connector:
+            self.assertEqual(connector.execute("SELECT count(*) FROM names").fetchone()[0], 1)
+            self.assertEqual(
+                connector.execute("SELECT name FROM clients_view WHERE id == 2").fetchone()[0],
+                "2.{:s}.archsdn".format(str(controller))
+            )
+
+    def test_failed_migration_rollback(self):
+        directory = Path(self.migrations.name)
+        version = self.schema()[0]
+        self.write_migration("{:04d}_first.sql".format(version + 1), "CREATE TABLE first (id INTEGER);\n")
+        self.write_migration("{:04d}_second.sql".format(version + 2), "INSERT INTO missing VALUES (1);\n")
+
+        with self.assertRaises(Exception):
+            loop.run_until_complete(database.migrate(directory=directory))
+        with sqlite3.connect(str(database_location)) as connector:
+            self.assertEqual(connector.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type == 'table' AND name == 'first'"
+            ).fetchone()[0], 0)
+        self.assertEqual(self.schema()[0], version)
+
+
+class AddressEngineTests(unittest.TestCase):
+    def tearDown(self):
+        addresses.use_numpy(True)
+
+    def check_engine(self):
+        ids = [1, 2, 3, 7, 8, 10]
+        self.assertEqual(list((tuple(r) for r in addresses.free_ranges(ids, 1, 12))), [(4, 6), (9, 9), (11, 12)])
+        self.assertEqual(list(addresses.next_free(ids, 3, 1, 12)), [11, 12, 4])
+        self.assertEqual(list(addresses.next_free(ids, 4, 1, 12, after=0)), [4, 5, 6, 9])
+        self.assertEqual(list(addresses.next_free([], 2, 1, 12)), [1, 2])
+        with self.assertRaises(database.AddressPoolExhausted):
+            addresses.next_free(ids, 7, 1, 12)
+        self.assertEqual(list(addresses.collisions(ids, [2, 4, 10, 11])), [2, 10])
+
+        network = IPv6Network("fd61:7263:6873:646e::0/64")
+        self.assertEqual(addresses.ipv4_addresses(IPv4Network("10.0.0.0/8"), [1, 256]), [
+            int(IPv4Address("10.0.0.1")), int(IPv4Address("10.0.1.0"))
+        ])
+        self.assertEqual(addresses.ipv6_addresses(network, [1, 0xFFFFFFFF]), [
+            network[1].packed, network[0xFFFFFFFF].packed
+        ])
+        # The sum carries from the low to the high 64 bits.
+        self.assertEqual(addresses.ipv6_addresses(IPv6Network("::ffff:ffff:ffff:ffff:0/112"), [0x10000]), [
+            IPv6Address(0x10000 << 64).packed
+        ])
+        self.assertEqual(addresses.pool_limits(IPv4Network("10.0.0.0/24")), (1, 254))
+
+    @unittest.skipIf(addresses.backend() is None, "NumPy is not installed")
+    def test_numpy(self):
+        self.check_engine()
+
+    def test_python(self):
+        addresses.use_numpy(False)
+        self.check_engine()
+
+    def test_register_many(self):
+        controller = uuid.UUID(int=1)
+        loop.run_until_complete(database.initialise(location=database_location, ipv4_network=IPv4Network("10.0.0.0/28")))
+        try:
+            loop.run_until_complete(database.register_controller(controller, ipv6_info=(IPv6Address(1), 12345)))
+            # 10.0.0.1 is the service address, so the clients get the addresses from 10.0.0.2.
+            loop.run_until_complete(database.register_clients(list(range(1, 13)), controller))
+            loop.run_until_complete(database.remove_client(3, controller))
+            with self.assertRaises(database.ClientAlreadyRegistered):
+                loop.run_until_complete(database.register_clients([13, 12], controller))
+
+            # The pool ends at 10.0.0.14: the next ids wrap around to the one freed by the client 3.
+            loop.run_until_complete(database.register_clients([13, 14], controller))
+            ipv4s = list((
+                loop.run_until_complete(database.query_client_info(client_id, controller))["ipv4"]
+                for client_id in (12, 13, 14)
+            ))
+            self.assertEqual(ipv4s, [IPv4Address("10.0.0.13"), IPv4Address("10.0.0.14"), IPv4Address("10.0.0.4")])
+            with self.assertRaises(database.AddressPoolExhausted):
+                loop.run_until_complete(database.register_client(15, controller))
+        finally:
+            loop.run_until_complete(database.close())
+            database_location.unlink()
+
+
+class LaneSchedulerTests(unittest.TestCase):
+    def test_priorities(self):
+        scheduler = LaneScheduler()
+        scheduler.put("bulk", "remove_all_clients")
+        scheduler.put("write", "register_client")
+        scheduler.put("read", "is_controller_registered")
+        scheduler.put("read", "query_address_info")
+        self.assertEqual(len(scheduler), 4)
+        order = list((scheduler.get() for _ in range(4)))
+        self.assertEqual(
+            list((item for (_, _, item) in order)),
+            ["is_controller_registered", "query_address_info", "register_client", "remove_all_clients"]
+        )
+        self.assertEqual(list((lane for (lane, _, _) in order)), ["read", "read", "write", "bulk"])
+        self.assertIsNone(scheduler.get())
+
+    def test_starvation_protection(self):
+        scheduler = LaneScheduler({"write": 0.05, "bulk": 0.02})
+        scheduler.put("bulk", "remove_all_clients")
+        scheduler.put("write", "register_client")
+        time.sleep(0.06)
+        scheduler.put("read", "is_controller_registered")
+        # Both lower lanes are overdue: the oldest operation goes first.
+        (lane, waited, item) = scheduler.get()
+        self.assertEqual((lane, item), ("bulk", "remove_all_clients"))
+        self.assertGreater(waited, 0.05)
+        self.assertEqual(scheduler.get()[2], "register_client")
+        self.assertEqual(scheduler.get()[2], "is_controller_registered")
+        self.assertEqual(scheduler.metrics()["bulk"]["promoted"], 1)
+        self.assertEqual(scheduler.metrics()["read"]["promoted"], 0)
+
+    def test_metrics(self):
+        scheduler = LaneScheduler()
+        scheduler.record("read", 0.001, 0.002)
+        scheduler.record("read", 0.003, 0.004)
+        metrics = scheduler.metrics()["read"]
+        self.assertEqual(metrics["operations"], 2)
+        self.assertAlmostEqual(metrics["wait_mean"], 2)
+        self.assertAlmostEqual(metrics["run_max"], 4)
+        self.assertEqual(metrics["counts"][metrics["bounds"].index(5)], 1)
+        self.assertEqual(metrics["counts"][metrics["bounds"].index(10)], 1)
+
+    def test_latency(self):
+        scheduler = LaneScheduler()
+        self.assertEqual(scheduler.latency(), 0)
+        scheduler.record("read", 0.0, 1.0)
+        self.assertAlmostEqual(scheduler.latency(), 0.1)
+        # The wait of the oldest queued operation counts, while it is larger than the moving average.
+        scheduler.put("bulk", "remove_all_clients")
+        time.sleep(0.15)
+        self.assertGreater(scheduler.latency(), 0.15)
+        scheduler.get()
+        self.assertAlmostEqual(scheduler.latency(), 0.1)
+        self.assertEqual(scheduler.metrics()["bulk"]["operations"], 0)
+
+    def test_database_lanes(self):
+        before = loop.run_until_complete(database.lanes_metrics())
+        loop.run_until_complete(database.initialise(location=database_location))
+        try:
+            futures = list((database.is_controller_registered(uuid.UUID(int=1)) for _ in range(10)))
+            futures.append(database.remove_all_clients(uuid.UUID(int=1)))
+            loop.run_until_complete(asyncio.gather(*futures, return_exceptions=True))
+            after = loop.run_until_complete(database.lanes_metrics())
+        finally:
+            loop.run_until_complete(database.close())
+            database_location.unlink()
+        self.assertEqual(after["read"]["operations"] - before["read"]["operations"], 10)
+        self.assertEqual(after["bulk"]["operations"] - before["bulk"]["operations"], 2)
+        self.assertEqual(after["read"]["queued"], 0)
+
+
 class DualControllersClientsTests(unittest.TestCase):
     def setUp(self):
         self.controller_uuid_1 = uuid.UUID(int=1)
         self.controller_uuid_2 = uuid.UUID(int=2)
         self.client_id = 100
-        fut = database.initialise(location=database_location, ipv4_network=IPv4Network("10.0.0.0"))
+        fut = database.initialise(location=database_location, ipv4_network=IPv4Network("10.0.0.0/8"))
         loop.run_until_complete(fut)
         fut = database.register_controller(
             self.controller_uuid_1,
@@ -365,3 +732,87 @@ class DualControllersClientsTests(unittest.TestCase):
         loop.run_until_complete(fut)
         fut = database.register_client(self.client_id, self.controller_uuid_2)
         loop.run_until_complete(fut)
+
+
+class TopologyTests(unittest.TestCase):
+    def setUp(self):
+        loop.run_until_complete(database.initialise(location=database_location))
+        self.controllers = list((uuid.UUID(int=i) for i in range(1, 31)))
+        for (port, controller_uuid) in enumerate(self.controllers, 10000):
+            loop.run_until_complete(
+                database.register_controller(controller_uuid, ipv4_info=(IPv4Address("192.168.1.1"), port))
+            )
+
+    def tearDown(self):
+        loop.run_until_complete(database.close())
+        database_location.unlink()
+
+    def test_paths(self):
+        (a, b, c, d) = self.controllers[:4]
+        loop.run_until_complete(database.register_link(a, b, 1000, 5))
+        loop.run_until_complete(database.register_link(b, c, 100, 5))
+        loop.run_until_complete(database.register_link(a, c, 10000, 20))
+        path = loop.run_until_complete(database.query_path(a, c))
+        self.assertEqual(path, {"path": (a, b, c), "latency": 10, "capacity": 100})
+        self.assertEqual(loop.run_until_complete(database.query_path(c, c))["path"], (c,))
+
+        # A new link shortening the paths repairs the tree, and a slower link not used by it keeps it.
+        loop.run_until_complete(database.register_link(c, d, 10, 1))
+        loop.run_until_complete(database.query_path(a, d))
+        loop.run_until_complete(database.register_link(a, c, 10000, 30))
+        loop.run_until_complete(database.query_path(a, c))
+        self.assertEqual(loop.run_until_complete(database.topology_metrics()), {
+            "sectors": 4, "links": 4, "trees": 1, "hits": 2, "misses": 1, "repaired": 1
+        })
+
+        loop.run_until_complete(database.remove_link(b, c))
+        path = loop.run_until_complete(database.query_path(a, d))
+        self.assertEqual(path, {"path": (a, c, d), "latency": 31, "capacity": 10})
+
+        loop.run_until_complete(database.remove_controller(c))
+        with self.assertRaises(database.NoResultsAvailable):
+            loop.run_until_complete(database.query_path(a, d))
+        with self.assertRaises(database.ControllerNotRegistered):
+            loop.run_until_complete(database.query_path(a, c))
+        with self.assertRaises(database.ControllerNotRegistered):
+            loop.run_until_complete(database.register_link(a, uuid.UUID(int=100), 10, 1))
+        with self.assertRaises(database.LinkNotRegistered):
+            loop.run_until_complete(database.remove_link(a, d))
+
+    def test_incremental_repairs(self):
+        # The cached paths follow a random sequence of link and controller changes, as if computed again for each query.
+        rng = random.Random(1)
+        sources = self.controllers[:5]
+        controllers = list(self.controllers)
+        reference = networkx.Graph()
+        reference.add_nodes_from(controllers)
+        for _ in range(300):
+            (a, b) = rng.sample(controllers, 2)
+            if rng.random() < 0.02 and b not in sources:
+                controllers.remove(b)
+                reference.remove_node(b)
+                loop.run_until_complete(database.remove_controller(b))
+            elif reference.has_edge(a, b) and rng.random() < 0.4:
+                reference.remove_edge(a, b)
+                loop.run_until_complete(database.remove_link(a, b))
+            else:
+                latency = rng.randint(0, 20)
+                reference.add_edge(a, b, latency=latency)
+                loop.run_until_complete(database.register_link(a, b, 100, latency))
+
+            for source in sources:
+                for destination in rng.sample(controllers, 5):
+                    try:
+                        latency = networkx.dijkstra_path_length(reference, source, destination, weight="latency")
+                    except networkx.NetworkXNoPath:
+                        with self.assertRaises(database.NoResultsAvailable):
+                            loop.run_until_complete(database.query_path(source, destination))
+                        continue
+                    path = loop.run_until_complete(database.query_path(source, destination))
+                    self.assertEqual(path["latency"], latency)
+                    self.assertEqual(
+                        sum((reference[x][y]["latency"] for (x, y) in zip(path["path"], path["path"][1:]))), latency
+                    )
+        metrics = loop.run_until_complete(database.topology_metrics())
+        self.assertEqual(metrics["misses"], len(sources))
+        self.assertGreater(metrics["repaired"], 0)
@@ -0,0 +1,69 @@
+import unittest
+import time
+import asyncio
+from pathlib import Path
+
+from archsdn_central import deadlines
+from archsdn_central import database
+from archsdn_central import zmq_requests
+from archsdn_central.zmq_messages import dumps, loads, REQCentralNetworkPolicies, RPLCentralNetworkPolicies, \
+    RPLDeadlineExpired
+from archsdn_central.database.internals.exceptions import DeadlineExpired
+
+import blosc
+
+database_location = Path("/tmp/test_deadlines.sqlite3")
+
+
+class DeadlinesTests(unittest.TestCase):
+    def tearDown(self):
+        deadlines.set_current(None, None)
+
+    def test_deadline_from_header(self):
+        self.assertIsNone(deadlines.deadline_from({}))
+        self.assertIsNone(deadlines.deadline_from({"timeout_ms": None}))
+        self.assertEqual(deadlines.deadline_from({"timeout_ms": 1500}, received=10.0), 11.5)
+
+    def test_expiry_is_counted_per_type_and_stage(self):
+        before = deadlines.metrics().get("REQTest", {})
+        self.assertFalse(deadlines.expired(None, "REQTest", "queue"))
+        self.assertFalse(deadlines.expired(time.monotonic() + 60, "REQTest", "queue"))
+        self.assertTrue(deadlines.expired(time.monotonic() - 1, "REQTest", "queue"))
+        self.assertEqual(deadlines.metrics()["REQTest"].get("queue", 0), before.get("queue", 0) + 1)
+
+    def test_check_uses_the_current_context(self):
+        deadlines.check("submit")
+        deadlines.set_current(time.monotonic() + 60, "REQTest")
+        deadlines.check("submit")
+        self.assertEqual(deadlines.current_request_type(), "REQTest")
+
+        deadlines.set_current(time.monotonic() - 1, "REQTest")
+        with self.assertRaises(DeadlineExpired):
+            deadlines.check("submit")
+        self.assertGreaterEqual(deadlines.metrics()["REQTest"]["submit"], 1)
+
+
+class ExpiredRepliesTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(database.initialise(location=database_location))
+        zmq_requests.reply_cache_enable(10)
+
+    def tearDown(self):
+        deadlines.set_current(None, None)
+        self.loop.run_until_complete(database.close())
+        self.loop.close()
+        database_location.unlink()
+
+    def test_expired_replies_are_not_cached(self):
+        # An expired request is replied with RPLDeadlineExpired, which must not be replied to the following identical
+        #   requests from the reply cache.
+        frame = blosc.compress(dumps(REQCentralNetworkPolicies()))
+        deadlines.set_current(time.monotonic() - 1, "REQCentralNetworkPolicies")
+        reply = loads(blosc.decompress(self.loop.run_until_complete(zmq_requests.process_frame(frame))))
+        self.assertIsInstance(reply, RPLDeadlineExpired)
+
+        deadlines.set_current(None, None)
+        reply = loads(blosc.decompress(self.loop.run_until_complete(zmq_requests.process_frame(frame))))
+        self.assertIsInstance(reply, RPLCentralNetworkPolicies)
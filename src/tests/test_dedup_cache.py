@@ -0,0 +1,37 @@
+import unittest
+import time
+import asyncio
+
+from archsdn_central.dedup_cache import DeduplicationCache
+
+
+class DeduplicationCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_replies_are_shared(self):
+        cache = DeduplicationCache()
+        self.assertIsNone(cache.get(("peer", 1)))
+        future = cache.put(("peer", 1))
+        self.assertIs(cache.get(("peer", 1)), future)
+        future.set_result(b"reply")
+        self.assertEqual(cache.get(("peer", 1)).result(), b"reply")
+        self.assertIsNone(cache.get(("other peer", 1)))
+        self.assertEqual(cache.metrics(), {"entries": 1, "hits": 2, "misses": 1})
+
+        cache.discard(("peer", 1))
+        self.assertIsNone(cache.get(("peer", 1)))
+
+    def test_bounds(self):
+        cache = DeduplicationCache(max_entries=2, window=0.05)
+        for request_id in range(3):
+            cache.put(("peer", request_id))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(("peer", 0)))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get(("peer", 2)))
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,178 @@
+import unittest
+import struct
+import asyncio
+import uuid
+from pathlib import Path
+from ipaddress import IPv4Address, IPv6Address
+
+from archsdn_central import database
+from archsdn_central import dns_responder
+
+database_location = Path("/tmp/test_dns_responder.sqlite3")
+
+A = 1
+PTR = 12
+AAAA = 28
+MX = 15
+
+
+def encoded_name(name):
+    return b"".join((bytes((len(label),)) + label.encode("ascii") for label in name.split("."))) + b"\x00"
+
+
+def query(name, qtype, query_id=0x1234, flags=0x0100):
+    return struct.pack("!HHHHHH", query_id, flags, 1, 0, 0, 0) + encoded_name(name) + struct.pack("!HH", qtype, 1)
+
+
+def response_code(reply):
+    return struct.unpack_from("!HH", reply)[1] & 0xF
+
+
+def parse_reply(reply, question_size):
+    (query_id, flags, questions, answers, _, _) = struct.unpack_from("!HHHHHH", reply)
+    records = []
+    offset = 12 + question_size
+    for _ in range(answers):
+        (pointer, rtype, _, ttl, size) = struct.unpack_from("!HHHIH", reply, offset)
+        offset += 12
+        records.append((rtype, ttl, reply[offset:offset + size]))
+        offset += size
+    return (query_id, flags & 0xF, bool(flags & 0x0400), records)
+
+
+class DNSResponderTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        loop = self.loop
+        loop.run_until_complete(database.initialise(location=database_location))
+        self.controller_uuid = uuid.UUID(int=1)
+        loop.run_until_complete(database.register_controller(
+            self.controller_uuid, ipv4_info=(IPv4Address("192.168.1.1"), 12345)
+        ))
+        loop.run_until_complete(database.register_client(1, self.controller_uuid))
+        loop.run_until_complete(database.index_names())
+
+    def tearDown(self):
+        self.loop.run_until_complete(database.close())
+        self.loop.close()
+        database_location.unlink()
+
+    def resolve(self, name, qtype):
+        request = query(name, qtype)
+        return parse_reply(dns_responder.answer(request), len(request) - 12)
+
+    def test_forward(self):
+        (query_id, rcode, authoritative, records) = self.resolve(
+            "{:s}.controller.archsdn".format(str(self.controller_uuid)), A
+        )
+        self.assertEqual((query_id, rcode, authoritative), (0x1234, 0, True))
+        self.assertEqual(records, [(A, 60, IPv4Address("192.168.1.1").packed)])
+
+        # Registered without an IPv6 address.
+        (_, rcode, _, records) = self.resolve("{:s}.controller.archsdn".format(str(self.controller_uuid)), AAAA)
+        self.assertEqual((rcode, records), (0, []))
+
+        name = "1.{:s}.archsdn".format(str(self.controller_uuid))
+        (_, rcode, _, records) = self.resolve(name, A)
+        self.assertEqual(records, [(A, 60, IPv4Address("10.0.0.2").packed)])
+        (_, rcode, _, records) = self.resolve(name.upper(), AAAA)
+        self.assertEqual(records, [(AAAA, 60, IPv6Address("fd61:7263:6873:646e::2").packed)])
+        (_, rcode, _, records) = self.resolve(name, MX)
+        self.assertEqual((rcode, records), (0, []))
+
+    def test_reverse(self):
+        (_, rcode, _, records) = self.resolve("2.0.0.10.in-addr.arpa", PTR)
+        self.assertEqual(rcode, 0)
+        self.assertEqual(records[0][2], encoded_name("1.{:s}.archsdn".format(str(self.controller_uuid))))
+
+        reverse = ".".join(reversed(IPv6Address("fd61:7263:6873:646e::2").exploded.replace(":", ""))) + ".ip6.arpa"
+        (_, rcode, _, records) = self.resolve(reverse, PTR)
+        self.assertEqual(records[0][2], encoded_name("1.{:s}.archsdn".format(str(self.controller_uuid))))
+
+        (_, rcode, _, records) = self.resolve("1.1.168.192.in-addr.arpa", PTR)
+        self.assertEqual(
+            records[0][2], encoded_name("{:s}.controller.archsdn".format(str(self.controller_uuid)))
+        )
+
+        (_, rcode, _, records) = self.resolve("3.0.0.10.in-addr.arpa", PTR)
+        self.assertEqual((rcode, records), (3, []))
+
+    def test_index_follows_registrations(self):
+        loop = self.loop
+        name = "2.{:s}.archsdn".format(str(self.controller_uuid))
+        self.assertEqual(self.resolve(name, A)[1], 3)
+        loop.run_until_complete(database.register_clients((2, 3), self.controller_uuid))
+        self.assertEqual(self.resolve(name, A)[3], [(A, 60, IPv4Address("10.0.0.3").packed)])
+
+        loop.run_until_complete(database.remove_client(2, self.controller_uuid))
+        self.assertEqual(self.resolve(name, A)[1], 3)
+        self.assertEqual(self.resolve("3.0.0.10.in-addr.arpa", PTR)[1], 3)
+
+        loop.run_until_complete(database.remove_controller(self.controller_uuid))
+        self.assertEqual(self.resolve("{:s}.controller.archsdn".format(str(self.controller_uuid)), A)[1], 3)
+        self.assertEqual(self.resolve("3.{:s}.archsdn".format(str(self.controller_uuid)), A)[1], 3)
+        self.assertEqual(self.resolve("1.1.168.192.in-addr.arpa", PTR)[1], 3)
+
+    def test_index_follows_address_updates(self):
+        loop = self.loop
+        controller_uuid = uuid.UUID(int=2)
+        loop.run_until_complete(database.register_controller(
+            controller_uuid, ipv6_info=(IPv6Address("fd00::2"), 12345)
+        ))
+        name = "{:s}.controller.archsdn".format(str(controller_uuid))
+        self.assertEqual(self.resolve(name, AAAA)[3], [(AAAA, 60, IPv6Address("fd00::2").packed)])
+
+        # Registered without an IPv4 address, so the database keeps none after the update.
+        loop.run_until_complete(database.update_controller_addresses(
+            controller_uuid, ipv4_info=(IPv4Address("192.168.1.2"), 12345)
+        ))
+        self.assertIsNone(loop.run_until_complete(database.query_controller_info(controller_uuid))["ipv4"])
+        self.assertEqual(self.resolve(name, A)[3], [])
+        self.assertEqual(self.resolve("2.1.168.192.in-addr.arpa", PTR)[1], 3)
+
+        loop.run_until_complete(database.update_controller_addresses(
+            controller_uuid, ipv6_info=(IPv6Address("fd00::3"), 12345)
+        ))
+        self.assertEqual(self.resolve(name, AAAA)[3], [(AAAA, 60, IPv6Address("fd00::3").packed)])
+
+    def test_errors(self):
+        # Malformed names in the zone, and names outside it.
+        self.assertEqual(self.resolve("x.controller.archsdn", A)[1], 3)
+        self.assertEqual(self.resolve("archsdn", A)[1], 3)
+        self.assertEqual(self.resolve("300.0.0.10.in-addr.arpa", PTR)[1], 3)
+        (_, rcode, authoritative, records) = self.resolve("example.com", A)
+        self.assertEqual((rcode, authoritative, records), (5, False, []))
+
+        self.assertIsNone(dns_responder.answer(b"\x00"))
+        # Responses are not replied.
+        self.assertIsNone(dns_responder.answer(query("example.com", A, flags=0x8000)))
+        # Truncated question.
+        self.assertEqual(response_code(dns_responder.answer(query("example.com", A)[:-2])), 1)
+        # Not a QUERY.
+        self.assertEqual(response_code(dns_responder.answer(query("example.com", A, flags=0x2000))), 4)
+
+    def test_udp(self):
+        loop = self.loop
+
+        async def exchange():
+            await dns_responder.start(IPv4Address("127.0.0.1"), 15353, ttl=10)
+            received = loop.create_future()
+
+            class Protocol(asyncio.DatagramProtocol):
+                def datagram_received(self, data, addr):
+                    received.set_result(data)
+
+            (transport, _) = await loop.create_datagram_endpoint(Protocol, remote_addr=("127.0.0.1", 15353))
+            try:
+                transport.sendto(query("2.0.0.10.in-addr.arpa", PTR))
+                return await asyncio.wait_for(received, 2)
+            finally:
+                transport.close()
+                dns_responder.stop()
+
+        reply = loop.run_until_complete(exchange())
+        (_, rcode, _, records) = parse_reply(reply, len(query("2.0.0.10.in-addr.arpa", PTR)) - 12)
+        self.assertEqual((rcode, records[0][1]), (0, 10))
+        self.assertGreaterEqual(dns_responder.metrics()["answered"], 1)
+        self.assertEqual(dns_responder.metrics()["clients"], 1)
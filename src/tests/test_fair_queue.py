@@ -0,0 +1,101 @@
+import unittest
+import time
+import asyncio
+from uuid import UUID
+from ipaddress import IPv4Address
+
+from archsdn_central import zmq_requests
+from archsdn_central.fair_queue import FairQueue, TokenBucket, Throttled
+from archsdn_central.zmq_messages import REQHeartbeat
+
+
+class FairQueueTests(unittest.TestCase):
+    def test_fifo_per_key(self):
+        queue = FairQueue()
+        for i in range(3):
+            queue.put("a", i)
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(list((queue.get() for _ in range(3))), [0, 1, 2])
+        self.assertEqual(len(queue), 0)
+        with self.assertRaises(IndexError):
+            queue.get()
+
+    def test_round_robin(self):
+        queue = FairQueue()
+        for i in range(6):
+            queue.put("flood", ("flood", i))
+        queue.put("b", ("b", 0))
+        queue.put("c", ("c", 0))
+        self.assertEqual(queue.depths(), {"flood": 6, "b": 1, "c": 1})
+
+        order = list((queue.get() for _ in range(8)))
+        self.assertEqual(order[:4], [("flood", 0), ("b", 0), ("c", 0), ("flood", 1)])
+        self.assertEqual(order[4:], list((("flood", i) for i in range(2, 6))))
+        self.assertEqual(queue.depths(), {})
+
+    def test_weights(self):
+        queue = FairQueue()
+        queue.set_weight("heavy", 3)
+        for i in range(6):
+            queue.put("heavy", ("heavy", i))
+            queue.put("light", ("light", i))
+        order = list((queue.get()[0] for _ in range(8)))
+        self.assertEqual(order, ["heavy"] * 3 + ["light"] + ["heavy"] * 3 + ["light"])
+
+    def test_max_depth(self):
+        queue = FairQueue(max_depth=2)
+        queue.put("a", 0)
+        queue.put("a", 1)
+        with self.assertRaises(Throttled):
+            queue.put("a", 2)
+        queue.put("b", 0)
+        self.assertEqual(queue.throttled, 1)
+        self.assertEqual(queue.queued, 3)
+
+    def test_rate_limit(self):
+        queue = FairQueue(rate=10, burst=2)
+        queue.put("a", 0)
+        queue.put("a", 1)
+        with self.assertRaises(Throttled) as context:
+            queue.put("a", 2)
+        self.assertGreater(context.exception.retry_after, 0)
+        self.assertLessEqual(context.exception.retry_after, 0.1)
+        queue.put("b", 0)
+
+        time.sleep(0.11)
+        queue.put("a", 3)
+        self.assertEqual(queue.throttled, 1)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(2, 1, 0)
+        self.assertEqual(bucket.take(0), 0)
+        self.assertAlmostEqual(bucket.take(0.25), 0.25)
+        self.assertEqual(bucket.take(0.5), 0)
+        bucket.refill(100)
+        self.assertEqual(bucket.tokens, 1)
+
+
+class ConfiguredWeightsTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        zmq_requests.zmq_context_close()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+
+    def test_weights_of_the_controller_requests(self):
+        (heavy, light) = (UUID(int=1), UUID(int=2))
+        zmq_requests.zmq_context_initialize(IPv4Address("127.0.0.1"), 12397, weights={heavy: 3})
+        # The requests are queued under the key of their origin, as when received.
+        queue = getattr(zmq_requests, "__fair_queue")
+        request_key = getattr(zmq_requests, "__request_key")
+        for i in range(6):
+            queue.put(request_key(b"heavy", REQHeartbeat(heavy)), ("heavy", i))
+            queue.put(request_key(b"light", REQHeartbeat(light)), ("light", i))
+        order = list((queue.get()[0] for _ in range(8)))
+        self.assertEqual(order, ["heavy"] * 3 + ["light"] + ["heavy"] * 3 + ["light"])
@@ -0,0 +1,35 @@
+import unittest
+
+from archsdn_central.liveness import TimerWheel
+
+
+class TimerWheelTests(unittest.TestCase):
+    def test_expiry(self):
+        wheel = TimerWheel(1.0, 8, 0.0)
+        wheel.schedule("a", 3.0, 0.0)
+        wheel.schedule("b", 5.0, 0.0)
+        self.assertEqual(len(wheel), 2)
+        self.assertEqual(wheel.advance(3.5), [])
+        self.assertEqual(wheel.advance(4.0), ["a"])
+        self.assertNotIn("a", wheel)
+        self.assertEqual(wheel.advance(6.0), ["b"])
+        self.assertEqual(len(wheel), 0)
+
+    def test_rescheduling(self):
+        wheel = TimerWheel(1.0, 8, 0.0)
+        wheel.schedule("a", 3.0, 0.0)
+        wheel.schedule("a", 3.0, 2.0)
+        self.assertEqual(wheel.advance(5.0), [])
+        self.assertEqual(wheel.advance(6.0), ["a"])
+
+        wheel.schedule("b", 3.0, 6.0)
+        wheel.cancel("b")
+        self.assertEqual(wheel.advance(20.0), [])
+
+    def test_later_revolutions(self):
+        wheel = TimerWheel(1.0, 4, 0.0)
+        wheel.schedule("a", 10.0, 0.0)
+        self.assertEqual(wheel.advance(5.0), [])
+        self.assertIn("a", wheel)
+        # Advancing past a whole revolution visits each slot once.
+        self.assertEqual(wheel.advance(100.0), ["a"])
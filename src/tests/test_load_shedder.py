@@ -0,0 +1,42 @@
+import unittest
+
+from archsdn_central.load_shedder import LoadShedder
+
+
+class ProtectedRequest:
+    pass
+
+
+class ReadRequest:
+    pass
+
+
+class LoadShedderTests(unittest.TestCase):
+    def test_disabled(self):
+        shedder = LoadShedder()
+        self.assertFalse(shedder)
+        self.assertEqual(shedder.check(ReadRequest, 10000, 10.0), 0)
+
+    def test_pending_threshold(self):
+        shedder = LoadShedder(max_pending=100, protected=(ProtectedRequest,))
+        self.assertTrue(shedder)
+        self.assertEqual(shedder.check(ReadRequest, 100, 0.0), 0)
+        retry_after = shedder.check(ReadRequest, 200, 0.02)
+        self.assertAlmostEqual(retry_after, 0.04)
+        self.assertEqual(shedder.check(ProtectedRequest, 200, 0.02), 0)
+        self.assertEqual(shedder.metrics(), {"shedding": True, "episodes": 1, "shed": {"ReadRequest": 1}})
+
+    def test_recovery(self):
+        shedder = LoadShedder(max_latency=0.1, recovery=0.5)
+        self.assertGreater(shedder.check(ReadRequest, 0, 0.2), 0)
+        # Shedding goes on until the latency falls below half of the threshold.
+        self.assertGreater(shedder.check(ReadRequest, 0, 0.08), 0)
+        self.assertEqual(shedder.check(ReadRequest, 0, 0.04), 0)
+        self.assertFalse(shedder.metrics()["shedding"])
+        self.assertGreater(shedder.check(ReadRequest, 0, 0.2), 0)
+        self.assertEqual(shedder.episodes, 2)
+
+    def test_retry_after_is_bounded(self):
+        shedder = LoadShedder(max_pending=1, max_retry_after=1.0)
+        self.assertEqual(shedder.check(ReadRequest, 1000, 0.5), 1.0)
+        self.assertEqual(shedder.check(ReadRequest, 2, 0.0), 0.02)
@@ -0,0 +1,53 @@
+import unittest
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+from archsdn_central import loop_monitor
+
+
+class LoopMonitorTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.directory = tempfile.TemporaryDirectory()
+        self.stacks_location = Path(self.directory.name) / "stacks.log"
+        loop_monitor.configure_stacks(self.stacks_location)
+
+    def tearDown(self):
+        loop_monitor.stop("test")
+        self.loop.close()
+        self.directory.cleanup()
+
+    def test_lag_histogram(self):
+        loop_monitor.monitor(self.loop, "test", 0.01, 0)
+        self.loop.run_until_complete(asyncio.sleep(0.2))
+
+        histogram = loop_monitor.histograms()["test"]
+        self.assertGreater(histogram["count"], 5)
+        self.assertEqual(sum(histogram["counts"]), histogram["count"])
+        self.assertEqual(histogram["stalls"], 0)
+
+    def test_blocked_loop_stack_sample(self):
+        def blocking_callback():
+            time.sleep(0.3)
+
+        loop_monitor.monitor(self.loop, "test", 0.01, 0.05)
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.loop.call_soon(blocking_callback)
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+
+        histogram = loop_monitor.histograms()["test"]
+        self.assertEqual(histogram["stalls"], 1)
+        self.assertGreaterEqual(histogram["max"], 200)
+        self.assertEqual(histogram["counts"][loop_monitor._bounds.index(500)], 1)
+        stacks = self.stacks_location.read_text()
+        self.assertIn("Event loop test blocked", stacks)
+        self.assertIn("blocking_callback", stacks)
+
+    def test_stop(self):
+        loop_monitor.monitor(self.loop, "test", 0.01)
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        loop_monitor.stop("test")
+        self.assertNotIn("test", loop_monitor.histograms())
+        self.loop.run_until_complete(asyncio.sleep(0.05))
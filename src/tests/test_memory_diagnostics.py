@@ -0,0 +1,66 @@
+import unittest
+import tracemalloc
+
+from archsdn_central import memory_diagnostics
+
+
+class MemoryDiagnosticsTests(unittest.TestCase):
+    def tearDown(self):
+        if memory_diagnostics.is_started():
+            memory_diagnostics.stop()
+
+    def test_report(self):
+        self.assertFalse(memory_diagnostics.report()["tracing"])
+        memory_diagnostics.start()
+        self.assertTrue(memory_diagnostics.is_started())
+
+        marker = memory_diagnostics.mark()
+        retained = list((bytearray(1000) for _ in range(1000)))
+        memory_diagnostics.account("REQTest", marker)
+
+        report = memory_diagnostics.report()
+        self.assertTrue(report["tracing"])
+        self.assertGreaterEqual(report["peak"], report["traced"])
+        modules = dict(((entry[0], entry[1:]) for entry in report["modules"]))
+        self.assertIn(__name__, modules)
+        self.assertGreaterEqual(modules[__name__][0], 1000 * 1000)
+        self.assertGreaterEqual(modules[__name__][1], 1000)
+        self.assertTrue(report["sites"][0][0].startswith("{:s}:".format(__name__)))
+
+        (requests, blocks, size, _) = report["requests"]["REQTest"]
+        self.assertEqual(requests, 1)
+        self.assertGreaterEqual(blocks, 1000)
+        self.assertGreaterEqual(size, 1000 * 1000)
+        del retained
+
+        memory_diagnostics.stop()
+        self.assertFalse(memory_diagnostics.is_started())
+        self.assertEqual(memory_diagnostics.report()["requests"], {})
+
+    @unittest.skipUnless(hasattr(tracemalloc, "reset_peak"), "tracemalloc.reset_peak not available")
+    def test_request_churn(self):
+        # Memory allocated and freed by a request is not retained, but is accounted in its peak bytes.
+        memory_diagnostics.start()
+        for _ in range(2):
+            marker = memory_diagnostics.mark()
+            transient = list((bytearray(1000) for _ in range(1000)))
+            del transient
+            memory_diagnostics.account("REQTest", marker)
+
+        (requests, _, size, peak) = memory_diagnostics.report()["requests"]["REQTest"]
+        self.assertEqual(requests, 2)
+        self.assertLess(size, 100 * 1000)
+        self.assertGreaterEqual(peak, 2 * 1000 * 1000)
+        self.assertGreaterEqual(memory_diagnostics.report()["peak"], 1000 * 1000)
+
+    def test_external_tracing_is_kept(self):
+        tracemalloc.start()
+        try:
+            memory_diagnostics.start()
+            memory_diagnostics.stop()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        memory_diagnostics.start()
+        memory_diagnostics.stop()
+        self.assertFalse(tracemalloc.is_tracing())
@@ -0,0 +1,61 @@
+import unittest
+import time
+from uuid import UUID
+from ipaddress import IPv4Address, IPv6Address
+
+from archsdn_central.zmq_messages import registered_messages, dumps, loads, \
+    REQRegisterController, REQUpdateControllerInfo, REQRegisterControllerClient, REQAddressInfo, \
+    REQRegisterLink, RPLLocalTime, RPLClientInformation, RPLAddressInfo, RPLPath, RPLGenericError, \
+    RPLNoResultsAvailable
+
+
+class MessageSerialization(unittest.TestCase):
+    def setUp(self):
+        self.uuid = UUID(int=1)
+        self.ipv4_info = (IPv4Address("192.168.1.1"), 12345)
+        self.ipv6_info = (IPv6Address(1), 12345)
+
+    def test_round_trip(self):
+        messages = (
+            REQRegisterController(self.uuid, self.ipv4_info),
+            REQUpdateControllerInfo(self.uuid, None, self.ipv6_info),
+            REQRegisterControllerClient(self.uuid, 2),
+            REQAddressInfo(ipv6=self.ipv6_info[0]),
+            RPLLocalTime(),
+            RPLClientInformation(IPv4Address("10.0.0.2"), IPv6Address(2), "client", time.localtime()),
+            RPLAddressInfo(self.uuid, 0, "client", time.localtime()),
+            REQRegisterLink(self.uuid, UUID(int=2), 100, 2.5),
+            RPLPath((self.uuid, UUID(int=2)), 2.5, 100),
+            RPLGenericError(""),
+            RPLNoResultsAvailable(),
+        )
+        for msg in messages:
+            copy = loads(dumps(msg))
+            self.assertIs(type(copy), type(msg))
+            self.assertEqual(copy.__getstate__(), msg.__getstate__())
+
+        self.assertEqual(REQRegisterController(self.uuid, self.ipv4_info).__getstate__(), (
+            self.uuid.bytes, (self.ipv4_info[0].packed, self.ipv4_info[1]), None
+        ))
+        self.assertEqual(RPLGenericError("").__getstate__(), "")
+        self.assertEqual(loads(dumps(RPLGenericError(""))).reason, "")
+
+    def test_validation(self):
+        with self.assertRaises(AssertionError):
+            REQRegisterController(self.uuid)
+        with self.assertRaises(AssertionError):
+            REQRegisterControllerClient(self.uuid, 0)
+        with self.assertRaises(AssertionError):
+            REQAddressInfo(ipv4=self.ipv6_info[0])
+        with self.assertRaises(AssertionError):
+            REQRegisterLink(self.uuid, self.uuid, 100, 2.5)
+        with self.assertRaises(AssertionError):
+            RPLPath((self.uuid.bytes,), 2.5, 100)
+
+        msg = REQRegisterControllerClient.trusted(self.uuid, 2)
+        self.assertEqual(msg.client_id, 2)
+
+    def test_no_instance_dict(self):
+        for cls in registered_messages():
+            if not issubclass(cls, BaseException):
+                self.assertFalse(hasattr(cls.__new__(cls), "__dict__"), cls.__name__)
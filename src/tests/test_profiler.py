@@ -0,0 +1,54 @@
+import unittest
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+from archsdn_central import profiler
+
+
+def busy_operation(duration):
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        pass
+
+
+class ProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        profiler.configure(Path(self.directory.name))
+        profiler.label_functions({busy_operation: "busy"})
+
+    def tearDown(self):
+        profiler.stop()
+        profiler.configure(None)
+        self.directory.cleanup()
+
+    def test_profile(self):
+        profiler.start(0.001)
+        self.assertTrue(profiler.status()["running"])
+        thread = threading.Thread(target=busy_operation, args=(0.2,), name="busy-thread")
+        thread.start()
+        thread.join()
+        profile = profiler.stop()
+
+        self.assertFalse(profile["running"])
+        self.assertGreater(profile["samples"], 10)
+        self.assertGreater(profile["handlers"]["busy"], 10)
+        self.assertIn("MainThread:(other)", profile["handlers"])
+
+        location = Path(profile["location"])
+        self.assertEqual(location.parent, Path(self.directory.name))
+        stacks = dict((line.rsplit(" ", 1) for line in location.read_text().splitlines()))
+        busy_stacks = list((stack for stack in stacks if stack.startswith("busy-thread;")))
+        self.assertTrue(busy_stacks)
+        self.assertTrue(all((stack.endswith("test_profiler:busy_operation") for stack in busy_stacks)))
+        self.assertNotIn("profiler;", "".join(stacks))
+        self.assertIn("busy", location.with_suffix(".handlers").read_text())
+
+    def test_toggle(self):
+        profiler.toggle()
+        self.assertTrue(profiler.status()["running"])
+        profiler.toggle()
+        self.assertFalse(profiler.status()["running"])
+        self.assertEqual(len(list(Path(self.directory.name).iterdir())), 2)
@@ -0,0 +1,50 @@
+import unittest
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+import archsdn_central
+
+# Cumulative import time budget of the archsdn_central package, in microseconds.
+startup_budget = 100000
+
+
+def run_python(*args):
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(Path(archsdn_central.__file__).parents[1])] + ([env["PYTHONPATH"]] if "PYTHONPATH" in env else [])
+    )
+    return subprocess.run(
+        (sys.executable,) + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, env=env
+    )
+
+
+class StartupTests(unittest.TestCase):
+    def test_lazy_imports(self):
+        process = run_python(
+            "-c",
+            "import sys, threading; import archsdn_central; "
+            "print(' '.join(sorted(m for m in sys.modules if m.split('.')[0] in "
+            "('asyncio', 'zmq', 'blosc', 'netaddr', 'networkx')))); "
+            "from archsdn_central import database; "
+            "print(threading.active_count()); "
+            "print(' '.join(sorted(m for m in sys.modules if m.split('.')[0] == 'networkx')))"
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        (modules, threads, database_modules) = process.stdout.split("\n")[:3]
+        self.assertEqual(modules, "")
+        self.assertEqual(threads, "1")
+        # The topology only imports networkx once the first link is registered.
+        self.assertEqual(database_modules, "")
+
+    def test_startup_budget(self):
+        times = []
+        for _ in range(3):
+            process = run_python("-X", "importtime", "-c", "import archsdn_central")
+            self.assertEqual(process.returncode, 0, process.stderr)
+            for line in process.stderr.splitlines():
+                (_, cumulative, module) = line.split("|")
+                if module.strip() == "archsdn_central":
+                    times.append(int(cumulative))
+        self.assertLess(min(times), startup_budget)